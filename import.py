@@ -1,22 +1,200 @@
 import json
 import gzip
+import codecs
+import queue
 import io
 import os
+import sys
+import contextlib
+import copy
 from datetime import datetime
 import shutil
 import re
 from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import zlib
+import hashlib
+import bisect
+import math
+import heapq
+import unicodedata
+import mmap
+import struct
+import threading
+import multiprocessing
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlsplit
 import requests
+from requests.adapters import HTTPAdapter
 
 # Sélection de langue et URL dynamique
 LANG = os.getenv("DUNE_LANG", "fr").strip() or "fr"
-BASE_URL = "https://data.gtcdn.info/dune/1.1.25.0/data"
-CDN_ROOT = "https://gtcdn.info/dune/1.1.25.0"
-ASSET_VERSION = "1755896551038"
+GAME_VERSION = os.getenv("GAME_VERSION", "1.1.25.0")
+BASE_URL = f"https://data.gtcdn.info/dune/{GAME_VERSION}/data"
+CDN_ROOT = f"https://gtcdn.info/dune/{GAME_VERSION}"
+ASSET_VERSION = os.getenv("ASSET_VERSION", "1755896551038")
 VERSION_QS = f"version={ASSET_VERSION}"
 URL = f"{BASE_URL}/{LANG}/items.json.gz?{VERSION_QS}"
+
+
+def set_versions(game_version: str, asset_version: str):
+    # Bascule à chaud (mode WATCH): toutes les URLs dérivées sont recalculées
+    global GAME_VERSION, BASE_URL, CDN_ROOT, ASSET_VERSION, VERSION_QS, URL
+    GAME_VERSION = game_version
+    BASE_URL = f"https://data.gtcdn.info/dune/{GAME_VERSION}/data"
+    CDN_ROOT = f"https://gtcdn.info/dune/{GAME_VERSION}"
+    ASSET_VERSION = asset_version
+    VERSION_QS = f"version={ASSET_VERSION}"
+    URL = f"{BASE_URL}/{LANG}/items.json.gz?{VERSION_QS}"
+# Langues extraites ensemble en un seul run (ex: "fr,en,de"), fusionnées par id
+DUNE_LANGS = [l.strip() for l in os.getenv("DUNE_LANGS", "").split(",") if l.strip()]
+# Cache des pools gzip (adressé par contenu, indexé par version de jeu/langue/version d'assets)
+POOL_CACHE_DIR = os.getenv("POOL_CACHE_DIR", ".pool_cache")
+
+# Écriture directe dans MongoDB (MONGO_UPSERT=1, nécessite pymongo)
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/dune")
+MONGO_DB = os.getenv("MONGO_DB", "")
+MONGO_COLLECTION = os.getenv("MONGO_COLLECTION", "items")
+MONGO_BATCH_SIZE = int(os.getenv("MONGO_BATCH_SIZE", "500") or 500)
+
+# Téléchargement des icônes (surchargeable par variables d'environnement)
+DL_WORKERS = int(os.getenv("DL_WORKERS", "8") or 8)
+DL_RETRIES = int(os.getenv("DL_RETRIES", "3") or 3)
+DL_BACKOFF = float(os.getenv("DL_BACKOFF", "0.5") or 0.5)
+# Requêtes/seconde max par hôte (0 = illimité)
+DL_RATE_PER_HOST = float(os.getenv("DL_RATE_PER_HOST", "0") or 0)
+# Manifeste des assets téléchargés (url, taille, hash, validateurs HTTP) par chemin local, un par
+# racine de destination (voir asset_manifest_path). ASSET_MANIFEST=<chemin> force un manifeste unique.
+ASSET_MANIFEST_NAME = ".asset_manifest.json"
+ASSET_MANIFEST_PATH = os.path.join("images", ASSET_MANIFEST_NAME)
+ASSET_MANIFEST = os.getenv("ASSET_MANIFEST", "")
+
+
+# Métriques du run: METRICS_JSON=<chemin> (rapport JSON), METRICS_PROM=<chemin> (textfile Prometheus),
+# PROFILE=cprofile|sample (profilage opt-in, PROFILE_OUT=<chemin>)
+METRICS_JSON = os.getenv("METRICS_JSON", "")
+METRICS_PROM = os.getenv("METRICS_PROM", "")
+
+
+class Metrics:
+    # Durées cumulées par étape et compteurs; fusionnables depuis les processus fils
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stages: dict[str, float] = {}
+        self.counters: dict[str, float] = {}
+        self.maxima: dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def incr(self, name: str, n: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe_max(self, name: str, value: float):
+        with self._lock:
+            if value > self.maxima.get(name, float("-inf")):
+                self.maxima[name] = value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"stages": dict(self.stages), "counters": dict(self.counters), "maxima": dict(self.maxima)}
+
+    def merge(self, snap: dict):
+        for name, seconds in snap.get("stages", {}).items():
+            self.add_time(name, seconds)
+        for name, n in snap.get("counters", {}).items():
+            self.incr(name, n)
+        for name, value in snap.get("maxima", {}).items():
+            self.observe_max(name, value)
+
+    def report(self) -> dict:
+        snap = self.snapshot()
+        c = snap["counters"]
+        attempts = c.get("dl_ok", 0) + c.get("dl_ko", 0)
+        snap["derived"] = {"dl_failure_rate": c.get("dl_ko", 0) / attempts if attempts else 0.0}
+        return snap
+
+    def write_json(self, path: str, extra: dict | None = None):
+        data = {**(extra or {}), **self.report()}
+        _atomic_write_bytes(path, json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    def write_prometheus(self, path: str, extra_labels: dict | None = None):
+        # Format textfile du node_exporter
+        rep = self.report()
+        labels = ",".join(f'{k}="{v}"' for k, v in (extra_labels or {}).items())
+        lines = ["# TYPE dune_import_stage_seconds gauge"]
+        for name, seconds in sorted(rep["stages"].items()):
+            lines.append(f'dune_import_stage_seconds{{stage="{name}"{"," + labels if labels else ""}}} {seconds:.6f}')
+        lines.append("# TYPE dune_import_counter gauge")
+        for name, value in sorted({**rep["counters"], **rep["maxima"], **rep["derived"]}.items()):
+            lines.append(f'dune_import_counter{{name="{name}"{"," + labels if labels else ""}}} {value}')
+        _atomic_write_bytes(path, ("\n".join(lines) + "\n").encode("utf-8"))
+
+
+METRICS = Metrics()
+
+
+class _SamplingProfiler:
+    # Échantillonneur léger: relève la pile du thread principal toutes les `interval` secondes
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: dict[str, int] = {}
+        self._stop = threading.Event()
+        self._target = threading.main_thread().ident
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            key = f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})"
+            self.samples[key] = self.samples.get(key, 0) + 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def top(self, n: int = 25) -> list:
+        total = sum(self.samples.values()) or 1
+        return [{"frame": k, "samples": v, "share": v / total}
+                for k, v in heapq.nlargest(n, self.samples.items(), key=lambda kv: kv[1])]
+
+
+# Taille des blocs lus depuis la page HTML sauvegardée
+HTML_CHUNK_SIZE = int(os.getenv("HTML_CHUNK_SIZE", str(64 * 1024)))
+
+
 class ItemsHTMLParser(HTMLParser):
+    # Marqueurs recherchés dans l'attribut class (correspondance par sous-chaîne, comme à l'origine)
+    CLASS_MARKERS = (
+        ('item_link', ('rounded', 'bg-slate-900')),
+        ('icon_container', ('icon-container',)),
+        ('name', ('text-xl', 'font-bold')),
+        ('category', ('text-sm',)),
+        ('tier', ('tag',)),
+    )
+
     def __init__(self):
         super().__init__()
         self.items = []
@@ -27,15 +205,20 @@ class ItemsHTMLParser(HTMLParser):
         self.in_inner_name = 0
         self.in_cat_span = 0
         self.in_tier_span = 0
+        # Les classes Tailwind se répètent d'un item à l'autre: une analyse par chaîne distincte
+        self._class_cache: dict[str, frozenset] = {}
 
-    @staticmethod
-    def _has_class(attrs, needle_substrings):
+    def _classes(self, attrs) -> frozenset:
         cls = ''
         for k, v in attrs:
             if k == 'class' and v:
                 cls = v
                 break
-        return all(sub in cls for sub in needle_substrings)
+        flags = self._class_cache.get(cls)
+        if flags is None:
+            flags = self._class_cache[cls] = frozenset(
+                name for name, subs in self.CLASS_MARKERS if all(sub in cls for sub in subs))
+        return flags
 
     @staticmethod
     def _get_attr(attrs, key):
@@ -47,8 +230,7 @@ class ItemsHTMLParser(HTMLParser):
     def handle_starttag(self, tag, attrs):
         if tag == 'a':
             href = self._get_attr(attrs, 'href') or ''
-            cls_ok = self._has_class(attrs, ['rounded', 'bg-slate-900'])
-            if href and '/items/' in href and cls_ok:
+            if href and '/items/' in href and 'item_link' in self._classes(attrs):
                 self.current = {
                     'url_fiche': href,
                     'nom': '',
@@ -57,24 +239,25 @@ class ItemsHTMLParser(HTMLParser):
                     'image_url': '',
                 }
         elif self.current is not None and tag == 'div':
-            if self._has_class(attrs, ['icon-container']):
+            if 'icon_container' in self._classes(attrs):
                 self.in_icon_container += 1
         elif self.current is not None and tag == 'img' and self.in_icon_container > 0:
             src = self._get_attr(attrs, 'src') or ''
             if src and src.lower().endswith('.webp') and not self.current.get('image_url'):
                 self.current['image_url'] = src
         elif self.current is not None and tag == 'span':
+            classes = self._classes(attrs)
             # Name span wrapper
-            if self._has_class(attrs, ['text-xl']) and self._has_class(attrs, ['font-bold']):
+            if 'name' in classes:
                 self.in_name_span += 1
             # Inner name span
             elif self.in_name_span > 0:
                 self.in_inner_name += 1
             # Category
-            if self._has_class(attrs, ['text-sm']):
+            if 'category' in classes:
                 self.in_cat_span += 1
             # Tier tag
-            if self._has_class(attrs, ['tag']):
+            if 'tier' in classes:
                 self.in_tier_span += 1
 
     def handle_endtag(self, tag):
@@ -114,24 +297,178 @@ class ItemsHTMLParser(HTMLParser):
                     pass
 
 
-def parse_items_from_html(html_path: str):
-    if not os.path.exists(html_path):
-        return []
-    html = open(html_path, 'r', encoding='utf-8', errors='ignore').read()
+def feed_html_chunked(parser: HTMLParser, f, chunk_size: int = HTML_CHUNK_SIZE):
+    # Chaque bloc est coupé juste avant son dernier '<': un texte n'est jamais scindé
+    # entre deux feed(), donc handle_data reçoit les mêmes morceaux qu'avec la page entière
+    tail = ''
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        buf = tail + chunk
+        cut = buf.rfind('<')
+        if cut <= 0:
+            tail = buf
+            continue
+        parser.feed(buf[:cut])
+        tail = buf[cut:]
+    if tail:
+        parser.feed(tail)
+
+
+# Miroir local des assets de la page sauvegardée (MIRROR_MODE=auto|hardlink|reflink|copy)
+MIRROR_MODE = os.getenv("MIRROR_MODE", "auto")
+MIRROR_WORKERS = int(os.getenv("MIRROR_WORKERS", "8") or 8)
+MIRROR_MANIFEST_PATH = os.path.join("images", "html_assets", ".mirror_manifest.json")
+_FICLONE = 0x40049409  # ioctl Linux (btrfs, xfs, ...): copie par partage d'extents
 
-    # Préparer une table CDN: basename.webp -> /images/.../basename.webp (depuis items.json si dispo)
-    cdn_by_basename: dict[str, str] = {}
+
+def _reflink(src: str, dst: str) -> bool:
     try:
-        pool = load_pool()
-        if isinstance(pool, list):
-            for s in pool:
-                if isinstance(s, str) and s.startswith('/images/') and s.endswith('.webp'):
-                    base = os.path.splitext(os.path.basename(s))[0].lower()
-                    cdn_by_basename[base] = s
-    except Exception:
-        pass
+        import fcntl
+    except ImportError:
+        return False
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            return True
+        except OSError:
+            return False
+
+
+def _kernel_copy(src: str, dst: str):
+    # Copie côté noyau (copy_file_range, puis sendfile), sans transiter par l'espace utilisateur
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        copy = getattr(os, "copy_file_range", None)
+        offset = 0
+        while remaining > 0:
+            try:
+                if copy is not None:
+                    n = copy(fsrc.fileno(), fdst.fileno(), remaining)
+                else:
+                    n = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, remaining)
+            except OSError:
+                if copy is not None:
+                    # copy_file_range refusé (ex: entre systèmes de fichiers sur vieux noyaux)
+                    copy = None
+                    fsrc.seek(offset)
+                    fdst.seek(offset)
+                    continue
+                fsrc.seek(offset)
+                fdst.seek(offset)
+                shutil.copyfileobj(fsrc, fdst)
+                return
+            if n == 0:
+                break
+            offset += n
+            remaining -= n
+
+
+class AssetMirror:
+    # Recopie dest <- src en parallèle; la fraîcheur vient du manifeste (mtime, taille, sha256
+    # de la source au moment de la copie): une page inchangée ne copie aucun octet
+    def __init__(self, manifest_path: str = MIRROR_MANIFEST_PATH, mode: str = MIRROR_MODE,
+                 workers: int = MIRROR_WORKERS):
+        self.manifest_path = manifest_path
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.jobs: dict[str, tuple[str, str]] = {}
+        self.stats = {"inchanges": 0, "hardlink": 0, "reflink": 0, "copie": 0, "echecs": 0}
+        self._lock = threading.Lock()
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.entries: dict[str, dict] = json.load(f).get("fichiers") or {}
+        except (OSError, ValueError, AttributeError):
+            self.entries = {}
+
+    def add(self, src_abs: str, dest_abs: str, dest_rel: str):
+        self.jobs.setdefault(dest_rel, (src_abs, dest_abs))
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _mirror_one(self, dest_rel: str, src_abs: str, dest_abs: str) -> bool:
+        try:
+            st = os.stat(src_abs)
+            entry = self.entries.get(dest_rel)
+            dst = os.stat(dest_abs) if os.path.exists(dest_abs) else None
+            if entry and dst is not None and entry.get("src") == src_abs \
+                    and entry.get("mtime_ns") == st.st_mtime_ns and entry.get("size") == st.st_size \
+                    and dst.st_size == st.st_size:
+                self._count("inchanges")
+                return True
+            digest = _file_sha256(src_abs).hexdigest()
+            if dst is not None and dst.st_size == st.st_size and (
+                    (entry and entry.get("sha256") == digest) or _file_sha256(dest_abs).hexdigest() == digest):
+                # Source retouchée (mtime) mais contenu identique, ou copie antérieure au manifeste
+                method = "inchanges"
+            else:
+                method = self._materialize(src_abs, dest_abs)
+            self._count(method)
+            with self._lock:
+                self.entries[dest_rel] = {"src": src_abs, "mtime_ns": st.st_mtime_ns, "size": st.st_size,
+                                          "sha256": digest, "methode": method}
+            return True
+        except OSError:
+            self._count("echecs")
+            return False
+
+    def _materialize(self, src_abs: str, dest_abs: str) -> str:
+        os.makedirs(os.path.dirname(dest_abs), exist_ok=True)
+        tmp = _tmp_path_for(dest_abs)
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        method = "copie"
+        if self.mode in ("auto", "hardlink"):
+            try:
+                os.link(src_abs, tmp)
+                method = "hardlink"
+            except OSError:
+                pass
+        if method == "copie" and self.mode in ("auto", "reflink"):
+            if _reflink(src_abs, tmp):
+                method = "reflink"
+        if method == "copie":
+            _kernel_copy(src_abs, tmp)
+            shutil.copystat(src_abs, tmp)
+        os.replace(tmp, dest_abs)
+        return method
+
+    def run(self) -> dict[str, bool]:
+        results: dict[str, bool] = {}
+        if self.jobs:
+            with METRICS.stage("mirror"), ThreadPoolExecutor(max_workers=self.workers) as ex:
+                futures = {rel: ex.submit(self._mirror_one, rel, src, dst) for rel, (src, dst) in self.jobs.items()}
+                for rel, fut in futures.items():
+                    results[rel] = fut.result()
+            _atomic_write_bytes(self.manifest_path, json.dumps({"version": 1, "fichiers": self.entries},
+                                                               ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self.jobs = {}
+        return results
+
+
+def parse_items_from_html(html_path: str, index: 'PoolIndex | None' = None):
+    return list(iter_items_from_html(html_path, index))
+
+
+def iter_items_from_html(html_path: str, index: 'PoolIndex | None' = None):
+    if not os.path.exists(html_path):
+        return
+
+    # Table CDN basename.webp -> /images/.../basename.webp (depuis items.json si dispo),
+    # construite une seule fois par run et partagée avec extract_items
+    if index is None:
+        try:
+            index = PoolIndex.shared()
+        except Exception:
+            index = PoolIndex([])
+
+    mirror = AssetMirror()
 
     def normalize_copy(src: str) -> str | None:
+        # Planifie la recopie dans images/html_assets; le miroir l'exécute ensuite en lot
         if not src:
             return None
         # Laisser tomber les absolus HTTP pour l'instant
@@ -153,17 +490,12 @@ def parse_items_from_html(html_path: str):
             sub_rel = '/'.join(parts)
         dest_rel = os.path.join('images', 'html_assets', *sub_rel.split('/'))
         dest_abs = os.path.normpath(os.path.join(os.getcwd(), dest_rel))
-        os.makedirs(os.path.dirname(dest_abs), exist_ok=True)
-        try:
-            if not os.path.exists(dest_abs) or os.path.getsize(dest_abs) != os.path.getsize(src_abs):
-                shutil.copyfile(src_abs, dest_abs)
-            return dest_rel.replace('\\', '/')
-        except Exception:
-            return None
+        dest_rel = dest_rel.replace('\\', '/')
+        mirror.add(src_abs, dest_abs, dest_rel)
+        return dest_rel
 
     def ensure_from_cdn(basename: str) -> str | None:
-        key = os.path.splitext(basename)[0].lower()
-        cdn_rel = cdn_by_basename.get(key)
+        cdn_rel = index.cdn_path(basename)
         if not cdn_rel:
             return None
         url = f"{CDN_ROOT}{cdn_rel}?v={ASSET_VERSION}"
@@ -185,31 +517,25 @@ def parse_items_from_html(html_path: str):
             return None
 
     parser = ItemsHTMLParser()
-    parser.feed(html)
+    with open(html_path, 'r', encoding='utf-8', errors='ignore') as f:
+        feed_html_chunked(parser, f)
     # post-process: remap image_url local to CDN when possible
-    out = []
+    planned = []
     for it in parser.items:
         img = it.get('image_url') or ''
         copied_rel = None
         if img and not (img.startswith('http://') or img.startswith('https://')):
-            base_name = os.path.basename(img)
-            key = os.path.splitext(base_name)[0].lower()
-            cdn_rel = None
-            try:
-                pool = load_pool()
-                if isinstance(pool, list):
-                    for s in pool:
-                        if isinstance(s, str) and s.startswith('/images/') and s.endswith('.webp'):
-                            if os.path.splitext(os.path.basename(s))[0].lower() == key:
-                                cdn_rel = s
-                                break
-            except Exception:
-                pass
+            cdn_rel = index.cdn_path(os.path.basename(img))
             if cdn_rel:
                 it['image_url'] = f"{CDN_ROOT}{cdn_rel}?v={ASSET_VERSION}"
             copied_rel = normalize_copy(img)
-        it['image_local'] = copied_rel or ''
-        out.append({
+        planned.append(copied_rel)
+    copied = mirror.run()
+    if planned:
+        print("[mirror] " + " ".join(f"{k}={v}" for k, v in mirror.stats.items()))
+    for it, copied_rel in zip(parser.items, planned):
+        it['image_local'] = copied_rel if copied_rel and copied.get(copied_rel) else ''
+        yield {
             'id': None,
             'nom': it.get('nom',''),
             'categorie': it.get('categorie',''),
@@ -225,415 +551,3657 @@ def parse_items_from_html(html_path: str):
             'image_local': it.get('image_local',''),
             'tier_icon_url': '',
             'tier_icon_local': '',
-            'url_fiche': it.get('url_fiche','')
-        })
-    return out
+            'url_fiche': it.get('url_fiche',''),
+            'volume': None,
+            'prix_vente_max': None,
+            'prix_achat_base': None
+        }
 
 
 def _load_local_pool(path: str):
     if not os.path.exists(path):
         return None
-    with open(path, "r", encoding="utf-8") as f:
+    with METRICS.stage("json_parse"), open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
-def _fetch_pool(url: str):
-    resp = requests.get(url, timeout=60)
-    resp.raise_for_status()
-    raw = resp.content
-    try:
-        text = gzip.decompress(raw).decode("utf-8")
-    except OSError:
-        # Déjà du JSON brut
-        text = raw.decode("utf-8")
-    return json.loads(text)
+class PoolCache:
+    # Cache disque des items.json.gz tels que servis par le CDN:
+    #   <root>/blobs/<sha256>.json.gz            contenu gzip, dédoublonné par hash
+    #   <root>/refs/<version>/<lang>/<asset>.json  sha256 + validateurs HTTP (ETag, Last-Modified)
+    def __init__(self, root: str = POOL_CACHE_DIR, game_version: str | None = None,
+                 lang: str = LANG, asset_version: str | None = None):
+        # Versions lues à l'appel: elles peuvent changer en cours de run (mode WATCH)
+        game_version = game_version or GAME_VERSION
+        asset_version = asset_version or ASSET_VERSION
+        self.root = root
+        self.ref_path = os.path.join(root, "refs", game_version, lang, f"{asset_version}.json")
 
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", f"{digest}.json.gz")
 
-def load_pool():
-    # N'utilise le cache local que si explicitement demandé
-    use_local = os.getenv("USE_LOCAL", "0") == "1"
-    local_path = f"items_{LANG}.json"
-    if use_local:
-        pool = _load_local_pool(local_path)
-        if pool is not None:
-            return pool
-    pool = _fetch_pool(URL)
-    try:
-        with open(local_path, "w", encoding="utf-8") as f:
-            json.dump(pool, f)
-    except Exception:
-        pass
-    return pool
+    def read_ref(self) -> dict | None:
+        try:
+            with open(self.ref_path, "r", encoding="utf-8") as f:
+                ref = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self.blob_path(ref.get("sha256", ""))):
+            return None
+        return ref
 
+    def read_raw(self, ref: dict) -> bytes:
+        with open(self.blob_path(ref["sha256"]), "rb") as f:
+            return f.read()
 
-def build_resolver(pool):
-    cache = {}
+    def store(self, raw: bytes, etag: str | None = None, last_modified: str | None = None) -> dict:
+        # Toujours conserver du gzip, même si le serveur a renvoyé du JSON brut
+        if raw[:2] != b"\x1f\x8b":
+            raw = gzip.compress(raw, mtime=0)
+        digest = hashlib.sha256(raw).hexdigest()
+        blob = self.blob_path(digest)
+        if not os.path.exists(blob):
+            _atomic_write_bytes(blob, raw)
+        return self._write_ref(digest, etag, last_modified, len(raw))
 
-    def deref_once(value):
-        if isinstance(value, int) and 0 <= value < len(pool):
-            return pool[value]
-        return value
+    def _write_ref(self, digest: str, etag: str | None, last_modified: str | None, size: int) -> dict:
+        ref = {"sha256": digest, "etag": etag, "last_modified": last_modified, "size": size}
+        _atomic_write_bytes(self.ref_path, json.dumps(ref).encode("utf-8"))
+        return ref
 
-    def deref_chain(value, max_steps: int = 8):
-        seen = set()
-        current = value
-        steps = 0
-        while isinstance(current, int) and 0 <= current < len(pool) and steps < max_steps:
-            if current in seen:
-                break
-            seen.add(current)
-            nxt = pool[current]
-            if nxt is current:
-                break
-            current = nxt
-            steps += 1
-        return current
 
-    def to_text(value):
-        # Suit les indices jusqu'à obtenir une chaîne, ou un dict avec champ 'name'
-        v = deref_chain(value)
-        if isinstance(v, str):
-            # Écarter les chemins d'images et tokens évidents non textuels
-            if v.startswith("/images/") or "/textures/icons/" in v:
-                return None
-            return v
-        if isinstance(v, dict):
-            name_val = v.get("name")
-            if name_val is not None:
-                nv = deref_chain(name_val)
-                if isinstance(nv, str):
-                    if nv.startswith("/images/") or "/textures/icons/" in nv:
-                        return None
-                    return nv
-        return None
+class _BlobTee:
+    # Copie au fil de l'eau des octets reçus vers un blob du cache (même invariant que
+    # PoolCache.store: gzip sur disque, recompressé à la volée si le flux est du JSON brut)
+    def __init__(self, cache: PoolCache):
+        self.cache = cache
+        self.tmp_path = os.path.join(cache.root, "blobs", f".incoming-{os.getpid()}-{threading.get_ident()}")
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.gz = None
+        self.first = True
+        try:
+            os.makedirs(os.path.dirname(self.tmp_path), exist_ok=True)
+            self.f = open(self.tmp_path, "wb")
+        except OSError:
+            # Cache inutilisable: le téléchargement continue sans copie
+            self.f = None
 
-    def to_value(value):
-        # Déréférence en chaîne mais sans expansion récursive de dict/list
-        v = deref_chain(value)
-        return v
+    def _write(self, data: bytes):
+        if data and self.f is not None:
+            self.f.write(data)
+            self.hash.update(data)
+            self.size += len(data)
 
-    return to_text, to_value
+    def tap(self, chunks):
+        head = b""
+        for chunk in chunks:
+            if self.first:
+                # Attendre 2 octets pour reconnaître l'en-tête gzip
+                head += chunk
+                if len(head) < 2:
+                    continue
+                self.first = False
+                chunk, head = head, b""
+                if chunk[:2] != b"\x1f\x8b":
+                    self.gz = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._write(self.gz.compress(chunk) if self.gz else chunk)
+            yield chunk
+        if head:
+            self.gz = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._write(self.gz.compress(head))
+            yield head
 
+    def commit(self, etag: str | None, last_modified: str | None) -> dict | None:
+        if self.f is None:
+            return None
+        if self.gz is not None:
+            self._write(self.gz.flush())
+        self.f.close()
+        self.f = None
+        digest = self.hash.hexdigest()
+        blob = self.cache.blob_path(digest)
+        if os.path.exists(blob):
+            os.remove(self.tmp_path)
+        else:
+            os.replace(self.tmp_path, blob)
+        return self.cache._write_ref(digest, etag, last_modified, self.size)
 
-def _take_text(to_text, value):
-    return to_text(value)
+    def abort(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+            with contextlib.suppress(OSError):
+                os.remove(self.tmp_path)
 
 
-def extract_items(pool):
-    to_text, to_value = build_resolver(pool)
-    items_out = []
-    def is_valid_text(s: str) -> bool:
-        if not isinstance(s, str):
-            return False
-        if s.startswith("/images/") or "/textures/icons/" in s:
-            return False
-        # doit contenir au moins une lettre (y compris accentuée)
-        return any(ch.isalpha() for ch in s)
+def _tmp_path_for(path: str, suffix: str = "") -> str:
+    # Fichier temporaire propre au processus et au thread: deux écritures concurrentes
+    # d'un même fichier (threads de téléchargement, shards) ne partagent jamais le leur
+    return f"{path}.tmp{os.getpid()}-{threading.get_ident()}{suffix}"
 
-    # Index des chemins d'images du pool pour retrouver un chemin complet à partir d'un token
-    image_paths = [s for s in pool if isinstance(s, str) and s.startswith("/images/")]
-    base_to_path = {}
-    for p in image_paths:
-        base = os.path.splitext(os.path.basename(p))[0].lower()
-        base_to_path.setdefault(base, p)
-    images_found_pool = len(image_paths)
-    images_downloaded_ok = 0
-    images_downloaded_ko = 0
-    items_with_icon = 0
-    items_with_tier_icon = 0
 
-    def deep_find_image_path(node, max_depth: int = 10, visited_idx: set | None = None, depth: int = 0):
-        if node is None or depth > max_depth:
-            return None
-        # Chaîne directe
-        if isinstance(node, str) and node.startswith("/images/"):
-            return node
-        # Index dans le pool
-        if isinstance(node, int) and 0 <= node < len(pool):
-            if visited_idx is None:
-                visited_idx = set()
-            if node in visited_idx:
-                return None
-            visited_idx.add(node)
-            return deep_find_image_path(pool[node], max_depth, visited_idx, depth + 1)
-        # Dictionnaire: explorer valeurs
-        if isinstance(node, dict):
-            for v in node.values():
-                found = deep_find_image_path(v, max_depth, visited_idx, depth + 1)
-                if found:
-                    return found
-            return None
-        # Liste/tuple: explorer éléments
-        if isinstance(node, (list, tuple)):
-            for v in node:
-                found = deep_find_image_path(v, max_depth, visited_idx, depth + 1)
-                if found:
-                    return found
-            return None
-        # Autres types
-        return None
+@contextlib.contextmanager
+def _atomic_path(path: str, suffix: str = ""):
+    # L'appelant écrit dans le chemin temporaire rendu; renommé sur path en cas de succès,
+    # supprimé sinon (suffix: extension imposée par l'écrivain, ex. .npy)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = _tmp_path_for(path, suffix)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
 
-    def resolve_icon_path(ref):
-        if ref is None:
-            return None
-        # 1) Recherche profonde autour du nœud
-        found = deep_find_image_path(ref)
-        if isinstance(found, str):
-            return found
-        # 2) Heuristique avec token de base
-        s = to_text(ref) or to_value(ref)
-        if isinstance(s, str):
-            key = os.path.splitext(os.path.basename(s))[0].lower()
-            if key in base_to_path:
-                return base_to_path[key]
-            matches = [p for p in image_paths if key and key in p.lower()]
-            if len(matches) == 1:
-                return matches[0]
-        return None
 
-    def build_image_urls(path_str: str):
-        if not path_str:
-            return None, None
-        url = f"{CDN_ROOT}{path_str}?v={ASSET_VERSION}"
-        # Répertoire local miroir de l'arborescence CDN sous dossier racine 'images' (sans doubler)
-        sub_path = path_str.lstrip("/")
-        if sub_path.startswith("images/"):
-            sub_path = sub_path[len("images/"):]
-        local_path = os.path.join("images", sub_path)
-        return url, local_path
-
-    def ensure_download(url: str, local_path: str):
-        if not url or not local_path:
-            return False
-        # Création des dossiers
-        os.makedirs(os.path.dirname(local_path), exist_ok=True)
-        if os.path.exists(local_path) and os.getenv("REDOWNLOAD_IMAGES", "0") != "1":
-            return True
-        try:
-            with requests.get(url, stream=True, timeout=60) as resp:
-                resp.raise_for_status()
-                with open(local_path, "wb") as out:
-                    for chunk in resp.iter_content(chunk_size=8192):
-                        if chunk:
-                            out.write(chunk)
-            return True
-        except Exception:
-            return False
+def _atomic_write_bytes(path: str, data: bytes):
+    with _atomic_path(path) as tmp_path, open(tmp_path, "wb") as f:
+        f.write(data)
 
-    def to_bool(value):
-        v = to_value(value)
-        if isinstance(v, bool):
-            return v
-        if isinstance(v, (int, float)):
-            return v != 0
-        return bool(v)
 
-    def to_number(value):
-        # Tente d'obtenir un nombre sans expansion profonde
-        if isinstance(value, (int, float)):
-            return value
-        if isinstance(value, int) and 0 <= value < len(pool):
-            v2 = pool[value]
-            if isinstance(v2, (int, float)):
-                return v2
-        # Évite d'interpréter arbitrairement d'autres structures
-        return None
+POOL_CHUNK_SIZE = int(os.getenv("POOL_CHUNK_SIZE", str(256 * 1024)))
 
-    def humanize_attribute_values(ref):
-        # Résout une liste d'objets { key, attribute, value }
-        root = to_value(ref)
-        # Si ref pointe vers une liste d'indices, déréf une fois
-        if isinstance(root, int) and 0 <= root < len(pool):
-            root = pool[root]
-        if not isinstance(root, list):
-            return []
-        output = []
-        for elem in root:
-            e = elem
-            if isinstance(e, int) and 0 <= e < len(pool):
-                e = pool[e]
-            if not isinstance(e, dict):
+
+def _prefetch(chunks, depth: int = 8):
+    # Lecture réseau dans un thread: recv() et zlib relâchent le GIL, le téléchargement
+    # recouvre donc la décompression et le décodage JSON du thread appelant
+    # File bornée; le consommateur qui s'arrête (erreur de décodage, abandon) lève stop et le
+    # producteur cesse de lire au lieu de rester bloqué sur une file pleine
+    q: queue.Queue = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def offer(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
                 continue
-            attr_desc = to_value(e.get("attribute"))
-            # Déréf léger de l'attribut
-            if isinstance(attr_desc, int) and 0 <= attr_desc < len(pool):
-                attr_desc = pool[attr_desc]
-            attr_name = None
-            percent_based = None
-            higher_is_better = None
-            if isinstance(attr_desc, dict):
-                attr_name = to_text(attr_desc.get("name")) or to_text(attr_desc)
-                percent_based = to_bool(attr_desc.get("percentBased")) if "percentBased" in attr_desc else None
-                higher_is_better = to_bool(attr_desc.get("higherIsBetter")) if "higherIsBetter" in attr_desc else None
-            else:
-                attr_name = to_text(attr_desc)
+        return False
 
-            val_num = to_number(e.get("value"))
+    def produce():
+        try:
+            for chunk in chunks:
+                if not offer(chunk):
+                    return
+            offer(done)
+        except BaseException as exc:
+            offer(exc)
 
-            output.append({
-                "attribut": attr_name or "",
-                "valeur": val_num if val_num is not None else e.get("value"),
-                "est_pourcentage": percent_based,
-                "mieux_plus_haut": higher_is_better
-            })
-        # Filtrer attributs sans nom
-        return [o for o in output if o.get("attribut")]
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
 
-    # Pas d'index global id->libellé (trop de collisions inter-tables)
 
-    def looks_like_item(entry_dict: dict) -> bool:
-        # Exclure les objets "stat" simples
-        if all(k in entry_dict for k in ("key", "attribute", "value")) and len(entry_dict) <= 5:
-            return False
-        if "id" not in entry_dict or "name" not in entry_dict:
+def _gunzip_chunks(chunks):
+    # Décompression incrémentale (membres gzip successifs acceptés); un flux qui n'est pas
+    # du gzip est transmis tel quel
+    it = iter(chunks)
+    first = b""
+    # Au moins 2 octets pour reconnaître l'en-tête gzip
+    for chunk in it:
+        first += chunk
+        if len(first) >= 2:
+            break
+    if not first:
+        return
+    if first[:2] != b"\x1f\x8b":
+        yield first
+        yield from it
+        return
+    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    pending = first
+    while True:
+        while pending:
+            out = d.decompress(pending)
+            if out:
+                yield out
+            if d.eof:
+                pending = d.unused_data
+                d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                pending = b""
+        pending = next(it, None)
+        if pending is None:
+            break
+    tail = d.flush()
+    if tail:
+        yield tail
+
+
+def _utf8_chunks(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+_JSON_WS = re.compile(r"[ \t\n\r]*")
+_JSON_WS_CHARS = frozenset(" \t\n\r")
+
+
+def parse_json_array_stream(text_chunks) -> list:
+    # Décode un tableau JSON de premier niveau élément par élément (scanner C de json), sans
+    # jamais reconstituer le texte complet. Un élément n'est accepté que s'il est suivi d'un
+    # séparateur (sinon "1.5" pourrait être le début de "1.5e3"), ou en fin de flux.
+    scan = json.JSONDecoder().scan_once
+    ws = _JSON_WS.match
+    it = iter(text_chunks)
+    buf, pos, eof = "", 0, False
+
+    def fill(want: int):
+        nonlocal buf, pos, eof
+        parts = [buf[pos:]]
+        size = len(parts[0])
+        while size < want and not eof:
+            chunk = next(it, None)
+            if chunk is None:
+                eof = True
+                break
+            parts.append(chunk)
+            size += len(chunk)
+        buf, pos = "".join(parts), 0
+
+    def peek() -> str:
+        nonlocal pos
+        while True:
+            pos = ws(buf, pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                return ""
+            fill(1)
+
+    def grow():
+        # Élément incomplet: élargir la fenêtre (doublement) avant de réessayer
+        if eof:
+            raise ValueError(f"JSON invalide ou tronqué après l'élément {len(out) - 1} du pool")
+        fill(max(2 * (len(buf) - pos), POOL_CHUNK_SIZE))
+
+    out = []
+    append = out.append
+    if peek() != "[":
+        raise ValueError("Le JSON racine attendu est une liste (pool)")
+    pos += 1
+    if peek() == "]":
+        return out
+    while True:
+        try:
+            value, end = scan(buf, pos)
+        except (StopIteration, json.JSONDecodeError):
+            grow()
+            continue
+        c = buf[end:end + 1]
+        if c == ",":
+            append(value)
+            pos = end + 1
+            # Chemin rapide du JSON compact: l'élément suivant commence juste après la virgule
+            if pos < len(buf) and buf[pos] not in _JSON_WS_CHARS:
+                continue
+            if peek() == "":
+                raise ValueError("JSON tronqué: tableau du pool non terminé")
+            continue
+        if c == "]":
+            append(value)
+            return out
+        if c and c in _JSON_WS_CHARS:
+            append(value)
+            pos = end
+            c = peek()
+            if c == ",":
+                pos += 1
+                if peek() == "":
+                    raise ValueError("JSON tronqué: tableau du pool non terminé")
+                continue
+            if c == "]":
+                return out
+            raise ValueError(f"JSON invalide après l'élément {len(out) - 1} du pool")
+        # Fin de tampon (ou caractère pouvant prolonger un nombre): lire la suite
+        grow()
+
+
+def _clocked(chunks, acc: list):
+    # acc[0] += temps passé à obtenir chaque morceau (étages amont compris)
+    it = iter(chunks)
+    clock = time.perf_counter
+    while True:
+        t0 = clock()
+        chunk = next(it, None)
+        acc[0] += clock() - t0
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _parse_pool_chunks(chunks, read_stage: str = "pool_read") -> list:
+    # Les étages sont chaînés en flux: chacun est chronométré à sa sortie, puis on retire
+    # le temps de l'étage amont -> read_stage (réseau ou disque), decompress, json_parse
+    read, inflated = [0.0], [0.0]
+    started = time.perf_counter()
+    try:
+        return parse_json_array_stream(_utf8_chunks(_clocked(_gunzip_chunks(_clocked(chunks, read)), inflated)))
+    finally:
+        METRICS.add_time(read_stage, read[0])
+        METRICS.add_time("decompress", inflated[0] - read[0])
+        METRICS.add_time("json_parse", time.perf_counter() - started - inflated[0])
+
+
+def _parse_pool_file(path: str) -> list:
+    with open(path, "rb") as f:
+        return _parse_pool_chunks(iter(lambda: f.read(POOL_CHUNK_SIZE), b""))
+
+
+def _conditional_headers(ref: dict | None) -> dict:
+    # Validateurs HTTP de la version en cache (GET conditionnel -> 304 si inchangée)
+    headers = {}
+    if ref:
+        if ref.get("etag"):
+            headers["If-None-Match"] = ref["etag"]
+        if ref.get("last_modified"):
+            headers["If-Modified-Since"] = ref["last_modified"]
+    return headers
+
+
+def _fetch_pool_cached(url: str, cache: PoolCache, session=None, resident_digest: str | None = None):
+    # GET conditionnel du pool: 304 -> blob du cache, 200 -> morceaux reçus copiés dans le cache,
+    # décompressés et décodés au fil de l'eau; pic mémoire ~ un pool décodé.
+    # resident_digest: sha256 du blob déjà décodé par l'appelant (mode WATCH). Si le cache
+    # y correspond et que le serveur répond 304 (ou est injoignable), rend None sans relire le blob.
+    ref = cache.read_ref()
+    resident = bool(ref) and resident_digest is not None and ref.get("sha256") == resident_digest
+    headers = _conditional_headers(ref)
+    getter = session.get if session is not None else requests.get
+    try:
+        resp = getter(url, headers=headers, timeout=60, stream=True)
+        if resp.status_code == 304 and ref:
+            resp.close()
+            METRICS.incr("pool_not_modified")
+            return None if resident else _parse_pool_file(cache.blob_path(ref["sha256"]))
+        resp.raise_for_status()
+    except requests.RequestException:
+        # Hors ligne: se rabattre sur la dernière version en cache
+        if ref:
+            METRICS.incr("pool_offline_fallback")
+            return None if resident else _parse_pool_file(cache.blob_path(ref["sha256"]))
+        raise
+    tee = _BlobTee(cache)
+    received = 0
+
+    def counted(chunks):
+        nonlocal received
+        for chunk in chunks:
+            received += len(chunk)
+            yield chunk
+
+    try:
+        with resp:
+            # pool_fetch = attente du réseau (et copie dans le cache) vue du thread de décodage
+            pool = _parse_pool_chunks(tee.tap(_prefetch(counted(resp.iter_content(POOL_CHUNK_SIZE)))),
+                                      read_stage="pool_fetch")
+    except requests.RequestException:
+        tee.abort()
+        if ref:
+            METRICS.incr("pool_offline_fallback")
+            return None if resident else _parse_pool_file(cache.blob_path(ref["sha256"]))
+        raise
+    except BaseException:
+        tee.abort()
+        raise
+    METRICS.incr("pool_bytes", received)
+    try:
+        tee.commit(resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+    except OSError:
+        tee.abort()
+    return pool
+
+
+def pool_url(lang: str = LANG) -> str:
+    return f"{BASE_URL}/{lang}/items.json.gz?{VERSION_QS}"
+
+
+def load_pool(lang: str = LANG, use_local: bool | None = None):
+    # USE_LOCAL=1: aucun accès réseau si le cache (ou l'ancien items_{lang}.json) est présent
+    if use_local is None:
+        use_local = os.getenv("USE_LOCAL", "0") == "1"
+    cache = PoolCache(lang=lang)
+    if use_local:
+        ref = cache.read_ref()
+        if ref:
+            return _parse_pool_file(cache.blob_path(ref["sha256"]))
+        pool = _load_local_pool(f"items_{lang}.json")
+        if pool is not None:
+            return pool
+    return _fetch_pool_cached(pool_url(lang), cache)
+
+
+# Format binaire compact du pool, lisible via mmap sans json.loads complet.
+# Disposition (little-endian):
+#   en-tête   : magic, version, nb d'entrées, nb de chaînes, offsets des sections,
+#               sha256 du blob gzip source (PoolCache) ou zéros
+#   tags      : 1 octet par entrée (_T_*)
+#   slots     : 8 octets par entrée (entier/flottant en ligne, id de chaîne, ou offset d'enregistrement)
+#   strtab    : (offset, longueur) u32 par chaîne internée (valeurs et clés de dict)
+#   heap      : octets UTF-8 des chaînes
+#   records   : dict = u32 n + n × (u32 id_clé, valeur); list = u32 n + n × valeur
+#               valeur = u8 tag + 8 octets
+POOL_BIN_MAGIC = b"DUNEPOOL"
+POOL_BIN_VERSION = 2
+_POOL_BIN_HEADER = struct.Struct("<8sIIQQQQQQ32s")
+_T_NULL, _T_FALSE, _T_TRUE, _T_INT, _T_FLOAT, _T_STR, _T_DICT, _T_LIST = range(8)
+_SLOT = struct.Struct("<q")
+_SLOT_F = struct.Struct("<d")
+_U32 = struct.Struct("<I")
+_STR_REF = struct.Struct("<II")
+_KEY_VAL = struct.Struct("<IB8s")
+_VAL = struct.Struct("<B8s")
+
+
+def _pack_scalar(value, intern) -> tuple[int, bytes]:
+    if value is None:
+        return _T_NULL, bytes(8)
+    if value is True:
+        return _T_TRUE, bytes(8)
+    if value is False:
+        return _T_FALSE, bytes(8)
+    if isinstance(value, int):
+        return _T_INT, _SLOT.pack(value)
+    if isinstance(value, float):
+        return _T_FLOAT, _SLOT_F.pack(value)
+    if isinstance(value, str):
+        return _T_STR, _SLOT.pack(intern(value))
+    raise ValueError(f"Valeur non scalaire dans le pool: {type(value).__name__}")
+
+
+def write_pool_binary(pool, path: str, source_digest: str | None = None):
+    strings: list[bytes] = []
+    string_ids: dict[str, int] = {}
+
+    def intern(s: str) -> int:
+        sid = string_ids.get(s)
+        if sid is None:
+            sid = string_ids[s] = len(strings)
+            strings.append(s.encode("utf-8"))
+        return sid
+
+    tags = bytearray(len(pool))
+    slots = bytearray()
+    records = bytearray()
+    for i, entry in enumerate(pool):
+        if isinstance(entry, dict):
+            tags[i] = _T_DICT
+            slots += _SLOT.pack(len(records))
+            records += _U32.pack(len(entry))
+            for k, v in entry.items():
+                vt, vp = _pack_scalar(v, intern)
+                records += _KEY_VAL.pack(intern(str(k)), vt, vp)
+        elif isinstance(entry, list):
+            tags[i] = _T_LIST
+            slots += _SLOT.pack(len(records))
+            records += _U32.pack(len(entry))
+            for v in entry:
+                records += _VAL.pack(*_pack_scalar(v, intern))
+        else:
+            tags[i], payload = _pack_scalar(entry, intern)
+            slots += payload
+
+    strtab = bytearray()
+    heap_len = 0
+    for b in strings:
+        strtab += _STR_REF.pack(heap_len, len(b))
+        heap_len += len(b)
+
+    off_tags = _POOL_BIN_HEADER.size
+    off_slots = off_tags + len(tags)
+    off_strtab = off_slots + len(slots)
+    off_heap = off_strtab + len(strtab)
+    off_records = off_heap + heap_len
+    with _atomic_path(path) as tmp_path, open(tmp_path, "wb") as f:
+        f.write(_POOL_BIN_HEADER.pack(POOL_BIN_MAGIC, POOL_BIN_VERSION, 0, len(pool), len(strings),
+                                      off_slots, off_strtab, off_heap, off_records,
+                                      bytes.fromhex(source_digest) if source_digest else bytes(32)))
+        f.write(tags)
+        f.write(slots)
+        f.write(strtab)
+        for b in strings:
+            f.write(b)
+        f.write(records)
+
+
+class MappedPool:
+    # Accès en lecture seule au pool binaire via mmap: chaque entrée n'est décodée
+    # qu'au moment où elle est lue (dict/list superficiels, valeurs = indices du pool)
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < _POOL_BIN_HEADER.size:
+            self.close()
+            raise ValueError(f"Fichier pool binaire invalide: {path}")
+        (magic, version, _, self._n, self._n_strings, self._off_slots, self._off_strtab,
+         self._off_heap, self._off_records, digest) = _POOL_BIN_HEADER.unpack_from(self._mm, 0)
+        if magic != POOL_BIN_MAGIC or version != POOL_BIN_VERSION:
+            self.close()
+            raise ValueError(f"Fichier pool binaire invalide: {path}")
+        # sha256 du blob dont le fichier est issu (None: pool d'une autre source)
+        self.source_digest = digest.hex() if any(digest) else None
+        self._off_tags = _POOL_BIN_HEADER.size
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._n
+
+    def _string(self, sid: int) -> str:
+        off, length = _STR_REF.unpack_from(self._mm, self._off_strtab + sid * _STR_REF.size)
+        start = self._off_heap + off
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _scalar(self, tag: int, payload) -> object:
+        if tag == _T_INT:
+            return _SLOT.unpack(payload)[0]
+        if tag == _T_STR:
+            return self._string(_SLOT.unpack(payload)[0])
+        if tag == _T_FLOAT:
+            return _SLOT_F.unpack(payload)[0]
+        if tag == _T_TRUE:
+            return True
+        if tag == _T_FALSE:
+            return False
+        return None
+
+    def tag(self, i: int) -> int:
+        return self._mm[self._off_tags + i]
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        tag = self._mm[self._off_tags + i]
+        slot_off = self._off_slots + i * 8
+        if tag == _T_DICT or tag == _T_LIST:
+            pos = self._off_records + _SLOT.unpack_from(self._mm, slot_off)[0]
+            count = _U32.unpack_from(self._mm, pos)[0]
+            pos += 4
+            if tag == _T_LIST:
+                out = []
+                for _ in range(count):
+                    vt, vp = _VAL.unpack_from(self._mm, pos)
+                    out.append(self._scalar(vt, vp))
+                    pos += _VAL.size
+                return out
+            out = {}
+            for _ in range(count):
+                sid, vt, vp = _KEY_VAL.unpack_from(self._mm, pos)
+                out[self._string(sid)] = self._scalar(vt, vp)
+                pos += _KEY_VAL.size
+            return out
+        return self._scalar(tag, self._mm[slot_off:slot_off + 8])
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self[i]
+
+    def _iter_tag(self, wanted: int):
+        tags = self._mm[self._off_tags:self._off_tags + self._n]
+        for i, tag in enumerate(tags):
+            if tag == wanted:
+                yield i, self[i]
+
+    def iter_strings(self):
+        # Parcourt uniquement les entrées chaîne (sans décoder dicts/listes)
+        return (s for _, s in self._iter_tag(_T_STR))
+
+    def iter_dicts(self):
+        # (position, dict) pour chaque entrée dict du pool
+        return self._iter_tag(_T_DICT)
+
+
+def load_mapped_pool(lang: str = LANG) -> MappedPool:
+    # Pool binaire items_{lang}.pool, marqué du sha256 du blob du cache dont il est issu: il n'est
+    # reconstruit (décodage JSON complet + conversion) que lorsque ce blob change. Le GET
+    # conditionnel ne décode rien tant que le serveur répond 304 (ou est injoignable).
+    bin_path = f"items_{lang}.pool"
+    try:
+        mapped = MappedPool(bin_path)
+    except (OSError, ValueError):
+        mapped = None
+    digest = mapped.source_digest if mapped is not None else None
+    cache = PoolCache(lang=lang)
+    if os.getenv("USE_LOCAL", "0") == "1":
+        ref = cache.read_ref()
+        if mapped is not None and (ref is None or ref["sha256"] == digest):
+            return mapped
+        pool = load_pool(lang, use_local=True)
+    else:
+        pool = _fetch_pool_cached(pool_url(lang), cache, resident_digest=digest)
+    ref = cache.read_ref()
+    source = ref["sha256"] if ref else None
+    if pool is None or (mapped is not None and source is not None and source == digest):
+        # Blob inchangé (304, hors ligne, ou même contenu renvoyé par le serveur)
+        METRICS.incr("pool_bin_reused")
+        return mapped
+    if mapped is not None:
+        mapped.close()
+    with METRICS.stage("pool_bin_write"):
+        write_pool_binary(pool, bin_path, source)
+    return MappedPool(bin_path)
+
+
+class _HostRateLimiter:
+    # Espace les requêtes vers un même hôte d'au moins 1/rate secondes
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot: dict[str, float] = {}
+
+    def wait(self, host: str):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def asset_manifest_path(local_path: str) -> str:
+    # Racine de destination = premier dossier "images" du chemin (arborescence du CDN),
+    # à défaut le dossier du fichier: images/... -> images/.asset_manifest.json
+    parts = os.path.normpath(local_path).split(os.sep)
+    if "images" in parts[:-1]:
+        root = os.sep.join(parts[:parts.index("images") + 1])
+    else:
+        root = os.path.dirname(local_path) or "."
+    return os.path.join(root, ASSET_MANIFEST_NAME)
+
+
+class AssetManifest:
+    # Décide des téléchargements sans relire ni hacher les fichiers: une entrée n'est écrite
+    # qu'après le renommage atomique du .part; un stat() vérifie que le fichier a encore sa taille
+    def __init__(self, path: str = ASSET_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # Sauvegardes sérialisées: un instantané plus ancien ne remplace jamais un plus récent
+        self._save_lock = threading.Lock()
+        self._dirty = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries: dict[str, dict] = json.load(f).get("assets") or {}
+        except (OSError, ValueError, AttributeError):
+            self.entries = {}
+
+    def get(self, local_path: str) -> dict | None:
+        return self.entries.get(local_path)
+
+    def put(self, local_path: str, entry: dict):
+        with self._lock:
+            self.entries[local_path] = entry
+            self._dirty += 1
+            flush = self._dirty >= 200
+        if flush:
+            # Sauvegardes intermédiaires: un run interrompu garde l'essentiel de son travail
+            # (au mieux: un échec d'écriture laisse les entrées à sauver à la fin du run)
+            with contextlib.suppress(OSError):
+                self.save()
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty and os.path.exists(self.path):
+                    return
+                data = json.dumps({"version": 1, "assets": self.entries}, ensure_ascii=False, separators=(",", ":"))
+                dirty, self._dirty = self._dirty, 0
+            try:
+                _atomic_write_bytes(self.path, data.encode("utf-8"))
+            except OSError:
+                with self._lock:
+                    self._dirty += dirty
+                raise
+
+
+def _file_sha256(path: str, hasher=None):
+    hasher = hasher or hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            hasher.update(block)
+    return hasher
+
+
+def _looks_complete(path: str) -> int | None:
+    # Fichier antérieur au manifeste: un webp porte sa taille dans l'en-tête RIFF,
+    # ce qui suffit à écarter les fichiers tronqués. Renvoie la taille si le fichier est complet.
+    try:
+        size = os.path.getsize(path)
+        if not path.lower().endswith(".webp"):
+            return size or None
+        with open(path, "rb") as f:
+            head = f.read(12)
+    except OSError:
+        return None
+    if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WEBP":
+        return None
+    return size if struct.unpack("<I", head[4:8])[0] + 8 == size else None
+
+
+class IconDownloader:
+    # Étape de téléchargement séparée de l'extraction: on empile les (url, chemin local)
+    # pendant la boucle d'items, puis run() les récupère via un pool de threads borné
+    # partageant une seule session HTTP keep-alive.
+    def __init__(self, workers: int | None = None, retries: int | None = None,
+                 backoff: float | None = None, rate_per_host: float | None = None,
+                 timeout: float = 60, session: requests.Session | None = None,
+                 manifest: AssetManifest | None = None, unique: bool = False):
+        self.workers = max(1, workers if workers is not None else DL_WORKERS)
+        self.retries = max(0, retries if retries is not None else DL_RETRIES)
+        self.backoff = backoff if backoff is not None else DL_BACKOFF
+        self.timeout = timeout
+        self.limiter = _HostRateLimiter(rate_per_host if rate_per_host is not None else DL_RATE_PER_HOST)
+        self.redownload = os.getenv("REDOWNLOAD_IMAGES", "0") == "1"
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        # Manifestes chargés au premier run() (les shards forkés ne font qu'empiler des jobs),
+        # un par racine de destination sauf manifeste imposé par l'appelant ou ASSET_MANIFEST
+        if manifest is None and ASSET_MANIFEST:
+            manifest = AssetManifest(ASSET_MANIFEST)
+        self.manifest = manifest
+        self._manifests: dict[str, AssetManifest] = {}
+        self.jobs: list[tuple[str, str]] = []
+        self.results: dict[str, bool] = {}
+        # unique=True (accès unitaire longue durée): un fichier n'est mis en file qu'une fois,
+        # la file reste bornée par le nombre d'icônes distinctes
+        self._queued: set[str] | None = set() if unique else None
+        self.dl_ok = 0
+        self.dl_ko = 0
+        self.fetched = 0
+        self.retried = 0
+        self.resumed = 0
+        self.adopted = 0
+        self.bytes_downloaded = 0
+        self._lock = threading.Lock()
+
+    def submit(self, url: str, local_path: str):
+        if url and local_path:
+            if self._queued is not None:
+                if local_path in self._queued or local_path in self.results:
+                    return
+                self._queued.add(local_path)
+            self.jobs.append((url, local_path))
+
+    def _manifest_for(self, local_path: str) -> AssetManifest:
+        if self.manifest is not None:
+            return self.manifest
+        path = asset_manifest_path(local_path)
+        manifest = self._manifests.get(path)
+        if manifest is None:
+            manifest = self._manifests[path] = AssetManifest(path)
+        return manifest
+
+    def _fetch(self, url: str, local_path: str) -> bool:
+        manifest = self._manifest_for(local_path)
+        entry = manifest.get(local_path)
+        if entry is not None:
+            # Fichier supprimé ou remplacé depuis: l'entrée ne prouve plus rien
+            try:
+                present = os.path.getsize(local_path) == entry.get("size")
+            except OSError:
+                present = False
+            if not present:
+                entry = None
+        if not self.redownload:
+            if entry is not None and entry.get("url") == url:
+                return True
+            if entry is None and self._adopt(url, local_path):
+                return True
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        part = local_path + ".part"
+        part_meta = part + ".json"
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self._lock:
+                    self.retried += 1
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+            self.limiter.wait(host)
+            headers = {}
+            offset = 0
+            validator = None
+            try:
+                offset = os.path.getsize(part)
+                with open(part_meta, "r", encoding="utf-8") as f:
+                    validator = json.load(f).get("validator")
+            except (OSError, ValueError):
+                pass
+            if offset and validator:
+                # Reprise: If-Range garantit qu'on ne recolle pas deux versions différentes
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = validator
+            else:
+                offset = 0
+                if entry is not None and not self.redownload:
+                    # URL changée (nouvelle version d'assets): revalidation conditionnelle
+                    headers.update(_conditional_headers(entry))
+            try:
+                with self.session.get(url, stream=True, timeout=self.timeout, headers=headers) as resp:
+                    if resp.status_code == 304 and entry is not None:
+                        manifest.put(local_path, {**entry, "url": url})
+                        return True
+                    if resp.status_code == 416:
+                        # .part incohérent avec la ressource: on repart de zéro
+                        with contextlib.suppress(OSError):
+                            os.remove(part)
+                        continue
+                    # 4xx (hors 429) : inutile de réessayer
+                    if 400 <= resp.status_code < 500 and resp.status_code != 429:
+                        return False
+                    resp.raise_for_status()
+                    etag = resp.headers.get("ETag")
+                    last_modified = resp.headers.get("Last-Modified")
+                    if resp.status_code == 206 and offset:
+                        hasher = _file_sha256(part)
+                        mode = "ab"
+                        with self._lock:
+                            self.resumed += 1
+                    else:
+                        offset = 0
+                        hasher = hashlib.sha256()
+                        mode = "wb"
+                        validator = etag if etag and not etag.startswith("W/") else last_modified
+                        if validator:
+                            _atomic_write_bytes(part_meta, json.dumps({"url": url, "validator": validator}).encode("utf-8"))
+                    expected = resp.headers.get("Content-Length")
+                    size = 0
+                    with open(part, mode) as out:
+                        for chunk in resp.iter_content(chunk_size=8192):
+                            if chunk:
+                                out.write(chunk)
+                                hasher.update(chunk)
+                                size += len(chunk)
+                    with self._lock:
+                        self.bytes_downloaded += size
+                    if expected is not None and not resp.headers.get("Content-Encoding") and int(expected) != size:
+                        # Coupure en cours de transfert: le .part reste pour la reprise
+                        continue
+                os.replace(part, local_path)
+                with contextlib.suppress(OSError):
+                    os.remove(part_meta)
+                manifest.put(local_path, {"url": url, "size": offset + size, "sha256": hasher.hexdigest(),
+                                               "etag": etag, "last_modified": last_modified})
+                with self._lock:
+                    self.fetched += 1
+                return True
+            except Exception:
+                continue
+        return False
+
+    def _adopt(self, url: str, local_path: str) -> bool:
+        # Fichier déjà présent mais inconnu du manifeste (runs antérieurs): repris s'il est complet
+        size = _looks_complete(local_path)
+        if size is None:
             return False
-        # Au moins un des champs typiques d'item
-        typical_keys = {"mainCategoryId", "subCategoryId", "iconPath", "tier", "highestSellToVendorPrice", "volume", "filterCategoryIds"}
-        if not any(k in entry_dict for k in typical_keys):
+        try:
+            digest = _file_sha256(local_path).hexdigest()
+        except OSError:
+            # Fichier disparu ou illisible entre-temps: téléchargement normal
             return False
+        self._manifest_for(local_path).put(local_path, {"url": url, "size": size, "sha256": digest,
+                                                        "etag": None, "last_modified": None})
+        with self._lock:
+            self.adopted += 1
         return True
 
-    for entry in pool:
-        if not isinstance(entry, dict):
-            continue
-        if not looks_like_item(entry):
-            continue
+    def run(self):
+        # Un même fichier n'est récupéré qu'une fois, mais chaque demande est comptée
+        # (même comptabilité dl_ok/dl_ko que l'ancien téléchargement en ligne)
+        pending: dict[str, str] = {}
+        for url, local_path in self.jobs:
+            if local_path not in self.results:
+                pending.setdefault(local_path, url)
+        fetched, retried, nbytes = self.fetched, self.retried, self.bytes_downloaded
+        resumed, adopted = self.resumed, self.adopted
+        ok, ko = self.dl_ok, self.dl_ko
+        if pending:
+            # Manifestes créés avant les threads: _manifest_for n'y fait ensuite que des lectures
+            for lp in pending:
+                self._manifest_for(lp)
+            try:
+                with METRICS.stage("icon_download"), ThreadPoolExecutor(max_workers=self.workers) as ex:
+                    futures = {lp: ex.submit(self._fetch, url, lp) for lp, url in pending.items()}
+                    for lp, fut in futures.items():
+                        self.results[lp] = fut.result()
+            finally:
+                for manifest in ([self.manifest] if self.manifest is not None else self._manifests.values()):
+                    try:
+                        manifest.save()
+                    except OSError as exc:
+                        # Fichiers téléchargés malgré tout: le prochain run les adoptera
+                        print(f"[images] manifeste non sauvegardé ({manifest.path}): {exc}", file=sys.stderr)
+        for _, local_path in self.jobs:
+            if self.results.get(local_path):
+                self.dl_ok += 1
+            else:
+                self.dl_ko += 1
+        self.jobs = []
+        if self._queued is not None:
+            self._queued.clear()
+        METRICS.incr("dl_ok", self.dl_ok - ok)
+        METRICS.incr("dl_ko", self.dl_ko - ko)
+        METRICS.incr("dl_fetched", self.fetched - fetched)
+        METRICS.incr("dl_retries", self.retried - retried)
+        METRICS.incr("dl_bytes", self.bytes_downloaded - nbytes)
+        METRICS.incr("dl_resumed", self.resumed - resumed)
+        METRICS.incr("dl_adopted", self.adopted - adopted)
+        return self.dl_ok, self.dl_ko
+
+
+class PoolIndex:
+    # Index des chemins d'images du pool, construit une fois: basename -> chemin CDN en O(1)
+    loads = 0  # nombre de chargements effectifs du pool via shared()
+    _shared = None
+
+    def __init__(self, pool):
+        self.pool = pool
+        if isinstance(pool, MappedPool):
+            entries = pool.iter_strings()
+        else:
+            entries = pool if isinstance(pool, list) else []
+        self.image_paths = [s for s in entries if isinstance(s, str) and s.startswith("/images/")]
+        self.base_to_path: dict[str, str] = {}
+        self.webp_by_basename: dict[str, str] = {}
+        for p in self.image_paths:
+            base = os.path.splitext(os.path.basename(p))[0].lower()
+            self.base_to_path.setdefault(base, p)
+            if p.endswith(".webp"):
+                self.webp_by_basename.setdefault(base, p)
+        # Index trigrammes des chemins en minuscules, construit au premier besoin
+        self._lowered: list[str] | None = None
+        self._trigram_postings: dict[str, list[int]] | None = None
+        self._shapes: PoolShapes | None = None
+        self._economic: dict[str, bool] | None = None
+
+    @property
+    def shapes(self) -> "PoolShapes":
+        # Classification des dicts du pool par forme, une seule fois par pool chargé
+        if self._shapes is None:
+            self._shapes = PoolShapes(self.pool)
+        return self._shapes
+
+    @property
+    def economic_fields(self) -> dict[str, bool]:
+        # Champs économiques dont l'encodage est vérifié sur ce pool (voir ECONOMIC_FIELDS)
+        if self._economic is None:
+            self._economic = probe_economic_fields(self.pool, self.shapes.item_positions)
+        return self._economic
+
+    @classmethod
+    def shared(cls):
+        # Charge le pool au plus une fois par run
+        if cls._shared is None:
+            cls.loads += 1
+            use_mmap = os.getenv("POOL_MMAP", "0") == "1"
+            cls._shared = cls(load_mapped_pool() if use_mmap else load_pool())
+        return cls._shared
+
+    def cdn_path(self, basename: str) -> str | None:
+        key = os.path.splitext(os.path.basename(basename))[0].lower()
+        return self.webp_by_basename.get(key)
+
+    def _build_trigrams(self):
+        self._lowered = [p.lower() for p in self.image_paths]
+        postings: dict[str, list[int]] = {}
+        for i, p in enumerate(self._lowered):
+            for g in {p[j:j + 3] for j in range(len(p) - 2)}:
+                postings.setdefault(g, []).append(i)
+        self._trigram_postings = postings
+
+    def paths_containing(self, key: str, limit: int | None = None) -> list[str]:
+        # Chemins dont la forme minuscule contient key (doublons du pool compris, ordre du pool).
+        # limit permet de s'arrêter dès qu'on sait qu'il y a plusieurs correspondances.
+        if not key:
+            return []
+        if self._trigram_postings is None:
+            self._build_trigrams()
+        lowered = self._lowered
+        if len(key) < 3:
+            candidates = range(len(lowered))
+        else:
+            lists = []
+            for g in {key[j:j + 3] for j in range(len(key) - 2)}:
+                ids = self._trigram_postings.get(g)
+                if not ids:
+                    return []
+                lists.append(ids)
+            lists.sort(key=len)
+            candidates = lists[0]
+            for other in lists[1:]:
+                if len(candidates) <= 8:
+                    break
+                other_set = set(other)
+                candidates = [i for i in candidates if i in other_set]
+        out = []
+        for i in candidates:
+            if key in lowered[i]:
+                out.append(self.image_paths[i])
+                if limit is not None and len(out) >= limit:
+                    break
+        return out
+
+
+_MISS = object()
+
+
+class _ReadTracker:
+    # Vue du pool qui enregistre les positions lues (mode incrémental): chaque item
+    # connaît ainsi exactement la partie du pool dont dépend son extraction
+    def __init__(self, pool):
+        self.pool = pool
+        self.frames: list[set] = []
+
+    def __len__(self):
+        return len(self.pool)
+
+    def __getitem__(self, i):
+        if self.frames:
+            self.frames[-1].add(i)
+        return self.pool[i]
+
+    def push(self):
+        self.frames.append(set())
+
+    def pop(self) -> set:
+        deps = self.frames.pop()
+        if self.frames:
+            self.frames[-1] |= deps
+        return deps
+
+    def record(self, deps):
+        if self.frames and deps:
+            self.frames[-1] |= deps
+
+
+def build_resolver(pool, stats: dict | None = None, tracker: _ReadTracker | None = None):
+    # Caches indexés par position dans le pool: une référence partagée par des
+    # centaines d'items (catégorie, tier, attribut...) n'est résolue qu'une fois
+    if tracker is not None:
+        pool = tracker
+    n = len(pool)
+    deref_cache = [_MISS] * n
+    text_cache = [_MISS] * n
+    # Avec un tracker, chaque résultat en cache garde les positions lues pour le calculer
+    deref_deps = [None] * n if tracker is not None else None
+    text_deps = [None] * n if tracker is not None else None
+    if stats is None:
+        stats = {}
+    stats.setdefault("hits", 0)
+    stats.setdefault("misses", 0)
+    stats.setdefault("deref_steps", 0)
+
+    def _cached(cache, deps, value, compute):
+        cached = cache[value]
+        if cached is not _MISS:
+            stats["hits"] += 1
+            if deps is not None:
+                tracker.record(deps[value])
+            return cached
+        stats["misses"] += 1
+        if deps is None:
+            cached = cache[value] = compute(value)
+            return cached
+        tracker.push()
+        try:
+            cached = cache[value] = compute(value)
+        finally:
+            deps[value] = tracker.pop()
+        return cached
+
+    def deref_once(value):
+        if isinstance(value, int) and 0 <= value < n:
+            return pool[value]
+        return value
+
+    def _deref_chain(value, max_steps: int):
+        seen = set()
+        current = value
+        steps = 0
+        while isinstance(current, int) and 0 <= current < n and steps < max_steps:
+            if current in seen:
+                break
+            seen.add(current)
+            nxt = pool[current]
+            if nxt is current:
+                break
+            current = nxt
+            steps += 1
+        stats["deref_steps"] += steps
+        return current
+
+    def deref_chain(value, max_steps: int = 8):
+        if max_steps != 8 or not isinstance(value, int) or not 0 <= value < n:
+            return _deref_chain(value, max_steps)
+        return _cached(deref_cache, deref_deps, value, lambda v: _deref_chain(v, max_steps))
+
+    def _to_text(value):
+        v = deref_chain(value)
+        if isinstance(v, str):
+            # Écarter les chemins d'images et tokens évidents non textuels
+            if v.startswith("/images/") or "/textures/icons/" in v:
+                return None
+            return v
+        if isinstance(v, dict):
+            name_val = v.get("name")
+            if name_val is not None:
+                nv = deref_chain(name_val)
+                if isinstance(nv, str):
+                    if nv.startswith("/images/") or "/textures/icons/" in nv:
+                        return None
+                    return nv
+        return None
+
+    def to_text(value):
+        # Suit les indices jusqu'à obtenir une chaîne, ou un dict avec champ 'name'
+        if not isinstance(value, int) or not 0 <= value < n:
+            return _to_text(value)
+        return _cached(text_cache, text_deps, value, _to_text)
+
+    def to_value(value):
+        # Déréférence en chaîne mais sans expansion récursive de dict/list
+        v = deref_chain(value)
+        return v
+
+    return to_text, to_value
+
+
+def _take_text(to_text, value):
+    return to_text(value)
+
+
+def entry_id(entry: dict, to_value) -> int | None:
+    # ID numérique prioritaire
+    raw_id = entry.get("id")
+    if isinstance(raw_id, int):
+        return raw_id
+    id_raw = to_value(raw_id)
+    if isinstance(id_raw, dict) and "id" in id_raw and isinstance(id_raw["id"], (int, float)):
+        return int(id_raw["id"])  # normaliser en int
+    if isinstance(id_raw, int):
+        return id_raw
+    return None
+
+
+def is_valid_text(s: str) -> bool:
+    if not isinstance(s, str):
+        return False
+    if s.startswith("/images/") or "/textures/icons/" in s:
+        return False
+    # doit contenir au moins une lettre (y compris accentuée)
+    return any(ch.isalpha() for ch in s)
+
+
+# Noms manifestement non items
+ITEM_BAD_TOKENS = ("BP_", "InfoCard_", "ItemStats_", "seconds", "RPM")
+
+
+def item_identity(entry: dict, to_text, to_value) -> tuple[int, str] | None:
+    # (id, nom) d'une entrée retenue comme item, None si l'extraction l'écarte
+    item_id = entry_id(entry, to_value)
+    if not isinstance(item_id, int):
+        return None
+    nom = _take_text(to_text, entry.get("name"))
+    if not is_valid_text(nom) or any(tok in nom for tok in ITEM_BAD_TOKENS):
+        return None
+    return item_id, nom
+
+
+def looks_like_item(entry_dict: dict) -> bool:
+    # Exclure les objets "stat" simples
+    if all(k in entry_dict for k in ("key", "attribute", "value")) and len(entry_dict) <= 5:
+        return False
+    if "id" not in entry_dict or "name" not in entry_dict:
+        return False
+    # Au moins un des champs typiques d'item
+    typical_keys = {"mainCategoryId", "subCategoryId", "iconPath", "tier", "highestSellToVendorPrice", "volume", "filterCategoryIds"}
+    if not any(k in entry_dict for k in typical_keys):
+        return False
+    return True
+
+
+# Formes connues du pool (ensemble de clés -> type d'enregistrement)
+SHAPE_KINDS = (
+    ("stat", ("key", "attribute")),  # valeur absente quand elle est nulle
+    ("attribut", ("name", "higherIsBetter")),
+    ("attribut", ("name", "percentBased")),
+    ("palette", ("swatchColors",)),
+)
+
+
+class PoolShapes:
+    # Passe de classification unique: chaque dict du pool est rangé par la suite de ses clés
+    # (un hash de tuple par entrée), le type n'est calculé qu'une fois par forme distincte.
+    # looks_like_item ne dépend que des clés, il s'applique donc à la forme.
+    def __init__(self, pool):
+        self.keys: list[tuple] = []
+        self.kinds: list[str] = []
+        self.positions: list[list[int]] = []
+        shape_ids: dict[tuple, int] = {}
+        entries = pool.iter_dicts() if isinstance(pool, MappedPool) else enumerate(pool)
+        with METRICS.stage("classification"):
+            for pos, entry in entries:
+                if type(entry) is not dict:
+                    continue
+                keys = tuple(entry)
+                sid = shape_ids.get(keys)
+                if sid is None:
+                    sid = shape_ids[keys] = len(self.keys)
+                    self.keys.append(keys)
+                    self.kinds.append(self._kind(keys))
+                    self.positions.append([])
+                self.positions[sid].append(pos)
+        self._by_kind: dict[str, list[int]] = {}
+        self._sets: dict[str, frozenset] = {}
+
+    @staticmethod
+    def _kind(keys: tuple) -> str:
+        if looks_like_item(dict.fromkeys(keys)):
+            return "item"
+        if not keys:
+            return "vide"
+        for kind, required in SHAPE_KINDS:
+            if all(k in keys for k in required):
+                return kind
+        return "autre"
+
+    def of_kind(self, kind: str) -> list[int]:
+        # Positions triées (ordre du pool) de toutes les formes d'un type
+        out = self._by_kind.get(kind)
+        if out is None:
+            lists = [p for p, k in zip(self.positions, self.kinds) if k == kind]
+            out = self._by_kind[kind] = lists[0] if len(lists) == 1 else list(heapq.merge(*lists))
+        return out
+
+    def with_keys(self, *required: str, kind: str | None = None) -> list[int]:
+        # Positions des formes contenant toutes les clés demandées (ex: items avec "recipe")
+        lists = [p for p, keys, k in zip(self.positions, self.keys, self.kinds)
+                 if all(r in keys for r in required) and (kind is None or k == kind)]
+        return list(heapq.merge(*lists))
+
+    @property
+    def item_positions(self) -> list[int]:
+        return self.of_kind("item")
+
+    def position_set(self, kind: str) -> frozenset:
+        # Appartenance en O(1) (ex: un élément de liste désigne-t-il un triplet stat ?)
+        out = self._sets.get(kind)
+        if out is None:
+            out = self._sets[kind] = frozenset(self.of_kind(kind))
+        return out
+
+    def census(self) -> list[dict]:
+        rows = [{"type": k, "nb": len(p), "cles": sorted(keys)}
+                for keys, k, p in zip(self.keys, self.kinds, self.positions)]
+        return sorted(rows, key=lambda r: -r["nb"])
+
+    def report(self, limit: int = 20):
+        # Les formes "autre" signalent un type d'enregistrement apparu dans le pool
+        rows = self.census()
+        by_kind: dict[str, int] = {}
+        for r in rows:
+            by_kind[r["type"]] = by_kind.get(r["type"], 0) + r["nb"]
+        print(f"[shapes] formes={len(rows)} " + " ".join(f"{k}={n}" for k, n in sorted(by_kind.items())))
+        for r in rows[:limit]:
+            print(f"[shapes] {r['nb']:>7} {r['type']:<9} {{{', '.join(r['cles'])}}}")
+        for r in rows[limit:]:
+            if r["type"] == "autre":
+                print(f"[shapes] {r['nb']:>7} {r['type']:<9} {{{', '.join(r['cles'])}}}")
+
+
+def build_image_urls(path_str: str):
+    if not path_str:
+        return None, None
+    url = f"{CDN_ROOT}{path_str}?v={ASSET_VERSION}"
+    # Répertoire local miroir de l'arborescence CDN sous dossier racine 'images' (sans doubler)
+    sub_path = path_str.lstrip("/")
+    if sub_path.startswith("images/"):
+        sub_path = sub_path[len("images/"):]
+    local_path = os.path.join("images", sub_path)
+    return url, local_path
+
+
+def submit_all_images(downloader: IconDownloader, image_paths: list):
+    # Option DOWNLOAD_ALL_IMAGES: toutes les images du pool (au-delà des items extraits)
+    seen = set()
+    for p in image_paths:
+        if p in seen:
+            continue
+        seen.add(p)
+        url, local = build_image_urls(p)
+        downloader.submit(url, local)
+
+
+def extract_items(pool, downloader: IconDownloader | None = None, index: PoolIndex | None = None,
+                  incremental: 'IncrementalState | None' = None, positions: list[int] | None = None,
+                  download_all: bool | None = None, report: dict | None = None, verbose: bool = True):
+    return list(iter_extract_items(pool, downloader, index, incremental, positions, download_all, report, verbose))
+
+
+# Version de la sortie d'extract_one, à incrémenter dès qu'elle change (champ ajouté, décodage
+# modifié): elle entre dans le sel du mode incrémental, qui sinon resservirait d'anciens items
+EXTRACTOR_VERSION = 3
+
+
+def _submit_item_icons(downloader: IconDownloader, item: dict, counts: dict, icons: list):
+    # Icônes d'un item réutilisé (mode incrémental): mêmes soumissions et compteurs qu'extract_one.
+    # icons = [icône propre, icône de tier] telles que soumises à l'extraction d'origine
+    # (image_url retombe sur l'icône de tier, elle ne suffit pas à les distinguer).
+    own, tier = icons
+    if own:
+        downloader.submit(item["image_url"], item["image_local"])
+        counts["items_with_icon"] += 1
+    if tier:
+        downloader.submit(item["tier_icon_url"], item["tier_icon_local"])
+        counts["items_with_tier_icon"] += 1
+
+
+def _new_resolver_stats() -> dict:
+    # Compteurs initiaux d'une extraction (build_resolver et build_item_extractor ajoutent les leurs)
+    return {"icon_hits": 0, "icon_misses": 0, "icon_fallback": 0, "icon_fallback_hits": 0,
+            "deep_search_max_depth": 0}
+
+
+def build_item_extractor(pool, downloader: IconDownloader, index: PoolIndex, resolver_stats: dict,
+                         tracker: _ReadTracker | None = None):
+    # Résolveurs d'un pool et extract_one(entry) -> item | None, réutilisables entrée par entrée
+    # (extraction complète comme accès unitaire). counts cumule les items avec icône.
+    to_text, to_value = build_resolver(pool, resolver_stats, tracker)
+    # Sonde sur le pool brut et son index (décision globale, hors des lectures suivies)
+    economic = _economic_fields_for(pool, index)
+    stat_positions = (index.shapes if index.pool is pool else PoolShapes(pool)).position_set("stat")
+    if tracker is not None:
+        # Toutes les lectures des résolveurs ci-dessous passent par le tracker
+        pool = tracker
+    counts = {"items_with_icon": 0, "items_with_tier_icon": 0}
+    resolver_stats.setdefault("deep_memo_hits", 0)
+
+    # Index des chemins d'images du pool pour retrouver un chemin complet à partir d'un token
+    base_to_path = index.base_to_path
+
+    # Mémo par position: (résultat sous pool[pos], hauteur du sous-arbre parcouru, positions
+    # visitées). Seuls les parcours sans aucune coupure (position déjà visitée, limite de
+    # profondeur) sont retenus, et ils ne sont rejoués que si aucune de leurs positions n'est
+    # déjà dans visited_idx et si profondeur d'arrivée + hauteur reste sous max_depth: le
+    # parcours se déroulerait alors à l'identique, visited_idx reçoit les mêmes positions.
+    # Sans objet avec le tracker: un sous-arbre repris du mémo n'enregistrerait pas ses lectures.
+    node_memo: dict[int, tuple[str | None, int, frozenset]] | None = {} if tracker is None else None
+    walk = {"cuts": 0, "deepest": 0}
+    trail: list[int] = []
+
+    def deep_find_image_path(node, max_depth: int = 10, visited_idx: set | None = None, depth: int = 0):
+        if node is None:
+            return None
+        if depth > max_depth:
+            walk["cuts"] += 1
+            return None
+        if depth > resolver_stats["deep_search_max_depth"]:
+            resolver_stats["deep_search_max_depth"] = depth
+        if depth > walk["deepest"]:
+            walk["deepest"] = depth
+        # Chaîne directe
+        if isinstance(node, str) and node.startswith("/images/"):
+            return node
+        # Index dans le pool
+        if isinstance(node, int) and 0 <= node < len(pool):
+            if visited_idx is None:
+                # Nouvelle recherche: aucun parcours englobant n'enregistre de positions
+                visited_idx = set()
+                trail.clear()
+            if node in visited_idx:
+                walk["cuts"] += 1
+                return None
+            if node_memo is not None:
+                hit = node_memo.get(node)
+                if hit is not None and depth + hit[1] <= max_depth and hit[2].isdisjoint(visited_idx):
+                    resolver_stats["deep_memo_hits"] += 1
+                    walk["deepest"] = max(walk["deepest"], depth + hit[1])
+                    visited_idx.update(hit[2])
+                    trail.extend(hit[2])
+                    return hit[0]
+            visited_idx.add(node)
+            start = len(trail)
+            trail.append(node)
+            cuts, deepest = walk["cuts"], walk["deepest"]
+            walk["deepest"] = depth
+            found = deep_find_image_path(pool[node], max_depth, visited_idx, depth + 1)
+            if node_memo is not None and walk["cuts"] == cuts:
+                node_memo[node] = (found, walk["deepest"] - depth, frozenset(trail[start:]))
+            walk["deepest"] = max(walk["deepest"], deepest)
+            return found
+        # Dictionnaire: explorer valeurs
+        if isinstance(node, dict):
+            for v in node.values():
+                found = deep_find_image_path(v, max_depth, visited_idx, depth + 1)
+                if found:
+                    return found
+            return None
+        # Liste/tuple: explorer éléments
+        if isinstance(node, (list, tuple)):
+            for v in node:
+                found = deep_find_image_path(v, max_depth, visited_idx, depth + 1)
+                if found:
+                    return found
+            return None
+        # Autres types
+        return None
+
+    # Mémo des icônes par référence de pool (ex: tierIconPath partagé par des centaines d'items).
+    # La recherche profonde garde son propre ensemble visited_idx: le mémo ne porte que sur
+    # le résultat complet d'une référence, donc reste sûr face aux cycles.
+    icon_memo = [_MISS] * len(pool)
+    icon_deps = [None] * len(pool) if tracker is not None else None
+
+    def resolve_icon_path(ref):
+        if isinstance(ref, int) and 0 <= ref < len(pool):
+            cached = icon_memo[ref]
+            if cached is not _MISS:
+                resolver_stats["icon_hits"] += 1
+                if icon_deps is not None:
+                    tracker.record(icon_deps[ref])
+                return cached
+            resolver_stats["icon_misses"] += 1
+            if icon_deps is None:
+                cached = icon_memo[ref] = _resolve_icon_path(ref)
+                return cached
+            tracker.push()
+            try:
+                cached = icon_memo[ref] = _resolve_icon_path(ref)
+            finally:
+                icon_deps[ref] = tracker.pop()
+            return cached
+        return _resolve_icon_path(ref)
+
+    def _resolve_icon_path(ref):
+        if ref is None:
+            return None
+        # 1) Recherche profonde autour du nœud
+        found = deep_find_image_path(ref)
+        if isinstance(found, str):
+            return found
+        # 2) Heuristique avec token de base
+        s = to_text(ref) or to_value(ref)
+        if isinstance(s, str):
+            key = os.path.splitext(os.path.basename(s))[0].lower()
+            if key in base_to_path:
+                return base_to_path[key]
+            # Dernier recours: une seule image contenant le token (2 suffisent pour conclure)
+            resolver_stats["icon_fallback"] += 1
+            matches = index.paths_containing(key, limit=2)
+            if len(matches) == 1:
+                resolver_stats["icon_fallback_hits"] += 1
+                return matches[0]
+        return None
+
+    def to_bool(value):
+        v = to_value(value)
+        if isinstance(v, bool):
+            return v
+        if isinstance(v, (int, float)):
+            return v != 0
+        return bool(v)
+
+    def to_number(value):
+        # Tente d'obtenir un nombre sans expansion profonde
+        if isinstance(value, (int, float)):
+            return value
+        if isinstance(value, int) and 0 <= value < len(pool):
+            v2 = pool[value]
+            if isinstance(v2, (int, float)):
+                return v2
+        # Évite d'interpréter arbitrairement d'autres structures
+        return None
+
+    def humanize_attribute_values(ref):
+        # Résout une liste d'objets { key, attribute, value }
+        root = to_value(ref)
+        # Si ref pointe vers une liste d'indices, déréf une fois
+        if isinstance(root, int) and 0 <= root < len(pool):
+            root = pool[root]
+        if not isinstance(root, list):
+            return []
+        output = []
+        for elem in root:
+            if type(elem) is int:
+                # Seules les positions classées "stat" ({key, attribute[, value]}) sont lues
+                if elem not in stat_positions:
+                    continue
+                e = pool[elem]
+            elif isinstance(elem, dict):
+                e = elem
+            else:
+                continue
+            attr_desc = to_value(e.get("attribute"))
+            # Déréf léger de l'attribut
+            if isinstance(attr_desc, int) and 0 <= attr_desc < len(pool):
+                attr_desc = pool[attr_desc]
+            attr_name = None
+            percent_based = None
+            higher_is_better = None
+            if isinstance(attr_desc, dict):
+                attr_name = to_text(attr_desc.get("name")) or to_text(attr_desc)
+                percent_based = to_bool(attr_desc.get("percentBased")) if "percentBased" in attr_desc else None
+                higher_is_better = to_bool(attr_desc.get("higherIsBetter")) if "higherIsBetter" in attr_desc else None
+            else:
+                attr_name = to_text(attr_desc)
+
+            val_num = to_number(e.get("value"))
+
+            output.append({
+                "attribut": attr_name or "",
+                "valeur": val_num if val_num is not None else e.get("value"),
+                "est_pourcentage": percent_based,
+                "mieux_plus_haut": higher_is_better
+            })
+        # Filtrer attributs sans nom
+        return [o for o in output if o.get("attribut")]
+
+    # Pas d'index global id->libellé (trop de collisions inter-tables)
+
+    def extract_one(entry):
+        identity = item_identity(entry, to_text, to_value)
+        if identity is None:
+            return None
+        id_out, nom = identity
+
+        # Catégories: tenter divers chemins textuels
+        # Catégories lisibles si possible
+        main_cat_val = to_value(entry.get("mainCategoryId"))
+        sub_cat_val = to_value(entry.get("subCategoryId"))
+        categorie = _take_text(to_text, entry.get("mainCategoryId"))
+        if not is_valid_text(categorie):
+            categorie = None
+        sous_categorie = _take_text(to_text, entry.get("subCategoryId"))
+        if not is_valid_text(sous_categorie):
+            sous_categorie = None
+
+        tier = to_value(entry.get("tier")) if "tier" in entry else None
+        unique_raw = to_value(entry.get("isUnique")) if "isUnique" in entry else False
+        unique = unique_raw if isinstance(unique_raw, bool) else bool(unique_raw)
+        description = _take_text(to_text, entry.get("description"))
+        statistiques = humanize_attribute_values(entry.get("attributeValues")) if "attributeValues" in entry else []
+        # Recettes et sources: laisser la structure brute si non textuelle,
+        # mais tenter une extraction de libellés quand possible
+        def humanize_list_entries(ref_list):
+            v = to_value(ref_list)
+            if isinstance(v, int) and 0 <= v < len(pool):
+                v = pool[v]
+            if not isinstance(v, list):
+                return v
+            out = []
+            for x in v:
+                label = to_text(x)
+                out.append(label if isinstance(label, str) and label else to_value(x))
+            return out
+
+        schema = humanize_list_entries(entry.get("recipe")) if "recipe" in entry else []
+        sources = humanize_list_entries(entry.get("sources")) if "sources" in entry else []
+        # Icône d'item
+        icon_path = resolve_icon_path(entry.get("iconPath")) or resolve_icon_path(entry.get("icon"))
+        image_url, image_local = build_image_urls(icon_path)
+        if image_url and image_local:
+            downloader.submit(image_url, image_local)
+            counts["items_with_icon"] += 1
+        # Icône de tier (palier)
+        tier_icon_path = resolve_icon_path(entry.get("tierIconPath"))
+        tier_icon_url, tier_icon_local = build_image_urls(tier_icon_path)
+        if tier_icon_url and tier_icon_local:
+            downloader.submit(tier_icon_url, tier_icon_local)
+            counts["items_with_tier_icon"] += 1
+        image = _take_text(to_text, entry.get("iconPath")) or _take_text(to_text, entry.get("icon"))
+        url_fiche = _take_text(to_text, entry.get("url"))
+
+        return {
+            "id": id_out,
+            "nom": nom,
+            "categorie": categorie or "",
+            "sous_categorie": sous_categorie or "",
+            "tier": tier,
+            "unique": unique,
+            "description": description or "",
+            "statistiques": statistiques,
+            "schema": schema if isinstance(schema, list) else (schema or []),
+            "sources": sources if isinstance(sources, list) else (sources or []),
+            "image": image or "",
+            "image_url": image_url or tier_icon_url or "",
+            "image_local": image_local or tier_icon_local or "",
+            "tier_icon_url": tier_icon_url or "",
+            "tier_icon_local": tier_icon_local or "",
+            "url_fiche": url_fiche or "",
+            **{field: _economic_number(pool, entry.get(key)) if economic[field] else None
+               for field, key in ECONOMIC_FIELDS}
+        }
+
+    return extract_one, to_text, to_value, counts
+
+
+def iter_extract_items(pool, downloader: IconDownloader | None = None, index: PoolIndex | None = None,
+                       incremental: 'IncrementalState | None' = None, positions: list[int] | None = None,
+                       download_all: bool | None = None, report: dict | None = None, verbose: bool = True):
+    # Générateur: les items sont produits au fil de l'extraction, les téléchargements
+    # et les compteurs sont traités une fois le générateur épuisé
+    resolver_stats = _new_resolver_stats()
+    tracker = _ReadTracker(pool) if incremental is not None else None
+    if index is None:
+        index = PoolIndex(pool)
+    raw_pool = pool
+    if tracker is not None:
+        incremental.bind(raw_pool, index)
+    # Un downloader fourni par l'appelant est exécuté par celui-ci (ex: icônes partagées entre langues)
+    own_downloader = downloader is None
+    if own_downloader:
+        downloader = IconDownloader()
+    extract_one, _, _, counts = build_item_extractor(raw_pool, downloader, index, resolver_stats, tracker)
+    image_paths = index.image_paths
+    images_found_pool = len(image_paths)
+
+    if positions is None:
+        # Seules les positions des formes "item" sont parcourues: la classification a déjà
+        # appliqué looks_like_item à chaque forme, aucune entrée n'est retestée ici
+        # (positions fournies par l'appelant: sous-ensemble de item_positions, ex. shards)
+        positions = index.shapes.item_positions if index.pool is raw_pool else PoolShapes(raw_pool).item_positions
+    # Chronométrage hors des yield: le temps passé chez le consommateur n'est pas compté
+    resolve_s = 0.0
+    clock = time.perf_counter
+    for pos in positions:
+        entry = raw_pool[pos]
+        t0 = clock()
+        if tracker is None:
+            item = extract_one(entry)
+        else:
+            # Mode incrémental: réutiliser l'item précédent si rien n'a changé dans ce qu'il a lu
+            item = incremental.reuse(pos)
+            if item is not None:
+                _submit_item_icons(downloader, item, counts, incremental.current[str(pos)].get("icones") or [False, False])
+            else:
+                before = (counts["items_with_icon"], counts["items_with_tier_icon"])
+                tracker.push()
+                tracker.record({pos})
+                try:
+                    item = extract_one(entry)
+                finally:
+                    deps = tracker.pop()
+                if item is not None:
+                    icons = [counts["items_with_icon"] > before[0], counts["items_with_tier_icon"] > before[1]]
+                    incremental.remember(item, pos, deps, icons)
+        resolve_s += clock() - t0
+        if item is not None:
+            yield item
+    METRICS.add_time("resolution", resolve_s)
+    for k in ("hits", "misses", "deref_steps", "icon_hits", "icon_misses", "icon_fallback", "icon_fallback_hits",
+              "deep_memo_hits"):
+        METRICS.incr(f"resolver_{k}", resolver_stats[k])
+    METRICS.observe_max("deep_search_max_depth", resolver_stats["deep_search_max_depth"])
+
+    if download_all is None:
+        download_all = os.getenv("DOWNLOAD_ALL_IMAGES", "0") == "1"
+    if download_all:
+        submit_all_images(downloader, image_paths)
+
+    if report is not None:
+        report.update(resolver_stats)
+        report.update(pool=images_found_pool, items_with_icon=counts["items_with_icon"], items_with_tier_icon=counts["items_with_tier_icon"])
+    if verbose:
+        print(f"[resolver] hits={resolver_stats['hits']} misses={resolver_stats['misses']} icon_hits={resolver_stats['icon_hits']} icon_misses={resolver_stats['icon_misses']} "
+              f"icon_fallback={resolver_stats['icon_fallback']} icon_fallback_hits={resolver_stats['icon_fallback_hits']}")
+        ignored = [f for f, ok in _economic_fields_for(raw_pool, index).items() if not ok]
+        if ignored:
+            print(f"[economie] champs absents ou aux références incohérentes, exportés à None: {', '.join(ignored)}")
+    if own_downloader:
+        images_downloaded_ok, images_downloaded_ko = downloader.run()
+        if verbose:
+            print(f"[images] pool={images_found_pool} items_with_icon={counts['items_with_icon']} items_with_tier_icon={counts['items_with_tier_icon']} dl_ok={images_downloaded_ok} dl_ko={images_downloaded_ko}")
+    elif verbose:
+        print(f"[images] pool={images_found_pool} items_with_icon={counts['items_with_icon']} items_with_tier_icon={counts['items_with_tier_icon']} dl_en_attente={len(downloader.jobs)}")
+
+
+# Pool et PoolIndex partagés avec les workers forkés (copy-on-write, jamais re-picklés)
+_SHARED_POOL = None
+_SHARED_INDEX = None
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "0") or 0)
+
+
+def _extract_shard(positions: list[int]):
+    # Métriques propres au shard, fusionnées par le parent
+    METRICS.reset()
+    started = time.perf_counter()
+    downloader = IconDownloader(workers=1)
+    report: dict = {}
+    items = extract_items(_SHARED_POOL, downloader=downloader, index=_SHARED_INDEX, positions=positions,
+                          download_all=False, report=report, verbose=False)
+    report["seconds"] = time.perf_counter() - started
+    report["metrics"] = METRICS.snapshot()
+    return items, downloader.jobs, report
+
+
+def extract_items_parallel(pool, workers: int | None = None, index: PoolIndex | None = None,
+                           downloader: IconDownloader | None = None, shards_per_worker: int = 4):
+    # Même résultat que extract_items (mêmes items, même ordre), réparti sur des processus forkés.
+    # Sans fork (Windows) ou avec un seul worker, on retombe sur le chemin série.
+    global _SHARED_POOL, _SHARED_INDEX
+    workers = workers or EXTRACT_WORKERS or (os.cpu_count() or 1)
+    if index is None:
+        index = PoolIndex(pool)
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return extract_items(pool, downloader=downloader, index=index)
+
+    started = time.perf_counter()
+    if index.pool is not pool:
+        index = PoolIndex(pool)
+    candidates = index.shapes.item_positions
+    n_shards = max(1, min(len(candidates), workers * shards_per_worker))
+    size = -(-len(candidates) // n_shards) if candidates else 1
+    shards = [candidates[i:i + size] for i in range(0, len(candidates), size)]
+
+    own_downloader = downloader is None
+    if own_downloader:
+        downloader = IconDownloader()
+    items_out = []
+    totals = {"items_with_icon": 0, "items_with_tier_icon": 0, "hits": 0, "misses": 0}
+    shard_seconds = []
+    # Index des chemins complété avant le fork (trigrammes du repli d'icône compris):
+    # sinon chaque shard le reconstruirait sur tout le pool
+    if index._trigram_postings is None:
+        index._build_trigrams()
+    _SHARED_POOL, _SHARED_INDEX = pool, index
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as ex:
+            # map() rend les shards dans l'ordre de soumission: ordre série préservé
+            for items, jobs, report in ex.map(_extract_shard, shards):
+                items_out.extend(items)
+                downloader.jobs.extend(jobs)
+                for k in totals:
+                    totals[k] += report.get(k, 0)
+                shard_seconds.append(report["seconds"])
+                METRICS.merge(report["metrics"])
+    finally:
+        _SHARED_POOL = _SHARED_INDEX = None
+    if os.getenv("DOWNLOAD_ALL_IMAGES", "0") == "1":
+        submit_all_images(downloader, index.image_paths)
+    wall = time.perf_counter() - started
+
+    cpu_sum = sum(shard_seconds)
+    print(f"[parallel] workers={workers} shards={len(shards)} candidats={len(candidates)} wall={wall:.2f}s "
+          f"somme_shards={cpu_sum:.2f}s plus_long={max(shard_seconds, default=0):.2f}s "
+          f"acceleration={cpu_sum / wall if wall else 0:.1f}x")
+    print(f"[resolver] hits={totals['hits']} misses={totals['misses']}")
+    if own_downloader:
+        dl_ok, dl_ko = downloader.run()
+        print(f"[images] pool={len(index.image_paths)} items_with_icon={totals['items_with_icon']} items_with_tier_icon={totals['items_with_tier_icon']} dl_ok={dl_ok} dl_ko={dl_ko}")
+    return items_out
+
+
+EXPORT_PATH = "dune_awakening_items_fr.json"
+# Empreintes par item (mode incrémental) et changeset du dernier run
+EXPORT_FP_PATH = "dune_awakening_items_fr.fingerprints.json"
+CHANGESET_PATH = "dune_awakening_items_fr.changes.json"
+
+
+def item_key(item: dict) -> str:
+    # Clé stable d'un item exporté: id numérique, sinon url_fiche (items issus du HTML)
+    if item.get("id") is not None:
+        return str(item["id"])
+    return item.get("url_fiche") or ""
+
+
+def write_export(path: str, data: dict):
+    # Export JSON indenté, remplacé d'un bloc (jamais tronqué si le run s'interrompt)
+    _atomic_write_bytes(path, json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"))
+
+
+def load_export(path: str = EXPORT_PATH) -> list:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    items = data.get("items") if isinstance(data, dict) else None
+    return items if isinstance(items, list) else []
+
+
+class IncrementalState:
+    # Empreinte de chaque item = hash du contenu des positions du pool lues pendant son extraction
+    # (+ un sel global: version de l'extracteur, racine CDN, version d'assets, chemins d'images). Si ces positions
+    # n'ont pas changé, l'item précédent est réutilisé tel quel sans réextraction.
+    def __init__(self, prev_items: list, fp_path: str = EXPORT_FP_PATH):
+        self.fp_path = fp_path
+        self.prev_by_key = {item_key(it): it for it in prev_items}
+        self.prev: dict[str, dict] = {}
+        self.prev_salt = None
+        try:
+            with open(fp_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.prev = data.get("items") or {}
+            self.prev_salt = data.get("salt")
+        except (OSError, ValueError, AttributeError):
+            pass
+        self.current: dict[str, dict] = {}
+        self.pool = None
+        self.salt = None
+        self.reused = 0
+        self.extracted = 0
+
+    @classmethod
+    def following(cls, prev_state: "IncrementalState", prev_items: list) -> "IncrementalState":
+        # Enchaînement en mémoire (mode WATCH): les empreintes du run précédent sans relire le disque
+        state = cls.__new__(cls)
+        state.fp_path = prev_state.fp_path
+        state.prev_by_key = {item_key(it): it for it in prev_items}
+        state.prev = prev_state.current
+        state.prev_salt = prev_state.salt
+        state.current = {}
+        state.pool = None
+        state.salt = None
+        state.reused = 0
+        state.extracted = 0
+        return state
+
+    def bind(self, pool, index: PoolIndex):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{EXTRACTOR_VERSION}|{CDN_ROOT}|{ASSET_VERSION}".encode("utf-8"))
+        # Champs économiques retenus: décidés sur tout le pool, hors des lectures suivies
+        economic = _economic_fields_for(pool, index)
+        h.update(json.dumps(economic, sort_keys=True).encode("utf-8"))
+        for p in index.image_paths:
+            h.update(p.encode("utf-8"))
+            h.update(b"\0")
+        self.pool = pool
+        self.salt = h.hexdigest()
+
+    def _fingerprint(self, deps) -> str | None:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(self.salt.encode("utf-8"))
+        n = len(self.pool)
+        for p in sorted(deps):
+            if not 0 <= p < n:
+                return None
+            h.update(f"{p}:".encode("utf-8"))
+            h.update(json.dumps(self.pool[p], ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        return h.hexdigest()
+
+    def reuse(self, pos: int) -> dict | None:
+        prev = self.prev.get(str(pos))
+        if not prev or self.salt != self.prev_salt:
+            return None
+        item = self.prev_by_key.get(prev.get("key"))
+        if item is None or self._fingerprint(prev.get("deps") or []) != prev.get("fp"):
+            return None
+        self.current[str(pos)] = prev
+        self.reused += 1
+        return item
+
+    def remember(self, item: dict, pos: int, deps: set, icons: list | None = None):
+        self.current[str(pos)] = {"key": item_key(item), "fp": self._fingerprint(deps), "deps": sorted(deps),
+                                  "icones": icons or [False, False]}
+        self.extracted += 1
+
+    def save(self):
+        _atomic_write_bytes(self.fp_path, json.dumps({"salt": self.salt, "items": self.current},
+                                                     separators=(",", ":")).encode("utf-8"))
+
+
+def diff_items(prev_items: list, items: list) -> dict:
+    prev_by_key = {item_key(it): it for it in prev_items}
+    new_by_key = {item_key(it): it for it in items}
+    added = [it for k, it in new_by_key.items() if k not in prev_by_key]
+    modified = [it for k, it in new_by_key.items() if k in prev_by_key and prev_by_key[k] != it]
+    removed = [k for k in prev_by_key if k not in new_by_key]
+    return {"added": added, "modified": modified, "removed": removed}
+
+
+# Graphe des recettes (RECIPE_GRAPH=1): item -> ingrédients avec quantités, nomenclature
+# des matières premières précalculée pour chaque item fabricable
+RECIPES_PATH = "dune_awakening_items_fr.recipes.json"
+# Noms de clés supposés: les pools fournis (items.json, items_fr.json) n'ont aucune entrée
+# "recipe", ces listes reprennent les conventions usuelles des exports de jeux et restent
+# à confirmer sur un pool qui en contient. Une recette dont aucune clé n'est reconnue est ignorée
+# (item sans arête), jamais mal interprétée.
+RECIPE_LIST_KEYS = ("ingredients", "items", "inputs", "components")
+RECIPE_YIELD_KEYS = ("yield", "outputQuantity", "outputAmount")
+INGREDIENT_REF_KEYS = ("item", "itemId", "ingredient", "ingredientId", "template")
+INGREDIENT_QTY_KEYS = ("quantity", "amount", "count", "qty")
+
+
+def _literal_number(pool, ref) -> float | None:
+    # Une quantité est une valeur littérale: un seul saut dans le pool (deref_chain
+    # confondrait l'entier lu avec un nouvel indice)
+    value = pool[ref] if isinstance(ref, int) and 0 <= ref < len(pool) else ref
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+# Champs économiques: références d'un saut vers un nombre du pool (les indices vont par paires
+# consécutives vente/achat, dans l'ordre de parcours de l'encodeur). L'encodage est vérifié sur
+# le pool: un champ dont trop de références ne tombent pas sur un nombre (pool incohérent,
+# encodage différent) est exporté à None plutôt qu'avec des valeurs prises au hasard.
+ECONOMIC_FIELDS = (("volume", "volume"), ("prix_vente_max", "highestSellToVendorPrice"),
+                   ("prix_achat_base", "baseBuyFromVendorPrice"))
+ECONOMIC_MIN_RATIO = float(os.environ.get("ECONOMIC_MIN_RATIO", "0.9"))
+
+
+def _economic_number(pool, ref) -> float | None:
+    # Volume ou prix: nombre fini et positif, sinon inconnu
+    value = _literal_number(pool, ref)
+    if value is None or not math.isfinite(value) or value < 0:
+        return None
+    return value
+
+
+def probe_economic_fields(pool, positions) -> dict[str, bool]:
+    # Part des références de chaque champ qui désignent un nombre valide, sur les items du pool
+    found = {key: [0, 0] for _, key in ECONOMIC_FIELDS}
+    for p in positions:
+        entry = pool[p]
+        if not isinstance(entry, dict):
+            continue
+        for key, tally in found.items():
+            if key in entry and entry[key] is not None:
+                tally[1] += 1
+                tally[0] += _economic_number(pool, entry[key]) is not None
+    return {field: found[key][1] > 0 and found[key][0] >= ECONOMIC_MIN_RATIO * found[key][1]
+            for field, key in ECONOMIC_FIELDS}
+
+
+def _economic_fields_for(pool, index: "PoolIndex") -> dict[str, bool]:
+    # Sonde portée par l'index quand il décrit ce pool, sinon recalculée
+    return index.economic_fields if index.pool is pool else PoolIndex(pool).economic_fields
+
+
+def _compact_qty(q: float):
+    q = round(q, 6)
+    return int(q) if q == int(q) else q
+
+
+def parse_recipe(entry: dict, pool, to_value) -> tuple[list[tuple[int, float]], float] | None:
+    # Accepte une liste d'ingrédients ou un dict {ingredients: [...], yield: n};
+    # chaque ingrédient est un item (dict avec id) ou un dict {item|itemId...: ref, quantity: n}
+    rec = to_value(entry.get("recipe"))
+    out_qty = 1
+    if isinstance(rec, dict):
+        for k in RECIPE_YIELD_KEYS:
+            q = _literal_number(pool, rec[k]) if k in rec else None
+            if q:
+                out_qty = q
+                break
+        rec = next((to_value(rec[k]) for k in RECIPE_LIST_KEYS if k in rec), None)
+    if not isinstance(rec, list) or not rec:
+        return None
+    ingredients: dict[int, float] = {}
+    for x in rec:
+        v = to_value(x)
+        if not isinstance(v, dict):
+            continue
+        qty = 1
+        for k in INGREDIENT_QTY_KEYS:
+            q = _literal_number(pool, v[k]) if k in v else None
+            if q is not None:
+                qty = q
+                break
+        target = v
+        for k in INGREDIENT_REF_KEYS:
+            if k in v:
+                t = to_value(v[k])
+                target = t if isinstance(t, dict) else {"id": v[k]}
+                break
+        ing = entry_id(target, to_value)
+        if isinstance(ing, int) and qty > 0:
+            ingredients[ing] = ingredients.get(ing, 0) + qty
+    if not ingredients:
+        return None
+    return list(ingredients.items()), out_qty
+
+
+class RecipeGraph:
+    # DAG item -> ingrédients. Les quantités sont ramenées à une unité produite.
+    # bom[id] = matières premières (items sans recette) pour fabriquer 1 id, calculée
+    # dans l'ordre topologique (ingrédients d'abord); les items pris dans un cycle, ou qui
+    # en dépendent, n'ont pas de nomenclature.
+    def __init__(self):
+        self.edges: dict[int, list[tuple[int, float]]] = {}
+        self.order: list[int] = []
+        self.cycles: list[list[int]] = []
+        self.bom: dict[int, dict[int, float]] = {}
+
+    @classmethod
+    def from_pool(cls, pool, positions: list[int] | None = None, shapes: "PoolShapes | None" = None) -> "RecipeGraph":
+        _, to_value = build_resolver(pool)
+        graph = cls()
+        if positions is None:
+            # Formes "item" portant une clé recipe: rien à revérifier entrée par entrée
+            positions = (shapes or PoolShapes(pool)).with_keys("recipe", kind="item")
+        for entry in (pool[p] for p in positions):
+            item = entry_id(entry, to_value)
+            parsed = parse_recipe(entry, pool, to_value) if isinstance(item, int) else None
+            if parsed is None:
+                continue
+            ingredients, out_qty = parsed
+            graph.edges[item] = [(ing, q / out_qty) for ing, q in ingredients]
+        return graph.finish()
+
+    def _components(self) -> list[list[int]]:
+        # Tarjan itératif: composantes fortement connexes émises puits d'abord
+        # (donc ingrédients avant les items qui les consomment)
+        index: dict[int, int] = {}
+        low: dict[int, int] = {}
+        on_stack: set[int] = set()
+        stack: list[int] = []
+        out: list[list[int]] = []
+        nodes = list(self.edges)
+        for ings in self.edges.values():
+            nodes.extend(i for i, _ in ings)
+        for root in nodes:
+            if root in index:
+                continue
+            work = [(root, 0)]
+            while work:
+                node, i = work.pop()
+                if i == 0:
+                    index[node] = low[node] = len(index)
+                    stack.append(node)
+                    on_stack.add(node)
+                succ = self.edges.get(node, ())
+                if i < len(succ):
+                    work.append((node, i + 1))
+                    nxt = succ[i][0]
+                    if nxt not in index:
+                        work.append((nxt, 0))
+                    elif nxt in on_stack:
+                        low[node] = min(low[node], index[nxt])
+                    continue
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    comp = []
+                    while True:
+                        w = stack.pop()
+                        on_stack.discard(w)
+                        comp.append(w)
+                        if w == node:
+                            break
+                    out.append(comp)
+        return out
+
+    def finish(self) -> "RecipeGraph":
+        self.order, self.cycles, self.bom = [], [], {}
+        blocked: set[int] = set()
+        for comp in self._components():
+            node = comp[0]
+            if len(comp) > 1 or any(i == node for i, _ in self.edges.get(node, ())):
+                self.cycles.append(sorted(comp))
+                blocked.update(comp)
+                continue
+            self.order.append(node)
+            ings = self.edges.get(node)
+            if not ings:
+                continue
+            if any(i in blocked for i, _ in ings):
+                blocked.add(node)
+                continue
+            totals: dict[int, float] = {}
+            for ing, q in ings:
+                sub = self.bom.get(ing)
+                if sub is None:
+                    totals[ing] = totals.get(ing, 0) + q
+                else:
+                    for raw, rq in sub.items():
+                        totals[raw] = totals.get(raw, 0) + q * rq
+            self.bom[node] = totals
+        return self
+
+    def materials(self, item_id: int, n: float = 1) -> dict[int, float] | None:
+        # "Que faut-il pour fabriquer item_id x n": lecture de table puis multiplication
+        if item_id not in self.edges:
+            return {item_id: n}
+        bom = self.bom.get(item_id)
+        if bom is None:
+            return None
+        return {raw: _compact_qty(q * n) for raw, q in bom.items()}
+
+    def save(self, path: str = RECIPES_PATH, meta: dict | None = None):
+        data = {
+            "meta": {**(meta or {}), "nb_recettes": len(self.edges), "nb_cycles": len(self.cycles)},
+            "adjacence": {str(k): [[i, _compact_qty(q)] for i, q in v] for k, v in self.edges.items()},
+            "nomenclature": {str(k): [[i, _compact_qty(q)] for i, q in sorted(v.items())] for k, v in self.bom.items()},
+            "ordre": self.order,
+            "cycles": self.cycles,
+        }
+        _atomic_write_bytes(path, json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def load(cls, path: str = RECIPES_PATH) -> "RecipeGraph":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        graph = cls()
+        graph.edges = {int(k): [(i, q) for i, q in v] for k, v in data["adjacence"].items()}
+        graph.bom = {int(k): {i: q for i, q in v} for k, v in data["nomenclature"].items()}
+        graph.order = data["ordre"]
+        graph.cycles = data["cycles"]
+        return graph
+
+
+# Accès unitaire aux items (bot, API): index persistant id/url_fiche -> position dans le pool,
+# items résolus au premier accès puis gardés dans un LRU borné
+CATALOG_INDEX_DIR = os.getenv("CATALOG_INDEX_DIR", os.path.join(POOL_CACHE_DIR, "catalog"))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "512") or 512)
+CATALOG_INDEX_VERSION = 2
+
+
+class _LRUCache:
+    # Partagé entre threads (bot, API): l'OrderedDict et les compteurs changent sous verrou
+    def __init__(self, maxsize: int):
+        self.maxsize = max(0, maxsize)
+        self._data: OrderedDict = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISS):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"taille": len(self._data), "max": self.maxsize, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "taux_hit": round(self.hits / total, 4) if total else 0.0}
+
+
+class Catalog:
+    # Catalog.get(id) / Catalog.by_url(url_fiche) sans extraction complète du pool.
+    # Les résolveurs (et leurs caches par position) sont construits une fois par pool;
+    # l'index id -> position est relu depuis le disque tant que la signature du pool
+    # ne change pas. Chaque position est revérifiée à la résolution: un index périmé
+    # est reconstruit au lieu de rendre un autre item.
+    def __init__(self, pool, signature: str | None = None, index: PoolIndex | None = None,
+                 cache_size: int = CATALOG_CACHE_SIZE, index_dir: str | None = CATALOG_INDEX_DIR,
+                 lang: str = LANG, downloader: IconDownloader | None = None):
+        self.pool = pool
+        self.index = index if index is not None and index.pool is pool else PoolIndex(pool)
+        # Les icônes des items résolus sont mises en file (une fois par fichier, quel que soit
+        # le nombre de résolutions); download_icons() les récupère
+        self.downloader = downloader or IconDownloader(unique=True)
+        self.resolver_stats = _new_resolver_stats()
+        self._extract_one, self._to_text, self._to_value, _ = build_item_extractor(
+            pool, self.downloader, self.index, self.resolver_stats)
+        self.signature = signature or f"n{len(pool)}"
+        self.index_path = (os.path.join(index_dir, f"{lang}-{self.signature}.json")
+                           if index_dir else None)
+        self.positions: dict[int, int] = {}
+        self.urls: dict[str, int] = {}
+        self.index_source = None
+        self.cache = _LRUCache(cache_size)
+        self._load_or_build_index()
+
+    @classmethod
+    def open(cls, lang: str = LANG, **kwargs) -> "Catalog":
+        # Pool du cache local (ou CDN), signé par le sha256 du blob; POOL_MMAP=1: pool binaire
+        if os.getenv("POOL_MMAP", "0") == "1":
+            pool = load_mapped_pool()
+            st = os.stat(pool.path)
+            return cls(pool, signature=f"mmap-{st.st_size}-{st.st_mtime_ns}", lang=lang, **kwargs)
+        pool = load_pool(lang)
+        ref = PoolCache(lang=lang).read_ref()
+        return cls(pool, signature=ref["sha256"][:16] if ref else None, lang=lang, **kwargs)
+
+    def _load_or_build_index(self):
+        if self.index_path:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = None
+            if (isinstance(data, dict) and data.get("version") == CATALOG_INDEX_VERSION
+                    and data.get("n") == len(self.pool)):
+                self.positions = {int(k): v for k, v in data["positions"].items()}
+                self.urls = data["urls"]
+                self.index_source = "disque"
+                return
+        self.rebuild_index()
+
+    def rebuild_index(self):
+        # Seules les formes "item" sont lues, avec les filtres d'extract_one (id, nom valide):
+        # premier item retenu pour un id ou une url donnés, une entrée écartée ne masque pas
+        # un item valide de même id
+        with METRICS.stage("catalog_index"):
+            positions: dict[int, int] = {}
+            urls: dict[str, int] = {}
+            for pos in self.index.shapes.item_positions:
+                entry = self.pool[pos]
+                identity = item_identity(entry, self._to_text, self._to_value)
+                if identity is None:
+                    continue
+                item_id = identity[0]
+                positions.setdefault(item_id, pos)
+                url = _take_text(self._to_text, entry.get("url"))
+                if url:
+                    urls.setdefault(url, item_id)
+        self.positions, self.urls = positions, urls
+        self.index_source = "construit"
+        self.cache.clear()
+        if self.index_path:
+            data = {"version": CATALOG_INDEX_VERSION, "n": len(self.pool), "signature": self.signature,
+                    "positions": {str(k): v for k, v in positions.items()}, "urls": urls}
+            _atomic_write_bytes(self.index_path, json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, item_id) -> bool:
+        return item_id in self.positions
+
+    def ids(self) -> list[int]:
+        return list(self.positions)
+
+    def _resolve(self, item_id: int, pos: int) -> dict | None:
+        entry = self.pool[pos]
+        if not isinstance(entry, dict) or entry_id(entry, self._to_value) != item_id:
+            return _MISS
+        with METRICS.stage("catalog_resolve"):
+            item = self._extract_one(entry)
+            if item is not None:
+                parsed = parse_recipe(entry, self.pool, self._to_value) if "recipe" in entry else None
+                item["recette"] = None if parsed is None else {
+                    "ingredients": [[ing, _compact_qty(q)] for ing, q in parsed[0]],
+                    "quantite_produite": _compact_qty(parsed[1]),
+                }
+        return item
+
+    def get(self, item_id, default=None) -> dict | None:
+        # Copie profonde: l'appelant peut modifier l'item (listes comprises) sans toucher au cache
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            return default
+        item = self.cache.get(item_id)
+        if item is _MISS:
+            pos = self.positions.get(item_id)
+            if pos is None:
+                return default
+            item = self._resolve(item_id, pos)
+            if item is _MISS:
+                # Index périmé (pool remplacé sous la même signature): reconstruire une fois
+                self.rebuild_index()
+                pos = self.positions.get(item_id)
+                item = self._resolve(item_id, pos) if pos is not None else None
+                if item is _MISS:
+                    item = None
+            self.cache.put(item_id, item)
+        return copy.deepcopy(item) if item is not None else default
+
+    def by_url(self, url_fiche: str, default=None) -> dict | None:
+        item_id = self.urls.get(url_fiche)
+        return default if item_id is None else self.get(item_id, default)
 
-        # ID numérique prioritaire
-        raw_id = entry.get("id")
-        id_out = None
-        if isinstance(raw_id, int):
-            id_out = raw_id
-        else:
-            id_raw = to_value(raw_id)
-            if isinstance(id_raw, dict) and "id" in id_raw and isinstance(id_raw["id"], (int, float)):
-                id_out = int(id_raw["id"])  # normaliser en int
-            elif isinstance(id_raw, int):
-                id_out = id_raw
-        if not isinstance(id_out, int):
+    def get_many(self, ids) -> dict[int, dict]:
+        out = {}
+        for i in ids:
+            item = self.get(i)
+            if item is not None:
+                out[item["id"]] = item
+        return out
+
+    def download_icons(self) -> tuple[int, int]:
+        return self.downloader.run()
+
+    def stats(self) -> dict:
+        return {"items_indexes": len(self.positions), "urls_indexees": len(self.urls),
+                "index": self.index_source, "cache": self.cache.stats(),
+                "resolver_hits": self.resolver_stats.get("hits", 0),
+                "resolver_misses": self.resolver_stats.get("misses", 0)}
+
+
+def _mongo_filter(item: dict) -> dict:
+    if item.get("id") is not None:
+        return {"id": item["id"]}
+    return {"id": None, "url_fiche": item.get("url_fiche") or ""}
+
+
+def _key_filter(key: str) -> dict:
+    # Inverse de item_key(): id numérique ou url_fiche
+    if key.lstrip("-").isdigit():
+        return {"id": int(key)}
+    return {"id": None, "url_fiche": key}
+
+
+def upsert_items_mongo(items: list, db, collection: str = MONGO_COLLECTION,
+                       batch_size: int = MONGO_BATCH_SIZE, swap: bool = False,
+                       removed: list | None = None) -> dict:
+    # Upserts non ordonnés par lots sur id (ou url_fiche). db est une Database pymongo
+    # (ou un équivalent en mémoire type mongomock).
+    # swap=True: tout est écrit dans <collection>__staging puis renommé d'un coup,
+    # les lecteurs ne voient jamais de catalogue partiel.
+    from pymongo import ReplaceOne, ASCENDING
+
+    target = f"{collection}__staging" if swap else collection
+    coll = db[target]
+    if swap:
+        coll.drop()
+    coll.create_index([("id", ASCENDING)])
+    coll.create_index([("url_fiche", ASCENDING)])
+    coll.create_index([("nom", ASCENDING)])
+
+    stats = {"upserted": 0, "modified": 0, "matched": 0, "deleted": 0, "batches": 0}
+    batch_size = max(1, batch_size)
+    for start in range(0, len(items), batch_size):
+        ops = [ReplaceOne(_mongo_filter(it), dict(it), upsert=True) for it in items[start:start + batch_size]]
+        res = coll.bulk_write(ops, ordered=False)
+        stats["upserted"] += res.upserted_count
+        stats["modified"] += res.modified_count
+        stats["matched"] += res.matched_count
+        stats["batches"] += 1
+
+    if swap:
+        coll.rename(collection, dropTarget=True)
+        return stats
+
+    # Suppression des items disparus: liste explicite (changeset) ou comparaison des clés
+    if removed is None:
+        present = {item_key(it) for it in items}
+        removed = []
+        for doc in coll.find({}, {"id": 1, "url_fiche": 1, "_id": 0}):
+            key = item_key(doc)
+            if key not in present:
+                removed.append(key)
+    for start in range(0, len(removed), batch_size):
+        flt = {"$or": [_key_filter(k) for k in removed[start:start + batch_size]]}
+        stats["deleted"] += coll.delete_many(flt).deleted_count
+    return stats
+
+
+def _open_mongo_db():
+    try:
+        from pymongo import MongoClient
+    except ImportError as exc:
+        raise RuntimeError("MONGO_UPSERT=1 nécessite pymongo (pip install pymongo)") from exc
+    client = MongoClient(MONGODB_URI)
+    return client, (client[MONGO_DB] if MONGO_DB else client.get_default_database("dune"))
+
+
+I18N_EXPORT_PATH = "dune_awakening_items_i18n.json"
+# Export JSON Lines en flux (EXPORT_FORMAT=ndjson, EXPORT_GZIP=1, NDJSON_PATH=- pour stdout)
+EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "json")
+EXPORT_GZIP = os.getenv("EXPORT_GZIP", "0") == "1"
+EXPORT_META = os.getenv("EXPORT_META", "header")
+NDJSON_PATH = os.getenv("NDJSON_PATH", "") or ("dune_awakening_items_fr.ndjson" + (".gz" if EXPORT_GZIP else ""))
+# Champs traduits dans le catalogue multilingue (les autres viennent de la première langue)
+I18N_FIELDS = ("nom", "description", "categorie", "sous_categorie")
+# Listes dont les libellés dépendent de la langue (attributs, ingrédients, sources)
+I18N_LIST_FIELDS = ("statistiques", "schema", "sources")
+
+
+# Pools décodés par le parent, hérités par les processus fils forkés (jamais sérialisés)
+_SHARED_LANG_POOLS: dict[str, list] = {}
+
+
+def _extract_lang(lang: str):
+    # Exécuté dans un processus fils: pool hérité du parent, sinon (pas de fork) relu
+    # depuis le cache qu'il vient de rafraîchir
+    METRICS.reset()
+    downloader = IconDownloader(workers=1)
+    pool = _SHARED_LANG_POOLS.get(lang)
+    if pool is None:
+        pool = load_pool(lang, use_local=True)
+    items = extract_items(pool, downloader=downloader)
+    return lang, items, downloader.jobs, METRICS.snapshot()
+
+
+def merge_catalogs(items_by_lang: dict[str, list], langs: list[str]) -> list:
+    merged: dict[int, dict] = {}
+    order: list[int] = []
+    for lang in langs:
+        for it in items_by_lang.get(lang) or []:
+            item_id = it.get("id")
+            if item_id is None:
+                continue
+            rec = merged.get(item_id)
+            if rec is None:
+                rec = dict(it)
+                for field in (*I18N_FIELDS, *I18N_LIST_FIELDS):
+                    rec[field] = {}
+                merged[item_id] = rec
+                order.append(item_id)
+            for field in I18N_FIELDS:
+                rec[field][lang] = it.get(field) or ""
+            for field in I18N_LIST_FIELDS:
+                rec[field][lang] = it.get(field) or []
+    return [merged[i] for i in order]
+
+
+# Options de l'export mono-langue que le catalogue multilingue n'applique pas: refusées
+# plutôt qu'ignorées en silence
+MULTILANG_UNSUPPORTED = ("INCREMENTAL", "MONGO_UPSERT", "SEARCH_INDEX", "STATS_MATRIX", "RECIPE_GRAPH")
+
+
+def check_multilang_options(langs: list[str]):
+    enabled = [name for name in MULTILANG_UNSUPPORTED if os.getenv(name, "0") == "1"]
+    if EXPORT_FORMAT != "json":
+        enabled.append(f"EXPORT_FORMAT={EXPORT_FORMAT}")
+    if enabled:
+        raise SystemExit(f"[i18n] DUNE_LANGS={','.join(langs)}: options non prises en charge par l'export "
+                         f"multilingue: {', '.join(enabled)} (lancer un export par langue)")
+
+
+def export_multilang(langs: list[str], workers: int | None = None) -> list:
+    # 1) pools rafraîchis et décodés en flux en parallèle (réseau), 2) extraction dans un pool
+    # de processus, 3) icônes de toutes les langues téléchargées une seule fois chacune
+    with ThreadPoolExecutor(max_workers=len(langs)) as ex:
+        futs = {lang: ex.submit(_fetch_pool_cached, pool_url(lang), PoolCache(lang=lang)) for lang in langs}
+        pools = {lang: fut.result() for lang, fut in futs.items()}
+    workers = workers or int(os.getenv("LANG_WORKERS", "0") or 0) or min(len(langs), os.cpu_count() or 1)
+    items_by_lang: dict[str, list] = {}
+    downloader = IconDownloader()
+    fork = "fork" in multiprocessing.get_all_start_methods()
+    if fork:
+        _SHARED_LANG_POOLS.update(pools)
+    # Sans fork les fils relisent le cache: les pools décodés ne sont pas gardés pendant l'extraction
+    del pools
+    try:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("fork") if fork else None) as ex:
+            for lang, items, jobs, snap in ex.map(_extract_lang, langs):
+                items_by_lang[lang] = items
+                downloader.jobs.extend(jobs)
+                METRICS.merge(snap)
+    finally:
+        _SHARED_LANG_POOLS.clear()
+    dl_ok, dl_ko = downloader.run()
+    print(f"[images] langues={','.join(langs)} fichiers={len(downloader.results)} dl_ok={dl_ok} dl_ko={dl_ko}")
+    return merge_catalogs(items_by_lang, langs)
+
+
+SEARCH_INDEX_PATH = "dune_awakening_items_fr.search.json"
+# Format du fichier d'index (2: ligatures dépliées par fold_text)
+SEARCH_INDEX_VERSION = 2
+SEARCH_FIELDS = ("nom", "categorie", "sous_categorie", "description")
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+
+# Ligatures que NFKD ne décompose pas ("cœur" doit répondre à "coeur")
+_LIGATURES = str.maketrans({"œ": "oe", "Œ": "OE", "æ": "ae", "Æ": "AE", "ß": "ss", "ẞ": "SS"})
+
+
+def fold_text(text: str) -> str:
+    # "Actionneur Holtzman amélioré" -> "actionneur holtzman ameliore", "Cœur" -> "coeur"
+    decomposed = unicodedata.normalize("NFKD", (text or "").translate(_LIGATURES))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(fold_text(text))
+
+
+def _trigrams(token: str) -> set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    # Index inversé des items exportés: tokens repliés (accents/casse) -> positions d'items,
+    # vocabulaire trié pour les préfixes (bisect) et trigrammes pour la recherche approchée.
+    # Les positions sont celles des items dans l'export (ordre du tableau / des lignes NDJSON).
+    def __init__(self):
+        self.keys: list[str] = []
+        self._postings: dict[str, set[int]] = {}
+        self._name_postings: dict[str, set[int]] = {}
+        self.vocab: list[str] = []
+        self.postings: list[list[int]] = []
+        self.name_postings: list[list[int]] = []
+        self._token_ids: dict[str, int] = {}
+        self._trigram_tokens: dict[str, list[int]] = {}
+
+    def add(self, item: dict):
+        pos = len(self.keys)
+        self.keys.append(item_key(item))
+        for field in SEARCH_FIELDS:
+            value = item.get(field)
+            texts = value.values() if isinstance(value, dict) else [value]
+            for text in texts:
+                if not isinstance(text, str):
+                    continue
+                for tok in tokenize(text):
+                    self._postings.setdefault(tok, set()).add(pos)
+                    if field == "nom":
+                        self._name_postings.setdefault(tok, set()).add(pos)
+
+    def finish(self) -> "SearchIndex":
+        self.vocab = sorted(self._postings)
+        self.postings = [sorted(self._postings[t]) for t in self.vocab]
+        self.name_postings = [sorted(self._name_postings.get(t, ())) for t in self.vocab]
+        self._postings = {}
+        self._name_postings = {}
+        self._prepare()
+        return self
+
+    def _prepare(self):
+        self._token_ids = {t: i for i, t in enumerate(self.vocab)}
+        self._trigram_tokens = {}
+        for i, tok in enumerate(self.vocab):
+            for tri in _trigrams(tok):
+                self._trigram_tokens.setdefault(tri, []).append(i)
+
+    @classmethod
+    def build(cls, items) -> "SearchIndex":
+        index = cls()
+        for it in items:
+            index.add(it)
+        return index.finish()
+
+    def save(self, path: str = SEARCH_INDEX_PATH):
+        data = {"version": SEARCH_INDEX_VERSION, "fields": list(SEARCH_FIELDS), "keys": self.keys, "vocab": self.vocab,
+                "postings": self.postings, "name_postings": self.name_postings}
+        _atomic_write_bytes(path, json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def load(cls, path: str = SEARCH_INDEX_PATH) -> "SearchIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != SEARCH_INDEX_VERSION:
+            raise ValueError(f"Index de recherche obsolète: {path} (réexporter avec SEARCH_INDEX=1)")
+        index = cls()
+        index.keys = data["keys"]
+        index.vocab = data["vocab"]
+        index.postings = data["postings"]
+        index.name_postings = data["name_postings"]
+        index._prepare()
+        return index
+
+    def _prefix_ids(self, prefix: str) -> range:
+        lo = bisect.bisect_left(self.vocab, prefix)
+        hi = bisect.bisect_left(self.vocab, prefix + "\uffff")
+        return range(lo, hi)
+
+    def _fuzzy_ids(self, token: str, min_similarity: float) -> list[tuple[int, float]]:
+        grams = _trigrams(token)
+        shared: dict[int, int] = {}
+        for tri in grams:
+            for tid in self._trigram_tokens.get(tri, ()):
+                shared[tid] = shared.get(tid, 0) + 1
+        out = []
+        for tid, common in shared.items():
+            sim = common / (len(grams) + len(_trigrams(self.vocab[tid])) - common)
+            if sim >= min_similarity:
+                out.append((tid, sim))
+        return out
+
+    def _matches(self, token: str, prefix: bool, fuzzy: bool, min_similarity: float) -> list[tuple[int, float]]:
+        # (id de token, qualité): exact 1.0, préfixe 0.8, approché = similarité trigrammes × 0.6
+        tid = self._token_ids.get(token)
+        matches = [(tid, 1.0)] if tid is not None else []
+        if prefix:
+            matches += [(i, 0.8) for i in self._prefix_ids(token) if i != tid]
+        if not matches and fuzzy and len(token) >= 3:
+            matches = [(i, 0.6 * sim) for i, sim in self._fuzzy_ids(token, min_similarity)]
+        return matches
+
+    def search(self, query: str, limit: int = 20, prefix: bool = True, fuzzy: bool = True,
+               min_similarity: float = 0.4) -> list[tuple[int, float]]:
+        # Tous les mots de la requête doivent correspondre (ET); le nom pèse 3× plus que les autres champs
+        scores: dict[int, float] | None = None
+        for token in tokenize(query):
+            token_scores: dict[int, float] = {}
+            for tid, quality in self._matches(token, prefix, fuzzy, min_similarity):
+                names = self.name_postings[tid]
+                for pos in self.postings[tid]:
+                    score = quality * 3 if names and _sorted_contains(names, pos) else quality
+                    if score > token_scores.get(pos, 0.0):
+                        token_scores[pos] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {p: s + token_scores[p] for p, s in scores.items() if p in token_scores}
+            if not scores:
+                return []
+        if not scores:
+            return []
+        return heapq.nlargest(limit, scores.items(), key=lambda kv: (kv[1], -kv[0]))
+
+
+def _sorted_contains(values: list[int], x: int) -> bool:
+    i = bisect.bisect_left(values, x)
+    return i < len(values) and values[i] == x
+
+
+# Atlas d'icônes par catégorie + miniatures (ATLAS=1, Pillow requis)
+ATLAS_DIR = os.getenv("ATLAS_DIR", os.path.join("images", "atlas"))
+THUMBS_DIR = os.getenv("THUMBS_DIR", os.path.join("images", "thumbs"))
+ATLAS_TILE = int(os.getenv("ATLAS_TILE", "128"))
+THUMB_SIZES = [int(x) for x in os.getenv("THUMB_SIZES", "64").split(",") if x.strip()]
+ATLAS_WORKERS = int(os.getenv("ATLAS_WORKERS", "0") or 0)
+
+
+def _require_pillow():
+    try:
+        from PIL import Image
+    except ImportError as exc:
+        raise RuntimeError("ATLAS=1 nécessite Pillow (pip install pillow)") from exc
+    return Image
+
+
+def _render_atlas(dest: str, paths: list[str], tile: int) -> dict:
+    # Exécuté dans un processus fils: grille carrée de cases tile x tile, icônes réduites si besoin
+    Image = _require_pillow()
+    cols = max(1, int(len(paths) ** 0.5 + 0.999))
+    rows = -(-len(paths) // cols)
+    sheet = Image.new("RGBA", (cols * tile, rows * tile), (0, 0, 0, 0))
+    members = {}
+    for i, path in enumerate(paths):
+        x, y = (i % cols) * tile, (i // cols) * tile
+        try:
+            with Image.open(path) as im:
+                im = im.convert("RGBA")
+                im.thumbnail((tile, tile))
+                sheet.paste(im, (x, y))
+                members[path] = [x, y, im.width, im.height]
+        except OSError:
             continue
+    with _atomic_path(dest) as tmp:
+        sheet.save(tmp, format="WEBP", lossless=True)
+    return members
+
 
-        nom = _take_text(to_text, entry.get("name"))
-        if not is_valid_text(nom):
+def _render_thumbnails(jobs: list[tuple[str, str, int]]) -> int:
+    Image = _require_pillow()
+    done = 0
+    for src, dest, size in jobs:
+        try:
+            with Image.open(src) as im:
+                im = im.convert("RGBA")
+                im.thumbnail((size, size))
+                with _atomic_path(dest) as tmp:
+                    im.save(tmp, format="WEBP", quality=90)
+                done += 1
+        except OSError:
             continue
-        # Exclure noms manifestement non items
-        bad_tokens = ("BP_", "InfoCard_", "ItemStats_", "seconds", "RPM")
-        if any(tok in nom for tok in bad_tokens):
+    return done
+
+
+def _atlas_group(item: dict) -> str:
+    cat = item.get("categorie")
+    if isinstance(cat, dict):
+        # Catalogue multilingue: la première langue sert de clé
+        cat = next(iter(cat.values()), "")
+    return re.sub(r"[^0-9a-z]+", "-", fold_text(cat or "")).strip("-") or "divers"
+
+
+def _icon_signature(paths: list[str], tile: int) -> str:
+    h = hashlib.sha256(str(tile).encode())
+    for p in paths:
+        st = os.stat(p)
+        h.update(f"\0{p}\0{st.st_size}\0{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def build_icon_atlases(items: list, out_dir: str = ATLAS_DIR, thumbs_dir: str = THUMBS_DIR,
+                       tile: int = ATLAS_TILE, thumb_sizes: list[int] | None = None,
+                       workers: int | None = None) -> dict:
+    # Après téléchargement: un atlas par catégorie, reconstruit seulement si ses icônes ont changé
+    # (manifest.json garde la signature taille/mtime des membres et leur placement)
+    _require_pillow()
+    thumb_sizes = THUMB_SIZES if thumb_sizes is None else thumb_sizes
+    workers = workers or ATLAS_WORKERS or (os.cpu_count() or 1)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    previous = manifest.get("atlases", {})
+
+    groups: dict[str, set] = {}
+    for it in items:
+        local = it.get("image_local")
+        if local and os.path.isfile(local):
+            groups.setdefault(_atlas_group(it), set()).add(local)
+
+    atlases = {}
+    stats = {"atlas_reconstruits": 0, "atlas_reutilises": 0, "miniatures": 0}
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending = {}
+        for name, members in sorted(groups.items()):
+            paths = sorted(members)
+            sig = _icon_signature(paths, tile)
+            dest = os.path.join(out_dir, f"{name}.webp")
+            prev = previous.get(name)
+            if prev and prev.get("signature") == sig and os.path.exists(dest):
+                atlases[name] = prev
+                stats["atlas_reutilises"] += 1
+                continue
+            pending[name] = (sig, dest, ex.submit(_render_atlas, dest, paths, tile))
+
+        # Miniatures: seulement celles absentes ou plus anciennes que l'icône source
+        thumb_jobs = []
+        for src in sorted(set().union(*groups.values()) if groups else ()):
+            sub = src.split(os.sep, 1)[1] if src.startswith("images" + os.sep) else src
+            src_mtime = os.stat(src).st_mtime_ns
+            for size in thumb_sizes:
+                dest = os.path.join(thumbs_dir, str(size), sub)
+                if not os.path.exists(dest) or os.stat(dest).st_mtime_ns < src_mtime:
+                    thumb_jobs.append((src, dest, size))
+        step = max(1, -(-len(thumb_jobs) // workers))
+        thumb_futs = [ex.submit(_render_thumbnails, thumb_jobs[i:i + step]) for i in range(0, len(thumb_jobs), step)]
+
+        for name, (sig, dest, fut) in pending.items():
+            atlases[name] = {"signature": sig, "fichier": dest.replace("\\", "/"), "membres": fut.result()}
+            stats["atlas_reconstruits"] += 1
+        stats["miniatures"] = sum(f.result() for f in thumb_futs)
+
+    # Atlas de catégories disparues
+    for name, prev in previous.items():
+        if name not in atlases and prev.get("fichier") and os.path.exists(prev["fichier"]):
+            os.remove(prev["fichier"])
+
+    _atomic_write_bytes(manifest_path, json.dumps({"tile": tile, "atlases": atlases}, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    for it in items:
+        entry = atlases.get(_atlas_group(it)) if it.get("image_local") else None
+        coords = entry["membres"].get(it["image_local"]) if entry else None
+        it["atlas"] = {"fichier": entry["fichier"], "x": coords[0], "y": coords[1], "w": coords[2], "h": coords[3]} if coords else None
+    stats["atlas"] = len(atlases)
+    return stats
+
+
+# Matrice des statistiques (STATS_MATRIX=1, NumPy requis): une colonne float32 par attribut,
+# masque des valeurs présentes, métadonnées d'attributs; relue en mmap
+STATS_MATRIX_PATH = "dune_awakening_items_fr.stats"
+
+
+def _require_numpy():
+    try:
+        import numpy as np
+    except ImportError as exc:
+        raise RuntimeError("STATS_MATRIX=1 nécessite numpy (pip install numpy)") from exc
+    return np
+
+
+class StatMatrix:
+    # Répertoire <path>/: values.npy (float32, NaN si absent) et mask.npy (bool), lus en mmap,
+    # plus meta.npz (clés d'items, noms d'attributs, est_pourcentage, mieux_plus_haut,
+    # catégorie/sous-catégorie/tier pour le filtrage)
+    def __init__(self):
+        self.keys: list[str] = []
+        self.attributes: list[str] = []
+        self.percent = None
+        self.higher = None
+        self.values = None
+        self.mask = None
+        self.categories: list[str] = []
+        self.subcategories: list[str] = []
+        self.category_codes = None
+        self.subcategory_codes = None
+        self.tiers = None
+        self._attr_ids: dict[str, int] = {}
+        self._attr_meta: list[list] = []
+        self._rows: list[dict[int, float]] = []
+        self._cats: list[str] = []
+        self._subcats: list[str] = []
+        self._tiers: list[float] = []
+
+    def add(self, item: dict):
+        row: dict[int, float] = {}
+        for stat in item.get("statistiques") or []:
+            name = stat.get("attribut")
+            value = stat.get("valeur")
+            if not name or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            col = self._attr_ids.get(name)
+            if col is None:
+                col = self._attr_ids[name] = len(self.attributes)
+                self.attributes.append(name)
+                self._attr_meta.append([None, None])
+            meta = self._attr_meta[col]
+            if meta[0] is None:
+                meta[0] = stat.get("est_pourcentage")
+            if meta[1] is None:
+                meta[1] = stat.get("mieux_plus_haut")
+            # Attribut répété dans un même item: la première valeur fait foi (ordre d'affichage)
+            row.setdefault(col, float(value))
+        self.keys.append(item_key(item))
+        self._rows.append(row)
+        cat = item.get("categorie")
+        sub = item.get("sous_categorie")
+        self._cats.append(next(iter(cat.values()), "") if isinstance(cat, dict) else (cat or ""))
+        self._subcats.append(next(iter(sub.values()), "") if isinstance(sub, dict) else (sub or ""))
+        tier = item.get("tier")
+        self._tiers.append(float(tier) if isinstance(tier, (int, float)) and not isinstance(tier, bool) else float("nan"))
+
+    def finish(self) -> "StatMatrix":
+        np = _require_numpy()
+        n, m = len(self._rows), len(self.attributes)
+        self.values = np.full((n, m), np.nan, dtype=np.float32)
+        for i, row in enumerate(self._rows):
+            if row:
+                cols = np.fromiter(row.keys(), dtype=np.intp, count=len(row))
+                self.values[i, cols] = np.fromiter(row.values(), dtype=np.float32, count=len(row))
+        self.mask = ~np.isnan(self.values)
+        # -1 = inconnu, 0 = non, 1 = oui
+        self.percent = np.array([-1 if p is None else int(bool(p)) for p, _ in self._attr_meta], dtype=np.int8)
+        self.higher = np.array([-1 if h is None else int(bool(h)) for _, h in self._attr_meta], dtype=np.int8)
+        self.categories = sorted(set(self._cats))
+        self.subcategories = sorted(set(self._subcats))
+        cat_ids = {c: i for i, c in enumerate(self.categories)}
+        sub_ids = {c: i for i, c in enumerate(self.subcategories)}
+        self.category_codes = np.array([cat_ids[c] for c in self._cats], dtype=np.int32)
+        self.subcategory_codes = np.array([sub_ids[c] for c in self._subcats], dtype=np.int32)
+        self.tiers = np.array(self._tiers, dtype=np.float32)
+        self._rows, self._cats, self._subcats, self._tiers = [], [], [], []
+        return self
+
+    @classmethod
+    def build(cls, items) -> "StatMatrix":
+        matrix = cls()
+        for it in items:
+            matrix.add(it)
+        return matrix.finish()
+
+    def save(self, path: str = STATS_MATRIX_PATH):
+        np = _require_numpy()
+        os.makedirs(path, exist_ok=True)
+        # .npy séparés: np.load(mmap_mode=...) ne sait pas mapper l'intérieur d'un .npz
+        for name, arr in (("values", self.values), ("mask", self.mask)):
+            with _atomic_path(os.path.join(path, f"{name}.npy"), ".npy") as tmp:
+                np.save(tmp, arr)
+        with _atomic_path(os.path.join(path, "meta.npz"), ".npz") as tmp:
+            np.savez(tmp, keys=np.array(self.keys, dtype=str), attributes=np.array(self.attributes, dtype=str),
+                     percent=self.percent, higher=self.higher, tiers=self.tiers,
+                     categories=np.array(self.categories, dtype=str), category_codes=self.category_codes,
+                     subcategories=np.array(self.subcategories, dtype=str), subcategory_codes=self.subcategory_codes)
+
+    @classmethod
+    def load(cls, path: str = STATS_MATRIX_PATH, mmap: bool = True) -> "StatMatrix":
+        np = _require_numpy()
+        matrix = cls()
+        mode = "r" if mmap else None
+        matrix.values = np.load(os.path.join(path, "values.npy"), mmap_mode=mode)
+        matrix.mask = np.load(os.path.join(path, "mask.npy"), mmap_mode=mode)
+        with np.load(os.path.join(path, "meta.npz")) as meta:
+            matrix.keys = meta["keys"].tolist()
+            matrix.attributes = meta["attributes"].tolist()
+            matrix.percent = meta["percent"]
+            matrix.higher = meta["higher"]
+            matrix.tiers = meta["tiers"]
+            matrix.categories = meta["categories"].tolist()
+            matrix.category_codes = meta["category_codes"]
+            matrix.subcategories = meta["subcategories"].tolist()
+            matrix.subcategory_codes = meta["subcategory_codes"]
+        matrix._attr_ids = {a: i for i, a in enumerate(matrix.attributes)}
+        return matrix
+
+    def column(self, attribute: str) -> int:
+        col = self._attr_ids.get(attribute)
+        if col is None:
+            raise KeyError(attribute)
+        return col
+
+    def rows(self, keys: list[str]) -> list[int]:
+        pos = {k: i for i, k in enumerate(self.keys)}
+        return [pos[k] for k in keys if k in pos]
+
+    def _row_indices(self, rows):
+        # rows: None (tout), masque booléen issu de filter() ou liste de positions
+        np = _require_numpy()
+        if rows is None:
+            return np.arange(len(self.keys))
+        rows = np.asarray(rows)
+        return np.flatnonzero(rows) if rows.dtype == bool else rows.astype(np.intp)
+
+    def filter(self, categorie: str | None = None, sous_categorie: str | None = None,
+               tier_min: float | None = None, tier_max: float | None = None, has: list[str] | tuple = ()):
+        # Masque booléen des lignes retenues (combinable avec & / |)
+        np = _require_numpy()
+        sel = np.ones(len(self.keys), dtype=bool)
+        if categorie is not None:
+            code = self.categories.index(categorie) if categorie in self.categories else -1
+            sel &= self.category_codes == code
+        if sous_categorie is not None:
+            code = self.subcategories.index(sous_categorie) if sous_categorie in self.subcategories else -1
+            sel &= self.subcategory_codes == code
+        if tier_min is not None:
+            sel &= self.tiers >= tier_min
+        if tier_max is not None:
+            sel &= self.tiers <= tier_max
+        for attribute in has:
+            sel &= self.mask[:, self.column(attribute)]
+        return sel
+
+    def normalize(self, attributes: list[str] | None = None, rows=None):
+        # Min-max par colonne sur les lignes retenues, orienté pour que 1 = meilleur
+        # (colonnes "mieux_plus_haut" à faux inversées); NaN pour les valeurs absentes
+        np = _require_numpy()
+        cols = [self.column(a) for a in attributes] if attributes else list(range(len(self.attributes)))
+        block = np.asarray(self.values[self._row_indices(rows)][:, cols], dtype=np.float32)
+        with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+            # Colonne entièrement absente sur la sélection: nanmin/nanmax avertissent et rendent NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            lo = np.nanmin(block, axis=0)
+            hi = np.nanmax(block, axis=0)
+            span = np.where(hi > lo, hi - lo, 1.0)
+            out = (block - lo) / span
+        flip = self.higher[cols] == 0
+        out[:, flip] = 1.0 - out[:, flip]
+        return out
+
+    def top_k(self, attribute: str, k: int = 10, rows=None, higher_is_better: bool | None = None) -> list[tuple[str, float]]:
+        np = _require_numpy()
+        col = self.column(attribute)
+        idx = self._row_indices(rows)
+        vals = np.asarray(self.values[idx, col], dtype=np.float64)
+        present = ~np.isnan(vals)
+        idx, vals = idx[present], vals[present]
+        if higher_is_better is None:
+            higher_is_better = self.higher[col] != 0
+        score = vals if higher_is_better else -vals
+        k = min(k, len(idx))
+        if k <= 0:
+            return []
+        part = np.argpartition(-score, k - 1)[:k]
+        part = part[np.lexsort((idx[part], -score[part]))]
+        return [(self.keys[int(idx[i])], float(vals[i])) for i in part]
+
+    def rank(self, weights: dict[str, float], k: int = 10, rows=None) -> list[tuple[str, float]]:
+        # Score pondéré sur les colonnes normalisées, une valeur absente compte pour 0
+        np = _require_numpy()
+        attrs = list(weights)
+        idx = self._row_indices(rows)
+        norm = np.nan_to_num(self.normalize(attrs, idx), nan=0.0)
+        score = norm @ np.array([weights[a] for a in attrs], dtype=np.float32)
+        k = min(k, len(idx))
+        if k <= 0:
+            return []
+        part = np.argpartition(-score, k - 1)[:k]
+        part = part[np.lexsort((idx[part], -score[part]))]
+        return [(self.keys[int(idx[i])], float(score[i])) for i in part]
+
+    def compare(self, keys: list[str], attributes: list[str] | None = None):
+        # Sous-matrice (items x attributs) pour comparer une sélection d'items
+        cols = [self.column(a) for a in attributes] if attributes else list(range(len(self.attributes)))
+        return self.values[self.rows(keys)][:, cols]
+
+
+# Rangement de coffres: répartition d'un inventaire (piles d'items) dans des coffres de
+# capacités données, en maximisant la valeur de revente ou le nombre d'objets
+PACK_DP_CELLS = int(os.getenv("PACK_DP_CELLS", "4000000"))
+
+
+def inventory_from_catalog(items: list, counts: dict) -> list[dict]:
+    # counts: clé d'item (item_key) -> quantité possédée
+    by_key = {item_key(it): it for it in items}
+    out = []
+    for key, qty in counts.items():
+        it = by_key.get(str(key))
+        if it is None or qty <= 0:
             continue
+        out.append({"cle": str(key), "nom": it.get("nom"), "quantite": int(qty),
+                    "volume": it.get("volume"), "valeur": it.get("prix_vente_max") or 0})
+    return out
 
-        # Catégories: tenter divers chemins textuels
-        # Catégories lisibles si possible
-        main_cat_val = to_value(entry.get("mainCategoryId"))
-        sub_cat_val = to_value(entry.get("subCategoryId"))
-        categorie = _take_text(to_text, entry.get("mainCategoryId"))
-        if not is_valid_text(categorie):
-            categorie = None
-        sous_categorie = _take_text(to_text, entry.get("subCategoryId"))
-        if not is_valid_text(sous_categorie):
-            sous_categorie = None
 
-        tier = to_value(entry.get("tier")) if "tier" in entry else None
-        unique_raw = to_value(entry.get("isUnique")) if "isUnique" in entry else False
-        unique = unique_raw if isinstance(unique_raw, bool) else bool(unique_raw)
-        description = _take_text(to_text, entry.get("description"))
-        statistiques = humanize_attribute_values(entry.get("attributeValues")) if "attributeValues" in entry else []
-        # Recettes et sources: laisser la structure brute si non textuelle,
-        # mais tenter une extraction de libellés quand possible
-        def humanize_list_entries(ref_list):
-            v = to_value(ref_list)
-            if isinstance(v, int) and 0 <= v < len(pool):
-                v = pool[v]
-            if not isinstance(v, list):
-                return v
-            out = []
-            for x in v:
-                label = to_text(x)
-                out.append(label if isinstance(label, str) and label else to_value(x))
-            return out
+_VOLUME_EPS = 1e-9
 
-        schema = humanize_list_entries(entry.get("recipe")) if "recipe" in entry else []
-        sources = humanize_list_entries(entry.get("sources")) if "sources" in entry else []
-        # Icône d'item
-        icon_path = resolve_icon_path(entry.get("iconPath")) or resolve_icon_path(entry.get("icon"))
-        image_url, image_local = build_image_urls(icon_path)
-        if image_url and image_local:
-            if ensure_download(image_url, image_local):
-                images_downloaded_ok += 1
-            else:
-                images_downloaded_ko += 1
-            items_with_icon += 1
-        # Icône de tier (palier)
-        tier_icon_path = resolve_icon_path(entry.get("tierIconPath"))
-        tier_icon_url, tier_icon_local = build_image_urls(tier_icon_path)
-        if tier_icon_url and tier_icon_local:
-            if ensure_download(tier_icon_url, tier_icon_local):
-                images_downloaded_ok += 1
-            else:
-                images_downloaded_ko += 1
-            items_with_tier_icon += 1
-        image = _take_text(to_text, entry.get("iconPath")) or _take_text(to_text, entry.get("icon"))
-        url_fiche = _take_text(to_text, entry.get("url"))
 
-        items_out.append({
-            "id": id_out,
-            "nom": nom,
-            "categorie": categorie or "",
-            "sous_categorie": sous_categorie or "",
-            "tier": tier,
-            "unique": unique,
-            "description": description or "",
-            "statistiques": statistiques,
-            "schema": schema if isinstance(schema, list) else (schema or []),
-            "sources": sources if isinstance(sources, list) else (sources or []),
-            "image": image or "",
-            "image_url": image_url or tier_icon_url or "",
-            "image_local": image_local or tier_icon_local or "",
-            "tier_icon_url": tier_icon_url or "",
-            "tier_icon_local": tier_icon_local or "",
-            "url_fiche": url_fiche or ""
+def _volume_scale(volumes: list[float], capacities: list[float]) -> int:
+    # Plus petite échelle décimale rendant volumes et capacités entiers (à défaut: centièmes)
+    for scale in (1, 10, 100):
+        if all(abs(v * scale - round(v * scale)) < _VOLUME_EPS for v in (*volumes, *capacities)):
+            return scale
+    return 100
+
+
+def _scaled_weight(volume: float, scale: int) -> int:
+    # Volume mis à l'échelle: entier à la tolérance près (0.07 x 100 = 7.000000000000001 -> 7),
+    # sinon arrondi au-dessus (un volume inexact ne doit jamais faire déborder un coffre)
+    x = volume * scale
+    r = round(x)
+    return max(0, int(r) if abs(x - r) < _VOLUME_EPS else math.ceil(x))
+
+
+def _pack_greedy(stacks: list[dict], remaining: list[int], caps: list[int], weights: list[int],
+                 values: list[float], order: list[int]) -> list[dict[int, int]]:
+    # Meilleure densité d'abord, chaque pile répartie sur les coffres dans l'ordre
+    fills = [dict() for _ in caps]
+    free = list(caps)
+    for i in sorted(range(len(stacks)), key=lambda i: (-values[i] / weights[i], weights[i])):
+        for c in order:
+            if not remaining[i]:
+                break
+            n = min(remaining[i], free[c] // weights[i])
+            if n:
+                fills[c][i] = fills[c].get(i, 0) + n
+                free[c] -= n * weights[i]
+                remaining[i] -= n
+    return fills
+
+
+def _pack_dp_one(np, remaining: list[int], cap: int, weights: list[int], values: list[float]) -> dict[int, int]:
+    # Sac à dos borné sur un coffre: quantités éclatées en puissances de 2 (0/1), DP vectorisée
+    # sur les capacités, matrice de choix booléenne pour la reconstruction
+    parts = []
+    for i, qty in enumerate(remaining):
+        w = weights[i]
+        qty = min(qty, cap // w) if w <= cap else 0
+        k = 1
+        while qty > 0:
+            n = min(k, qty)
+            parts.append((i, n))
+            qty -= n
+            k *= 2
+    dp = np.zeros(cap + 1)
+    take = np.zeros((len(parts), cap + 1), dtype=bool)
+    for j, (i, n) in enumerate(parts):
+        w = weights[i] * n
+        cand = dp[:cap + 1 - w] + values[i] * n
+        better = cand > dp[w:]
+        dp[w:] = np.where(better, cand, dp[w:])
+        take[j, w:] = better
+    fill: dict[int, int] = {}
+    c = int(np.argmax(dp))
+    for j in range(len(parts) - 1, -1, -1):
+        if take[j, c]:
+            i, n = parts[j]
+            fill[i] = fill.get(i, 0) + n
+            c -= weights[i] * n
+    return fill
+
+
+def pack_chests(inventory: list[dict], capacities: list[float], objective: str = "valeur",
+                max_cells: int | None = None) -> dict:
+    # inventory: [{cle, quantite, volume (par unité), valeur (par unité)}], capacities: volumes des coffres.
+    # objective="valeur" maximise la valeur de revente, "nombre" le nombre d'objets rangés.
+    # Coffres traités du plus grand au plus petit, chacun par DP exacte (NumPy) tant que
+    # nb de parts x capacité reste sous PACK_DP_CELLS, sinon (ou sans NumPy) par glouton.
+    started = time.perf_counter()
+    max_cells = PACK_DP_CELLS if max_cells is None else max_cells
+    stacks, rest = [], []
+    for st in inventory:
+        vol = st.get("volume")
+        if isinstance(vol, (int, float)) and not isinstance(vol, bool) and vol >= 0 and st.get("quantite", 0) > 0:
+            stacks.append(st)
+        else:
+            rest.append({"cle": st.get("cle"), "quantite": st.get("quantite", 0), "raison": "volume inconnu"})
+    scale = _volume_scale([st["volume"] for st in stacks], list(capacities))
+    # Arrondis prudents: volumes au-dessus, capacités en dessous (jamais de coffre débordé)
+    weights = [_scaled_weight(st["volume"], scale) for st in stacks]
+    caps = [max(0, int(c * scale + _VOLUME_EPS)) for c in capacities]
+    g = 0
+    for w in (*weights, *caps):
+        g = math.gcd(g, w)
+    if g > 1:
+        weights = [w // g for w in weights]
+        caps = [c // g for c in caps]
+    if objective == "nombre":
+        values = [1.0] * len(stacks)
+    else:
+        values = [float(st.get("valeur") or 0) for st in stacks]
+    remaining = [int(st["quantite"]) for st in stacks]
+    fills: list[dict[int, int]] = [dict() for _ in caps]
+    # Volume nul: tout tient dans le premier coffre
+    for i, w in enumerate(weights):
+        if w == 0 and caps:
+            fills[0][i] = remaining[i]
+            remaining[i] = 0
+    live = [i for i, w in enumerate(weights) if w > 0]
+    order = sorted(range(len(caps)), key=lambda c: -caps[c])
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    method = "dp"
+    for pos, c in enumerate(order):
+        n_parts = sum(max(0, min(remaining[i], caps[c] // weights[i])).bit_length() for i in live)
+        if np is None or n_parts * (caps[c] + 1) > max_cells:
+            method = "glouton" if pos == 0 else "dp+glouton"
+            sub_w = [weights[i] for i in live]
+            sub_rem = [remaining[i] for i in live]
+            greedy = _pack_greedy([stacks[i] for i in live], sub_rem, caps, sub_w, [values[i] for i in live], order[pos:])
+            for cc, fill in enumerate(greedy):
+                for k, n in fill.items():
+                    fills[cc][live[k]] = fills[cc].get(live[k], 0) + n
+            for k, i in enumerate(live):
+                remaining[i] = sub_rem[k]
+            break
+        sub = _pack_dp_one(np, [remaining[i] for i in live], caps[c], [weights[i] for i in live], [values[i] for i in live])
+        for k, n in sub.items():
+            i = live[k]
+            fills[c][i] = fills[c].get(i, 0) + n
+            remaining[i] -= n
+    chests = []
+    for c, fill in enumerate(fills):
+        contents = [{"cle": stacks[i].get("cle"), "nom": stacks[i].get("nom"), "quantite": n}
+                    for i, n in sorted(fill.items()) if n]
+        chests.append({
+            "capacite": capacities[c],
+            "volume_utilise": round(sum(stacks[i]["volume"] * n for i, n in fill.items()), 6),
+            "valeur": round(sum(float(stacks[i].get("valeur") or 0) * n for i, n in fill.items()), 6),
+            "nombre": sum(fill.values()),
+            "contenu": contents,
         })
+    rest.extend({"cle": stacks[i].get("cle"), "quantite": remaining[i], "raison": "place insuffisante"}
+                for i in range(len(stacks)) if remaining[i])
+    return {
+        "objectif": objective,
+        "methode": method,
+        "coffres": chests,
+        "valeur_totale": round(sum(ch["valeur"] for ch in chests), 6),
+        "nombre_total": sum(ch["nombre"] for ch in chests),
+        "reste": rest,
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+    }
 
-    # Option: télécharger toutes les images présentes dans le pool (au-delà des items extraits)
-    if os.getenv("DOWNLOAD_ALL_IMAGES", "0") == "1":
-        seen = set()
-        for p in image_paths:
-            if p in seen:
-                continue
-            seen.add(p)
-            url, local = build_image_urls(p)
-            if url and local:
-                if ensure_download(url, local):
-                    images_downloaded_ok += 1
-                else:
-                    images_downloaded_ko += 1
 
-    print(f"[images] pool={images_found_pool} items_with_icon={items_with_icon} items_with_tier_icon={items_with_tier_icon} dl_ok={images_downloaded_ok} dl_ko={images_downloaded_ko}")
+class NDJSONWriter:
+    # Export JSON Lines écrit au fil de l'eau (un item par ligne, gzip optionnel) dans un
+    # fichier temporaire renommé atomiquement à la fin. path "-" écrit sur la sortie standard
+    # pour qu'un chargeur puisse consommer les items pendant l'extraction.
+    # meta_mode "header": première ligne {"meta": ...}; "sidecar": <path>.meta.json avec nb_items.
+    def __init__(self, path: str, compress: bool = False, meta: dict | None = None, meta_mode: str = "header",
+                 stream=None):
+        self.path = path
+        self.stream = stream
+        self.compress = compress
+        self.meta = dict(meta or {})
+        self.meta_mode = meta_mode
+        self.count = 0
+        self._tmp_path = None
+        self._f = None
 
-    return items_out
+    def __enter__(self):
+        if self.path == "-":
+            self._f = self.stream or sys.stdout
+        else:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._tmp_path = _tmp_path_for(self.path)
+            if self.compress:
+                self._f = gzip.open(self._tmp_path, "wt", encoding="utf-8", compresslevel=6)
+            else:
+                self._f = open(self._tmp_path, "w", encoding="utf-8")
+        if self.meta_mode == "header":
+            self._f.write(json.dumps({"meta": self.meta}, ensure_ascii=False) + "\n")
+        return self
 
+    def write(self, item: dict):
+        self._f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self.count += 1
+        if self._tmp_path is None:
+            self._f.flush()
 
-def main():
+    def __exit__(self, exc_type, exc, tb):
+        if self._tmp_path is None:
+            self._f.flush()
+        else:
+            self._f.close()
+            if exc_type is not None:
+                os.remove(self._tmp_path)
+                return False
+            os.replace(self._tmp_path, self.path)
+        if self.meta_mode == "sidecar" and self.path != "-":
+            meta = {**self.meta, "nb_items": self.count}
+            _atomic_write_bytes(f"{self.path}.meta.json", json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8"))
+        return False
+
+
+def load_ndjson_export(path: str = NDJSON_PATH) -> list:
+    # Relit un export JSON Lines (gzip reconnu à la signature), ligne meta ignorée.
+    # Sur stdout ("-") il n'y a rien à relire.
+    if path == "-":
+        return []
+    items = []
+    try:
+        with open(path, "rb") as raw:
+            gz = raw.read(2) == b"\x1f\x8b"
+        with (gzip.open(path, "rt", encoding="utf-8") if gz else open(path, "r", encoding="utf-8")) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                if isinstance(obj, dict) and "meta" not in obj:
+                    items.append(obj)
+    except (OSError, ValueError, EOFError):
+        return []
+    return items
+
+
+# Mode veille (WATCH=1): pool et index gardés en mémoire, CDN interrogé toutes les
+# WATCH_INTERVAL secondes, catalogue servi sur http://SERVE_HOST:SERVE_PORT/items
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", "300"))
+# Page ou JSON indiquant la version courante (facultatif); sinon seul le GET conditionnel du pool compte
+VERSION_URL = os.getenv("VERSION_URL", "")
+SERVE_HOST = os.getenv("SERVE_HOST", "127.0.0.1")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "8765"))
+_GAME_VERSION_RE = re.compile(r"\b(\d+\.\d+\.\d+\.\d+)\b")
+_ASSET_VERSION_RE = re.compile(r"(?:version=|\?v=)(\d{10,})")
+
+
+def detect_versions(text: str) -> tuple[str | None, str | None]:
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        game = data.get("gameVersion") or data.get("game_version")
+        asset = data.get("assetVersion") or data.get("asset_version")
+        if game or asset:
+            return (str(game) if game else None), (str(asset) if asset else None)
+    game = _GAME_VERSION_RE.search(text)
+    asset = _ASSET_VERSION_RE.search(text)
+    return (game.group(1) if game else None), (asset.group(1) if asset else None)
+
+
+class CatalogService:
+    # État résident entre deux sondages: session HTTP, pool décodé, index, empreintes
+    # incrémentales et catalogue publié (corps JSON + version gzip + ETag, remplacés d'un bloc).
+    # Le pool et son PoolIndex ne sont redécodés que si le blob du cache change (sha256).
+    def __init__(self, lang: str = LANG):
+        self.lang = lang
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=DL_WORKERS))
+        self.pool = None
+        self.index: PoolIndex | None = None
+        self.pool_digest = None
+        self.versions = (GAME_VERSION, ASSET_VERSION)
+        self.items: list = load_export(EXPORT_PATH)
+        self.state: IncrementalState | None = None
+        self.published: dict | None = None
+        self.refreshes = 0
+
+    def poll_versions(self):
+        if not VERSION_URL:
+            return
+        resp = self.session.get(VERSION_URL, timeout=30)
+        resp.raise_for_status()
+        game, asset = detect_versions(resp.text)
+        game, asset = game or GAME_VERSION, asset or ASSET_VERSION
+        if (game, asset) != (GAME_VERSION, ASSET_VERSION):
+            print(f"[watch] nouvelle version {GAME_VERSION}/{ASSET_VERSION} -> {game}/{asset}")
+            set_versions(game, asset)
+
+    def refresh(self) -> bool:
+        self.poll_versions()
+        cache = PoolCache(lang=self.lang)
+        pool = _fetch_pool_cached(pool_url(self.lang), cache, self.session,
+                                  resident_digest=self.pool_digest if self.pool is not None else None)
+        ref = cache.read_ref()
+        digest = ref["sha256"] if ref else None
+        versions = (GAME_VERSION, ASSET_VERSION)
+        if pool is None or (digest is not None and digest == self.pool_digest):
+            # Blob inchangé: pool et index résidents (un changement de version d'assets seul
+            # ne touche que les URL, il suffit de réextraire)
+            if versions == self.versions and self.published is not None:
+                return False
+            pool, index = self.pool, self.index
+        else:
+            index = PoolIndex(pool)
+            PoolIndex._shared = index
+        # Seuls les items dont les positions lues ont changé sont réextraits
+        if self.state is None:
+            state = IncrementalState(self.items)
+        else:
+            state = IncrementalState.following(self.state, self.items)
+        items = extract_items(pool, index=index, incremental=state)
+        state.save()
+        meta = {
+            "derniere_mise_a_jour": datetime.utcnow().strftime("%Y-%m-%d"),
+            "nb_items": len(items),
+            "version_jeu": GAME_VERSION,
+            "version_assets": ASSET_VERSION,
+        }
+        self.publish(items, meta)
+        # Le serveur HTTP et les lecteurs du fichier ne voient jamais un export à moitié écrit
+        write_export(EXPORT_PATH, {"meta": meta, "items": items})
+        self.items, self.state = items, state
+        self.pool, self.index = pool, index
+        self.pool_digest, self.versions = digest, versions
+        self.refreshes += 1
+        print(f"[watch] catalogue {self.published['etag']} items={len(items)} reutilises={state.reused} reextraits={state.extracted}")
+        return True
+
+    def publish(self, items: list, meta: dict):
+        body = json.dumps({"meta": meta, "items": items}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        meta_body = json.dumps({**meta, "etag": etag}, ensure_ascii=False).encode("utf-8")
+        self.published = {"etag": etag, "body": body, "gzip": gzip.compress(body, 6, mtime=0),
+                          "meta": meta_body, "updated": time.time()}
+
+
+class _CatalogHandler(BaseHTTPRequestHandler):
+    service: CatalogService = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _not_modified(self, etag: str) -> bool:
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+        return "*" in tags or etag in tags
+
+    def _send(self, status: int, body: bytes, content_type: str, etag: str | None = None,
+              gz: bytes | None = None, head: bool = False):
+        use_gzip = gz is not None and "gzip" in (self.headers.get("Accept-Encoding") or "")
+        payload = gz if use_gzip else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if gz is not None:
+            self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(payload)
+
+    def _handle(self, head: bool):
+        pub = self.service.published
+        path = urlsplit(self.path).path.rstrip("/") or "/"
+        if path == "/healthz":
+            return self._send(200 if pub else 503, b"ok" if pub else b"pending", "text/plain", head=head)
+        if pub is None:
+            return self._send(503, b"catalogue en cours de construction", "text/plain; charset=utf-8", head=head)
+        if path in ("/", "/items"):
+            if self._not_modified(pub["etag"]):
+                self.send_response(304)
+                self.send_header("ETag", pub["etag"])
+                self.end_headers()
+                return
+            return self._send(200, pub["body"], "application/json; charset=utf-8", pub["etag"], pub["gzip"], head)
+        if path == "/meta":
+            return self._send(200, pub["meta"], "application/json; charset=utf-8", head=head)
+        return self._send(404, b"not found", "text/plain", head=head)
+
+    def do_GET(self):
+        self._handle(head=False)
+
+    def do_HEAD(self):
+        self._handle(head=True)
+
+
+def serve_catalog(service: CatalogService, host: str = SERVE_HOST, port: int = SERVE_PORT) -> ThreadingHTTPServer:
+    handler = type("CatalogHandler", (_CatalogHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_watch(interval: float = WATCH_INTERVAL):
+    service = CatalogService()
+    server = serve_catalog(service)
+    print(f"[watch] http://{server.server_address[0]}:{server.server_address[1]}/items, sondage toutes les {interval:g}s")
+    try:
+        while True:
+            try:
+                service.refresh()
+            except Exception as exc:
+                # On continue de servir le dernier catalogue publié
+                print(f"[watch] échec du rafraîchissement: {exc!r}", file=sys.stderr)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+def _run_atlas_stage(items: list):
+    # Les icônes sont téléchargées à l'épuisement de l'extraction: l'étape vient juste après
+    with METRICS.stage("atlas"):
+        stats = build_icon_atlases(items)
+    print(f"[atlas] atlas={stats['atlas']} reconstruits={stats['atlas_reconstruits']} reutilises={stats['atlas_reutilises']} miniatures={stats['miniatures']} -> '{ATLAS_DIR}'")
+
+
+def run_pack(request_path: str) -> dict:
+    # Requête JSON: {"coffres": [capacités], "inventaire": {clé: quantité}, "objectif": "valeur"|"nombre"}
+    with open(request_path, "r", encoding="utf-8") as f:
+        req = json.load(f)
+    inventory = inventory_from_catalog(load_export(EXPORT_PATH), req.get("inventaire") or {})
+    plan = pack_chests(inventory, req.get("coffres") or [], req.get("objectif", "valeur"))
+    json.dump(plan, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return plan
+
+
+def run_lookup(keys: list[str]) -> list:
+    # LOOKUP=id1,id2,url...: items résolus à la demande, sans export complet
+    catalog = Catalog.open()
+    found = [catalog.get(k) if k.isdigit() else catalog.by_url(k) for k in keys]
+    json.dump(found, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    print(f"[catalog] {catalog.stats()}", file=sys.stderr)
+    return found
+
+
+def run_export():
+    if os.getenv("WATCH", "0") == "1":
+        return run_watch()
+    if os.getenv("LOOKUP"):
+        return run_lookup([k.strip() for k in os.environ["LOOKUP"].split(",") if k.strip()])
+    if os.getenv("PACK_REQUEST"):
+        return run_pack(os.environ["PACK_REQUEST"])
     use_html = os.getenv("USE_HTML", "0") == "1"
     html_path = os.getenv("HTML_PATH", "Dune Awakening Items.html")
+    incremental = os.getenv("INCREMENTAL", "0") == "1"
+    if len(DUNE_LANGS) > 1:
+        check_multilang_options(DUNE_LANGS)
+        items = export_multilang(DUNE_LANGS)
+        if os.getenv("ATLAS", "0") == "1":
+            _run_atlas_stage(items)
+        meta = {
+            "derniere_mise_a_jour": datetime.utcnow().strftime("%Y-%m-%d"),
+            "nb_items": len(items),
+            "langues": DUNE_LANGS
+        }
+        with METRICS.stage("write"):
+            write_export(I18N_EXPORT_PATH, {"meta": meta, "items": items})
+        print(f"{len(items)} items exportés dans '{I18N_EXPORT_PATH}'")
+        return
+    # Items du run précédent relus dans le format que ce mode écrit (changeset, réutilisation)
+    if not incremental:
+        prev_items = []
+    elif EXPORT_FORMAT == "ndjson":
+        prev_items = load_ndjson_export(NDJSON_PATH)
+    else:
+        prev_items = load_export(EXPORT_PATH)
+    mongo_upsert = os.getenv("MONGO_UPSERT", "0") == "1"
+    atlas = os.getenv("ATLAS", "0") == "1"
+    search_index = SearchIndex() if os.getenv("SEARCH_INDEX", "0") == "1" else None
+    stat_matrix = StatMatrix() if os.getenv("STATS_MATRIX", "0") == "1" else None
+    state = None
+    pool = None
     items = []
 
     if use_html or os.path.exists(html_path):
-        items = parse_items_from_html(html_path)
+        items = iter_items_from_html(html_path)
     else:
-        pool = load_pool()
-        if not isinstance(pool, list):
+        index = PoolIndex.shared()
+        pool = index.pool
+        if not isinstance(pool, (list, MappedPool)):
             raise RuntimeError("Le JSON racine attendu est une liste (pool)")
-        items = extract_items(pool)
+        if os.getenv("SHAPE_CENSUS", "0") == "1":
+            index.shapes.report()
+        state = IncrementalState(prev_items) if incremental else None
+        if EXTRACT_WORKERS > 1 and state is None:
+            items = extract_items_parallel(pool, EXTRACT_WORKERS, index=index)
+        else:
+            items = iter_extract_items(pool, index=index, incremental=state)
 
     meta = {
-        "derniere_mise_a_jour": datetime.utcnow().strftime("%Y-%m-%d"),
-        "nb_items": len(items)
+        "derniere_mise_a_jour": datetime.utcnow().strftime("%Y-%m-%d")
     }
 
-with open("dune_awakening_items_fr.json", "w", encoding="utf-8") as f:
-        json.dump({"meta": meta, "items": items}, f, ensure_ascii=False, indent=2)
+    if EXPORT_FORMAT == "ndjson":
+        to_stdout = NDJSON_PATH == "-"
+        out_stream = sys.stdout
+        # Sur stdout, les journaux passent sur stderr pour ne pas corrompre le flux
+        with contextlib.redirect_stdout(sys.stderr) if to_stdout else contextlib.nullcontext():
+            # Les items ne sont matérialisés que si le changeset, MongoDB ou les atlas en ont besoin
+            if incremental or mongo_upsert or atlas:
+                items = list(items)
+            if atlas:
+                _run_atlas_stage(items)
+            with NDJSONWriter(NDJSON_PATH, EXPORT_GZIP, meta, EXPORT_META, stream=out_stream) as writer:
+                write_s = 0.0
+                for it in items:
+                    t0 = time.perf_counter()
+                    writer.write(it)
+                    write_s += time.perf_counter() - t0
+                    if search_index is not None:
+                        search_index.add(it)
+                    if stat_matrix is not None:
+                        stat_matrix.add(it)
+                METRICS.add_time("write", write_s)
+            meta["nb_items"] = writer.count
+            print(f"[pool] chargements={PoolIndex.loads}")
+            print(f"{writer.count} items exportés dans '{NDJSON_PATH}'")
+    else:
+        items = list(items)
+        print(f"[pool] chargements={PoolIndex.loads}")
+        if atlas:
+            _run_atlas_stage(items)
+        meta["nb_items"] = len(items)
+        with METRICS.stage("write"):
+            write_export(EXPORT_PATH, {"meta": meta, "items": items})
+
+        print(f"{len(items)} items exportés dans '{EXPORT_PATH}'")
+        if search_index is not None:
+            for it in items:
+                search_index.add(it)
+        if stat_matrix is not None:
+            for it in items:
+                stat_matrix.add(it)
+
+    if search_index is not None:
+        search_index.finish().save(SEARCH_INDEX_PATH)
+        print(f"[search] tokens={len(search_index.vocab)} items={len(search_index.keys)} -> '{SEARCH_INDEX_PATH}'")
+
+    if stat_matrix is not None:
+        stat_matrix.finish().save(STATS_MATRIX_PATH)
+        print(f"[stats] items={len(stat_matrix.keys)} attributs={len(stat_matrix.attributes)} -> '{STATS_MATRIX_PATH}/'")
 
-    print(f"{len(items)} items exportés dans 'dune_awakening_items_fr.json'")
+    if os.getenv("RECIPE_GRAPH", "0") == "1" and pool is not None:
+        # Les recettes ne sont lisibles que dans le pool (la page HTML ne les contient pas)
+        graph = RecipeGraph.from_pool(pool, shapes=index.shapes)
+        graph.save(RECIPES_PATH, meta)
+        print(f"[recettes] recettes={len(graph.edges)} nomenclatures={len(graph.bom)} cycles={len(graph.cycles)} -> '{RECIPES_PATH}'")
+
+    if incremental:
+        changes = diff_items(prev_items, items)
+        write_export(CHANGESET_PATH, {"meta": meta, **changes})
+        if state is not None:
+            state.save()
+            print(f"[incremental] reutilises={state.reused} reextraits={state.extracted}")
+        print(f"[incremental] ajoutes={len(changes['added'])} modifies={len(changes['modified'])} supprimes={len(changes['removed'])} -> '{CHANGESET_PATH}'")
+
+    if mongo_upsert:
+        swap = os.getenv("MONGO_SWAP", "0") == "1"
+        client, db = _open_mongo_db()
+        try:
+            if incremental and not swap:
+                # Seuls les items ajoutés/modifiés sont réécrits
+                stats = upsert_items_mongo(changes["added"] + changes["modified"], db, removed=changes["removed"])
+            else:
+                stats = upsert_items_mongo(items, db, swap=swap)
+        finally:
+            client.close()
+        print(f"[mongo] {db.name}.{MONGO_COLLECTION} upserted={stats['upserted']} modified={stats['modified']} deleted={stats['deleted']} batches={stats['batches']}")
+
+
+def main():
+    # PROFILE=cprofile (profil déterministe, .pstats) ou PROFILE=sample (échantillonnage, surcoût minime)
+    profile = os.getenv("PROFILE", "").lower()
+    profile_out = os.getenv("PROFILE_OUT", "")
+    started = time.perf_counter()
+    hot = None
+    if profile == "cprofile":
+        import cProfile
+        import pstats
+        prof = cProfile.Profile()
+        prof.runcall(run_export)
+        prof.dump_stats(profile_out or "import.pstats")
+        stats = pstats.Stats(prof, stream=sys.stderr)
+        stats.sort_stats("cumulative").print_stats(25)
+    elif profile == "sample":
+        with _SamplingProfiler() as sampler:
+            run_export()
+        hot = sampler.top()
+        for row in hot[:15]:
+            print(f"[profile] {row['share']:6.1%} {row['frame']}", file=sys.stderr)
+        if profile_out:
+            _atomic_write_bytes(profile_out, json.dumps(hot, indent=2).encode("utf-8"))
+    else:
+        run_export()
+    wall = time.perf_counter() - started
+    stages = " ".join(f"{k}={v:.3f}s" for k, v in METRICS.report()["stages"].items())
+    log = sys.stderr if EXPORT_FORMAT == "ndjson" and NDJSON_PATH == "-" else sys.stdout
+    print(f"[metrics] total={wall:.3f}s {stages}", file=log)
+    extra = {"game_version": GAME_VERSION, "lang": LANG, "total_seconds": wall}
+    if hot is not None:
+        extra["profile"] = hot
+    if METRICS_JSON:
+        METRICS.write_json(METRICS_JSON, extra)
+    if METRICS_PROM:
+        METRICS.add_time("total", wall)
+        METRICS.write_prometheus(METRICS_PROM, {"lang": LANG})
 
 
 if __name__ == "__main__":
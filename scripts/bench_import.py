@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# Banc de performance de import.py sur des pools synthétiques à l'échelle
+# (20k -> 2M entrées), une page HTML synthétique et un CDN local simulé.
+#
+#   python scripts/bench_import.py --sizes 20000,200000 --latency-ms 20
+#   python scripts/bench_import.py --compare bench_results/ancien.json
+#
+# Les résultats sont écrits en JSON (bench_results/<date>_<commit>.json par défaut)
+# pour comparer les runs d'un commit à l'autre.
+
+import argparse
+import gzip
+import importlib.util
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_import_module():
+    # "import" est un mot-clé: le module est chargé par chemin
+    spec = importlib.util.spec_from_file_location("dune_import", os.path.join(ROOT, "import.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["dune_import"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# ---------------------------------------------------------------------------
+# Générateurs de données
+# ---------------------------------------------------------------------------
+
+ICON_DIRS = ("items/resources", "clothing/gear", "weapons", "placeables", "vehicles/ornithopter")
+WORDS = ("Actionneur", "Holtzman", "amélioré", "Aile", "ornithoptère", "assaut", "Fuselage", "queue",
+         "transport", "Plastacier", "Fibre", "microflore", "distille", "Maison", "Richèse", "Lame",
+         "Cabine", "Châssis", "Générateur", "Bouclier", "Épice", "Filtre", "Moteur", "Stabilisateur")
+
+
+class _PoolBuilder:
+    def __init__(self):
+        self.pool = []
+        self._interned = {}
+
+    def add(self, value) -> int:
+        self.pool.append(value)
+        return len(self.pool) - 1
+
+    def const(self, value) -> int:
+        # Valeurs scalaires partagées (dédoublonnées comme dans items.json)
+        key = (type(value).__name__, value)
+        idx = self._interned.get(key)
+        if idx is None:
+            idx = self._interned[key] = self.add(value)
+        return idx
+
+
+def generate_pool(n_entries: int, seed: int = 1) -> list:
+    # Pool indexé façon items.json: chaînes, descripteurs d'attributs {name, percentBased,
+    # higherIsBetter}, triplets de stats {key, attribute, value}, listes et fiches d'items.
+    rng = random.Random(seed)
+    b = _PoolBuilder()
+    true_idx, false_idx = b.const(True), b.const(False)
+    categories = [b.const(f"{rng.choice(WORDS)} - {rng.choice(WORDS)} {i}") for i in range(40)]
+    sub_categories = [b.const(f"Sous-catégorie {i}") for i in range(200)]
+    tiers = [b.const(t) for t in range(1, 7)]
+    tier_icons = [b.const(f"/images/dune/gui/textures/icons/gameplay/tiers/t_ui_icontier{t}_d.webp") for t in range(1, 7)]
+    descriptors = []
+    for i in range(150):
+        descriptors.append(b.add({
+            "name": b.const(f"Attribut {i}"),
+            "percentBased": rng.choice((true_idx, false_idx)),
+            "higherIsBetter": rng.choice((true_idx, false_idx)),
+        }))
+    stat_keys = [b.const(f"stat_{i}") for i in range(150)]
+
+    item_no = 0
+    while len(b.pool) < n_entries:
+        stats = []
+        for _ in range(rng.randint(1, 6)):
+            d = rng.randrange(len(descriptors))
+            stats.append(b.add({"key": stat_keys[d], "attribute": descriptors[d],
+                                "value": b.add(round(rng.uniform(0, 500), 2))}))
+        icon = f"/images/dune/gui/textures/icons/gameplay/{rng.choice(ICON_DIRS)}/t_ui_iconsynth{item_no}_d.webp"
+        tier = rng.randrange(len(tiers))
+        name = " ".join(rng.sample(WORDS, 3)) + f" Mk {item_no % 7 + 1}"
+        b.add({
+            "id": 100000 + item_no,
+            "name": b.add(name),
+            "description": b.add(f"Description synthétique de {name}"),
+            "iconPath": b.add(icon),
+            "tier": tiers[tier],
+            "tierIconPath": tier_icons[tier],
+            "isUnique": rng.choice((true_idx, false_idx)),
+            "mainCategoryId": rng.choice(categories),
+            "subCategoryId": rng.choice(sub_categories),
+            "volume": b.const(rng.choice((1, 5, 10, 20))),
+            "baseBuyFromVendorPrice": b.const(rng.randint(1, 5000)),
+            "highestSellToVendorPrice": b.const(rng.randint(1, 5000)),
+            "attributeValues": b.add(stats),
+        })
+        item_no += 1
+    return b.pool
+
+
+def generate_html(path: str, pool: list, n_items: int, seed: int = 1):
+    # Page au format de la sauvegarde "Dune Awakening Items.html" (ancres de cartes d'items)
+    rng = random.Random(seed)
+    icons = [s for s in pool if isinstance(s, str) and s.startswith("/images/") and "iconsynth" in s]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<!DOCTYPE html><html><body><div class="flex w-full flex-row flex-wrap items-stretch gap-2">')
+        for i in range(n_items):
+            icon = os.path.basename(icons[i % len(icons)]) if icons else f"t_ui_icon{i}_d.webp"
+            name = " ".join(rng.sample(WORDS, 3))
+            f.write(
+                '<a class="md:w50 xl:w33 block w-full rounded bg-slate-900 hover:bg-slate-700" '
+                f'href="https://dune.gaming.tools/fr/items/synth{i}">'
+                '<div class="flex min-h-[120px] w-full items-start justify-between gap-3 p-4 pr-3">'
+                f'<div class="my-0.5 flex flex-col gap-2"><span class="text-xl font-bold"><span>{name}</span></span> '
+                f'<span class="text-sm">Divers - Composants</span> <div class="flex flex-wrap gap-1"><!--[-->'
+                f'<span class="tag">Tier {i % 6 + 1}</span><!--]--></div></div>'
+                '<div class="icon-container h-[88px] w-[88px] min-h-[88px] min-w-[88px] rounded-sm svelte-1o24ojr">'
+                f'<img loading="lazy" class="icon svelte-1o24ojr" src="./Synth_files/{icon}" alt="" width="128" height="128">'
+                '</div></div><!----></a>'
+            )
+        f.write("</div></body></html>")
+
+
+# ---------------------------------------------------------------------------
+# CDN local simulé
+# ---------------------------------------------------------------------------
+
+WEBP_BYTES = b"RIFF\x24\x00\x00\x00WEBPVP8 " + bytes(28)
+
+
+class CdnStub:
+    # Sert /data/<lang>/items.json.gz (avec ETag/304) et /images/...webp, avec une latence configurable
+    def __init__(self, pools_gz: dict[str, bytes] | None = None, latency_ms: float = 0.0):
+        self.pools_gz = pools_gz or {}
+        self.latency = latency_ms / 1000.0
+        self.requests = 0
+        self.bytes_sent = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                path = self.path.split("?", 1)[0]
+                body = None
+                headers = {}
+                for lang, raw in stub.pools_gz.items():
+                    if path.endswith(f"/data/{lang}/items.json.gz"):
+                        etag = f'"{len(raw)}-{lang}"'
+                        if self.headers.get("If-None-Match") == etag:
+                            self.send_response(304)
+                            self.send_header("ETag", etag)
+                            self.send_header("Content-Length", "0")
+                            self.end_headers()
+                            return
+                        body, headers = raw, {"ETag": etag, "Content-Type": "application/gzip"}
+                if body is None and path.startswith("/images/") and path.endswith(".webp"):
+                    body, headers = WEBP_BYTES, {"Content-Type": "image/webp"}
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                stub.bytes_sent += len(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# ---------------------------------------------------------------------------
+# Mesures
+# ---------------------------------------------------------------------------
+
+def _timed(fn, repeat: int = 1):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_resolver(m, pool, repeat):
+    def run():
+        to_text, _ = m.build_resolver(pool)
+        return sum(1 for i in range(len(pool)) if to_text(i))
+    seconds, resolved = _timed(run, repeat)
+    return {"seconds": seconds, "resolved": resolved}
+
+
+def bench_extract(m, pool, repeat):
+    def run():
+        # Téléchargements mis en file mais non exécutés: seule l'extraction est mesurée
+        return m.extract_items(pool, downloader=m.IconDownloader(workers=1), download_all=False, verbose=False)
+    seconds, items = _timed(run, repeat)
+    return {"seconds": seconds, "items": len(items), "items_per_s": len(items) / seconds if seconds else None}
+
+
+def bench_html(m, pool, n_items, workdir, repeat):
+    html_path = os.path.join(workdir, "synth.html")
+    generate_html(html_path, pool, n_items)
+    index = m.PoolIndex(pool)
+    seconds, items = _timed(lambda: m.parse_items_from_html(html_path, index=index), repeat)
+    return {"seconds": seconds, "items": len(items), "html_bytes": os.path.getsize(html_path)}
+
+
+def bench_download(m, pool, stub, n_icons, workers, workdir):
+    icons = [s for s in pool if isinstance(s, str) and s.startswith("/images/")][:n_icons]
+    # Destination et manifeste neufs à chaque mesure: aucun fichier déjà présent ni entrée de
+    # manifeste (ni celui du dépôt) ne doit court-circuiter le réseau
+    dest = tempfile.mkdtemp(prefix=f"icons_{workers}_", dir=workdir)
+    manifest = m.AssetManifest(os.path.join(dest, f"manifest_{workers}.json"))
+    downloader = m.IconDownloader(workers=workers, retries=0, manifest=manifest)
+    for p in icons:
+        downloader.submit(f"{stub.base_url}{p}", os.path.join(dest, p.lstrip("/")))
+    seconds, (ok, ko) = _timed(downloader.run)
+    return {"seconds": seconds, "icons": len(icons), "workers": workers, "dl_ok": ok, "dl_ko": ko}
+
+
+def bench_pool_fetch(m, stub, workdir):
+    cache = m.PoolCache(root=os.path.join(workdir, "pool_cache"), lang="fr")
+    url = f"{stub.base_url}/data/fr/items.json.gz"
+    cold, pool = _timed(lambda: m._fetch_pool_cached(url, cache))
+    warm, _ = _timed(lambda: m._fetch_pool_cached(url, cache))
+    return {"cold_seconds": cold, "revalidated_seconds": warm, "entries": len(pool)}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, previous_path: str):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    prev = {(r["bench"], r["size"], r.get("workers")): r for r in previous.get("results", [])}
+    print(f"\nComparaison avec {previous.get('commit')} ({previous_path})")
+    for r in current["results"]:
+        old = prev.get((r["bench"], r["size"], r.get("workers")))
+        key = "seconds" if "seconds" in r else "cold_seconds"
+        if not old or not old.get(key) or r.get(key) is None:
+            continue
+        ratio = r[key] / old[key]
+        flag = "  <-- plus lent" if ratio > 1.10 else ""
+        label = f"{r['bench']}/{r['workers']}" if r.get("workers") else r["bench"]
+        print(f"  {label:<12} size={r['size']:<8} {old[key]:.4f}s -> {r[key]:.4f}s ({ratio:.2f}x){flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de performance de import.py")
+    parser.add_argument("--sizes", default="20000,200000", help="tailles de pool (entrées), séparées par des virgules")
+    parser.add_argument("--html-items", type=int, default=1000, help="nombre de cartes dans la page HTML synthétique")
+    parser.add_argument("--icons", type=int, default=500, help="nombre d'icônes téléchargées depuis le CDN simulé")
+    parser.add_argument("--workers", default="1,8", help="tailles de pool de téléchargement à mesurer")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="latence ajoutée par requête au CDN simulé")
+    parser.add_argument("--repeat", type=int, default=3, help="répétitions (meilleur temps retenu)")
+    parser.add_argument("--out", default="", help="fichier de résultats JSON")
+    parser.add_argument("--compare", default="", help="résultats précédents à comparer")
+    args = parser.parse_args(argv)
+
+    m = load_import_module()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    report = {
+        "commit": git_commit(),
+        "date": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency_ms": args.latency_ms,
+        "results": [],
+    }
+
+    def record(bench, size, result):
+        row = {"bench": bench, "size": size, **result}
+        report["results"].append(row)
+        print(f"[bench] {bench:<12} size={size:<8} " + " ".join(
+            f"{k}={v:.4f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            started = time.perf_counter()
+            pool = generate_pool(size)
+            record("generate", size, {"seconds": time.perf_counter() - started})
+            record("resolver", size, bench_resolver(m, pool, args.repeat))
+            record("extract", size, bench_extract(m, pool, args.repeat))
+            record("html", size, bench_html(m, pool, args.html_items, workdir, args.repeat))
+            raw = gzip.compress(json.dumps(pool, ensure_ascii=False).encode("utf-8"))
+            with CdnStub({"fr": raw}, latency_ms=args.latency_ms) as stub:
+                record("pool_fetch", size, {**bench_pool_fetch(m, stub, workdir), "gzip_bytes": len(raw)})
+                for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+                    record("download", size, bench_download(m, pool, stub, args.icons, workers, workdir))
+
+    out = args.out or os.path.join(ROOT, "bench_results", f"{report['date'][:10]}_{report['commit']}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Résultats écrits dans '{out}'")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import gzip
+import importlib.util
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load_import_module():
+    # import.py n'est pas importable par son nom (mot réservé): chargement par chemin
+    module = sys.modules.get("dune_import")
+    if module is None:
+        spec = importlib.util.spec_from_file_location("dune_import", os.path.join(ROOT, "import.py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["dune_import"] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def m():
+    return _load_import_module()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Les chemins relatifs du script (images/, caches, exports) tombent dans un dossier jetable
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+class PoolBuilder:
+    # Pool indexé façon items.json: les valeurs des dicts et listes sont des indices du pool
+    def __init__(self):
+        self.pool = []
+        self._consts = {}
+
+    def add(self, value) -> int:
+        self.pool.append(value)
+        return len(self.pool) - 1
+
+    def const(self, value) -> int:
+        key = (type(value).__name__, value)
+        if key not in self._consts:
+            self._consts[key] = self.add(value)
+        return self._consts[key]
+
+    def item(self, item_id: int, name: str, icon: str | None = None, tier: int | None = None, **extra) -> int:
+        entry = {"id": item_id, "name": self.add(name), "mainCategoryId": self.const("Ressources - Minerais")}
+        if icon:
+            entry["iconPath"] = self.const(icon)
+        if tier is not None:
+            entry["tier"] = self.const(tier)
+            entry["tierIconPath"] = self.const(f"/images/dune/gui/textures/icons/gameplay/tiers/t_ui_icontier{tier}_d.webp")
+        entry.update(extra)
+        return self.add(entry)
+
+
+@pytest.fixture
+def pool_builder():
+    return PoolBuilder
+
+
+def small_pool() -> list:
+    b = PoolBuilder()
+    for i in range(12):
+        b.item(1000 + i, f"Minerai {i}", icon=f"/images/dune/gui/textures/icons/items/t_ui_icon{i}_d.webp",
+               tier=i % 3 + 1)
+    return b.pool
+
+
+@pytest.fixture
+def pool():
+    return small_pool()
+
+
+class Reply(NamedTuple):
+    status: int = 200
+    body: bytes = b""
+    headers: dict = {}
+    drop: bool = False  # connexion fermée sans réponse
+    truncate: int | None = None  # n octets envoyés sur un Content-Length complet, puis coupure
+    ranged: bool = False  # honore un en-tête Range "bytes=n-" par un 206 sur la fin du corps
+
+
+class StubServer:
+    # Serveur HTTP local, même principe que CdnStub (scripts/bench_import.py): chaque chemin sert
+    # une suite de réponses scriptées (la dernière se répète), les requêtes reçues sont gardées
+    def __init__(self):
+        self.routes: dict[str, list[Reply]] = {}
+        self.requests: list[tuple[str, dict]] = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                with stub._lock:
+                    stub.requests.append((path, dict(self.headers)))
+                    queue = stub.routes.get(path)
+                    reply = (queue.pop(0) if len(queue) > 1 else queue[0]) if queue else Reply(404)
+                if reply.drop:
+                    self.close_connection = True
+                    return
+                requested = self.headers.get("Range", "")
+                if reply.ranged and requested.startswith("bytes=") and requested.endswith("-"):
+                    start = int(requested[6:-1])
+                    full = len(reply.body)
+                    reply = reply._replace(status=206, body=reply.body[start:], headers={
+                        **reply.headers, "Content-Range": f"bytes {start}-{full - 1}/{full}"})
+                self.send_response(reply.status)
+                for k, v in reply.headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(reply.body)))
+                self.end_headers()
+                if reply.truncate is not None:
+                    self.wfile.write(reply.body[:reply.truncate])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(reply.body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def route(self, path: str, *replies: Reply) -> str:
+        with self._lock:
+            self.routes[path] = list(replies)
+        return self.base_url + path
+
+    def calls(self, path: str) -> list[dict]:
+        return [headers for p, headers in self.requests if p == path]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+BUNDLED_POOLS = ("items.json", "items_fr.json")
+
+
+def load_bundled(name: str) -> list:
+    with open(os.path.join(ROOT, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_baseline(name: str) -> list:
+    # Sortie de l'extracteur d'origine (commit de base) sur les pools fournis,
+    # restreinte à ses champs: référence de parité pour les chemins d'extraction
+    with gzip.open(os.path.join(ROOT, "tests", "data", "baseline_items.json.gz"), "rt", encoding="utf-8") as f:
+        return json.load(f)[name]
+
+
+def project(items: list, like: list) -> list:
+    keys = list(like[0]) if like else []
+    return [{k: it[k] for k in keys} for it in items]
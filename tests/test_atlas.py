@@ -0,0 +1,66 @@
+import json
+import os
+import time
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _icon(path, color, size=(40, 30)):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new("RGBA", size, color).save(path, format="WEBP", lossless=True)
+    return path
+
+
+@pytest.fixture
+def items(workdir):
+    out = []
+    for i, (cat, color) in enumerate([("Armes - Fusils", "red"), ("Armes - Fusils", "blue"),
+                                      ("Ressources", "green")]):
+        local = _icon(os.path.join("images", "icons", f"{i}.webp"), color)
+        out.append({"id": i, "categorie": cat, "image_local": local})
+    out.append({"id": 9, "categorie": "Ressources", "image_local": ""})
+    return out
+
+
+def _build(m, items):
+    return m.build_icon_atlases(items, out_dir="atlas", thumbs_dir="thumbs", tile=32, thumb_sizes=[16], workers=2)
+
+
+def test_atlases_place_each_icon(m, items):
+    stats = _build(m, items)
+    assert stats == {"atlas": 2, "atlas_reconstruits": 2, "atlas_reutilises": 0, "miniatures": 3}
+    assert sorted(os.listdir("atlas")) == ["armes-fusils.webp", "manifest.json", "ressources.webp"]
+    with Image.open(os.path.join("atlas", "armes-fusils.webp")) as sheet:
+        assert sheet.size == (64, 32)
+        # Icônes réduites dans leur case en gardant le ratio (40x30 -> 32x24)
+        assert items[1]["atlas"] == {"fichier": "atlas/armes-fusils.webp", "x": 32, "y": 0, "w": 32, "h": 24}
+        assert sheet.convert("RGBA").getpixel((40, 10))[:3] == (0, 0, 255)
+    assert items[3]["atlas"] is None
+    with Image.open(os.path.join("thumbs", "16", "icons", "0.webp")) as thumb:
+        assert max(thumb.size) == 16
+
+
+def test_unchanged_atlases_are_reused(m, items):
+    _build(m, items)
+    stats = _build(m, items)
+    assert (stats["atlas_reconstruits"], stats["atlas_reutilises"], stats["miniatures"]) == (0, 2, 0)
+    assert items[0]["atlas"]["x"] == 0
+
+    # Une icône modifiée ne reconstruit que l'atlas de sa catégorie
+    _icon(items[2]["image_local"], "yellow", size=(20, 20))
+    future = time.time_ns() + 60 * 10 ** 9
+    os.utime(items[2]["image_local"], ns=(future, future))
+    stats = _build(m, items)
+    assert (stats["atlas_reconstruits"], stats["atlas_reutilises"], stats["miniatures"]) == (1, 1, 1)
+    assert items[2]["atlas"]["w"] == 20
+
+
+def test_removed_category_drops_its_atlas(m, items):
+    _build(m, items)
+    stats = _build(m, items[:2])
+    assert stats["atlas"] == 1
+    assert not os.path.exists(os.path.join("atlas", "ressources.webp"))
+    with open(os.path.join("atlas", "manifest.json"), encoding="utf-8") as f:
+        assert list(json.load(f)["atlases"]) == ["armes-fusils"]
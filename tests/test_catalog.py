@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+from conftest import BUNDLED_POOLS, load_bundled
+
+
+def _extract(m, pool):
+    return m.extract_items(pool, downloader=m.IconDownloader(), download_all=False, verbose=False)
+
+
+def test_catalog_matches_full_extraction(m, workdir, pool):
+    items = _extract(m, pool)
+    catalog = m.Catalog(pool, index_dir=str(workdir / "catalog"))
+    assert catalog.index_source == "construit"
+    assert sorted(catalog.ids()) == sorted(it["id"] for it in items)
+    for it in items:
+        got = catalog.get(it["id"])
+        got.pop("recette")
+        assert got == it
+    assert catalog.get("inconnu") is None
+    assert catalog.get(999999, "défaut") == "défaut"
+
+    reopened = m.Catalog(pool, index_dir=str(workdir / "catalog"))
+    assert reopened.index_source == "disque"
+    assert reopened.get(items[0]["id"])["nom"] == items[0]["nom"]
+
+
+@pytest.mark.parametrize("name", BUNDLED_POOLS)
+def test_catalog_matches_extraction_on_bundled_pools(m, workdir, name):
+    pool = load_bundled(name)
+    items = _extract(m, pool)
+    # Le catalogue rend le premier item extrait pour un id donné
+    first = {}
+    for it in items:
+        first.setdefault(it["id"], it)
+    catalog = m.Catalog(pool, index_dir=None)
+    assert sorted(catalog.ids()) == sorted(first)
+    for item_id, it in first.items():
+        got = catalog.get(item_id)
+        got.pop("recette")
+        assert got == it, item_id
+        if it["url_fiche"]:
+            assert catalog.by_url(it["url_fiche"])["id"] == item_id
+
+
+def test_catalog_skips_rejected_entries(m, workdir, pool_builder):
+    b = pool_builder()
+    # Même id: d'abord une entrée que l'extraction écarte (nom technique), puis l'item réel
+    b.item(42, "BP_Minerai_Technique", tier=1)
+    b.item(42, "Minerai réel", tier=1)
+    b.item(43, "ItemStats_Fer", tier=1)
+    catalog = m.Catalog(b.pool, index_dir=None)
+    assert catalog.ids() == [42]
+    assert catalog.get(42)["nom"] == "Minerai réel"
+    assert catalog.get(43) is None
+
+
+def test_catalog_returns_independent_copies(m, workdir, pool):
+    catalog = m.Catalog(pool, index_dir=None)
+    item_id = catalog.ids()[0]
+    got = catalog.get(item_id)
+    got["statistiques"].append({"nom": "modifié"})
+    got["nom"] = "modifié"
+    again = catalog.get(item_id)
+    assert again["statistiques"] == [] and again["nom"] != "modifié"
+
+
+def test_catalog_queues_each_icon_once(m, workdir, pool):
+    catalog = m.Catalog(pool, index_dir=None, cache_size=2)
+    for _ in range(3):
+        for item_id in catalog.ids():
+            catalog.get(item_id)
+    assert catalog.cache.stats()["evictions"] > 0
+    local_paths = [lp for _, lp in catalog.downloader.jobs]
+    assert len(local_paths) == len(set(local_paths))
+    # 12 icônes d'item + 3 icônes de tier
+    assert len(local_paths) == 15
+
+
+def test_lru_cache_is_thread_safe(m):
+    cache = m._LRUCache(8)
+
+    def worker(offset):
+        for i in range(2000):
+            cache.put((offset + i) % 32, i)
+            cache.get((offset + i * 7) % 32)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = cache.stats()
+    assert stats["taille"] <= 8
+    assert stats["hits"] + stats["misses"] == 8000
@@ -0,0 +1,276 @@
+import hashlib
+import os
+import struct
+import threading
+import time
+
+import requests
+
+from conftest import Reply
+
+LOCAL = os.path.join("images", "icons", "a.webp")
+BODY = b"RIFF" + b"\x10\x00\x00\x00" + b"WEBP" + b"x" * 12
+
+
+def _downloader(m, **kwargs):
+    kwargs.setdefault("retries", 2)
+    return m.IconDownloader(workers=2, backoff=0, rate_per_host=0, **kwargs)
+
+
+def test_retries_server_errors(m, workdir, stub_server):
+    url = stub_server.route("/images/icons/a.webp", Reply(503), Reply(drop=True), Reply(200, BODY))
+    dl = _downloader(m)
+    dl.submit(url, LOCAL)
+    assert dl.run() == (1, 0)
+    assert (dl.retried, dl.fetched) == (2, 1)
+    assert len(stub_server.calls("/images/icons/a.webp")) == 3
+    with open(LOCAL, "rb") as f:
+        assert f.read() == BODY
+
+
+def test_client_errors_are_not_retried(m, workdir, stub_server):
+    url = stub_server.route("/images/icons/a.webp", Reply(404))
+    dl = _downloader(m)
+    dl.submit(url, LOCAL)
+    assert dl.run() == (0, 1)
+    assert len(stub_server.calls("/images/icons/a.webp")) == 1
+    assert not os.path.exists(LOCAL)
+
+
+def test_gives_up_after_retries(m, workdir, stub_server):
+    url = stub_server.route("/images/icons/a.webp", Reply(500))
+    dl = _downloader(m, retries=3)
+    dl.submit(url, LOCAL)
+    assert dl.run() == (0, 1)
+    assert len(stub_server.calls("/images/icons/a.webp")) == 4
+
+
+def test_duplicate_jobs_fetch_once_but_count_each(m, workdir, stub_server):
+    url = stub_server.route("/images/icons/a.webp", Reply(200, BODY))
+    dl = _downloader(m)
+    for _ in range(3):
+        dl.submit(url, LOCAL)
+    assert dl.run() == (3, 0)
+    assert len(stub_server.calls("/images/icons/a.webp")) == 1
+    assert dl.jobs == []
+
+
+def test_all_downloads_share_the_given_session(m, workdir, stub_server):
+    class CountingSession(requests.Session):
+        gets = 0
+
+        def get(self, *args, **kwargs):
+            CountingSession.gets += 1
+            return super().get(*args, **kwargs)
+
+    urls = [stub_server.route(f"/images/icons/{i}.webp", Reply(200, BODY)) for i in range(6)]
+    dl = _downloader(m, session=CountingSession())
+    for i, url in enumerate(urls):
+        dl.submit(url, os.path.join("images", "icons", f"{i}.webp"))
+    assert dl.run() == (6, 0)
+    assert CountingSession.gets == 6
+
+
+def _manifest(m):
+    return m.AssetManifest(m.asset_manifest_path(LOCAL))
+
+
+def test_manifest_skips_known_files(m, workdir, stub_server):
+    url = stub_server.route("/images/icons/a.webp", Reply(200, BODY, {"ETag": '"v1"'}))
+    dl = _downloader(m)
+    dl.submit(url, LOCAL)
+    assert dl.run() == (1, 0)
+    entry = _manifest(m).get(LOCAL)
+    assert (entry["url"], entry["size"], entry["etag"]) == (url, len(BODY), '"v1"')
+
+    # Nouveau run: le manifeste suffit, aucune requête
+    dl = _downloader(m)
+    dl.submit(url, LOCAL)
+    assert dl.run() == (1, 0)
+    assert len(stub_server.calls("/images/icons/a.webp")) == 1
+
+    # Fichier supprimé: l'entrée ne prouve plus rien
+    os.remove(LOCAL)
+    dl = _downloader(m)
+    dl.submit(url, LOCAL)
+    assert dl.run() == (1, 0)
+    assert len(stub_server.calls("/images/icons/a.webp")) == 2
+
+
+def test_changed_url_is_revalidated(m, workdir, stub_server):
+    old = stub_server.route("/v1/images/icons/a.webp", Reply(200, BODY, {"ETag": '"v1"'}))
+    new = stub_server.route("/v2/images/icons/a.webp", Reply(304))
+    dl = _downloader(m)
+    dl.submit(old, LOCAL)
+    dl.run()
+    dl = _downloader(m)
+    dl.submit(new, LOCAL)
+    assert dl.run() == (1, 0)
+    assert stub_server.calls("/v2/images/icons/a.webp")[0]["If-None-Match"] == '"v1"'
+    assert _manifest(m).get(LOCAL)["url"] == new
+    assert dl.fetched == 0
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_adopts_complete_files_only(m, workdir, stub_server):
+    url = stub_server.route("/images/icons/a.webp", Reply(200, BODY))
+    other = stub_server.route("/images/icons/b.webp", Reply(200, BODY))
+    truncated = os.path.join("images", "icons", "b.webp")
+    _write(LOCAL, BODY)
+    _write(truncated, BODY[:20])
+    dl = _downloader(m)
+    dl.submit(url, LOCAL)
+    dl.submit(other, truncated)
+    assert dl.run() == (2, 0)
+    assert (dl.adopted, dl.fetched) == (1, 1)
+    assert stub_server.calls("/images/icons/a.webp") == []
+    with open(truncated, "rb") as f:
+        assert f.read() == BODY
+
+
+def test_adopt_failure_falls_back_to_download(m, workdir, stub_server, monkeypatch):
+    url = stub_server.route("/images/icons/a.webp", Reply(200, BODY))
+    _write(LOCAL, BODY)
+
+    def unreadable(*args, **kwargs):
+        raise PermissionError("illisible")
+
+    monkeypatch.setattr(m, "_file_sha256", unreadable)
+    dl = _downloader(m)
+    dl.submit(url, LOCAL)
+    # Les erreurs de l'adoption ne remontent pas jusqu'à run(): le fichier est retéléchargé
+    assert dl.run() == (1, 0)
+    assert (dl.adopted, dl.fetched) == (0, 1)
+    assert len(stub_server.calls("/images/icons/a.webp")) == 1
+
+
+def test_manifest_write_failure_does_not_fail_run(m, workdir, stub_server, monkeypatch):
+    url = stub_server.route("/images/icons/a.webp", Reply(200, BODY))
+    write = m._atomic_write_bytes
+
+    def failing(path, data):
+        if path.endswith(m.ASSET_MANIFEST_NAME):
+            raise OSError("disque plein")
+        return write(path, data)
+
+    monkeypatch.setattr(m, "_atomic_write_bytes", failing)
+    dl = _downloader(m)
+    dl.submit(url, LOCAL)
+    assert dl.run() == (1, 0)
+    monkeypatch.setattr(m, "_atomic_write_bytes", write)
+    # Le run suivant adopte le fichier, sans requête
+    dl = _downloader(m)
+    dl.submit(url, LOCAL)
+    assert dl.run() == (1, 0)
+    assert dl.adopted == 1
+    assert len(stub_server.calls("/images/icons/a.webp")) == 1
+
+
+def test_concurrent_saves_keep_every_entry(m, tmp_path, monkeypatch):
+    write = m._atomic_write_bytes
+    writing = threading.Event()
+
+    def slow_first_write(path, data):
+        # La première sauvegarde est lente: sans verrou, son instantané (plus ancien)
+        # arriverait sur disque après celui de la sauvegarde suivante
+        if not writing.is_set():
+            writing.set()
+            time.sleep(0.2)
+        write(path, data)
+
+    monkeypatch.setattr(m, "_atomic_write_bytes", slow_first_write)
+    manifest = m.AssetManifest(str(tmp_path / m.ASSET_MANIFEST_NAME))
+    manifest.put("images/a.webp", {"size": 1})
+    first = threading.Thread(target=manifest.save)
+    first.start()
+    writing.wait()
+    manifest.put("images/b.webp", {"size": 2})
+    manifest.save()
+    first.join()
+    assert sorted(m.AssetManifest(manifest.path).entries) == ["images/a.webp", "images/b.webp"]
+
+    # Nombreux écrivains concurrents: aucune entrée perdue
+    barrier = threading.Barrier(8)
+
+    def worker(k):
+        barrier.wait()
+        for i in range(25):
+            manifest.put(f"images/{k}/{i}.webp", {"size": i})
+            manifest.save()
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(m.AssetManifest(manifest.path).entries) == 202
+
+
+def test_interrupted_download_resumes_with_range(m, workdir, stub_server):
+    size = 100_000
+    body = b"RIFF" + struct.pack("<I", size - 8) + b"WEBP" + bytes(range(256)) * ((size - 12) // 256) + b"\0" * ((size - 12) % 256)
+    stub_server.route("/images/icons/a.webp", Reply(200, body, {"ETag": '"v1"'}, truncate=size // 2),
+                      Reply(200, body, {"ETag": '"v1"'}, ranged=True))
+    dl = _downloader(m, retries=1)
+    dl.submit(stub_server.base_url + "/images/icons/a.webp", LOCAL)
+    assert dl.run() == (1, 0)
+    second = stub_server.calls("/images/icons/a.webp")[1]
+    offset = int(second["Range"][6:-1])
+    assert 0 < offset <= size // 2
+    assert second["If-Range"] == '"v1"'
+    assert dl.resumed == 1
+    # Seule la fin manquante est retransférée
+    assert dl.bytes_downloaded == size - offset
+    with open(LOCAL, "rb") as f:
+        assert f.read() == body
+    assert _manifest(m).get(LOCAL)["sha256"] == hashlib.sha256(body).hexdigest()
+    assert not [f for f in os.listdir(os.path.dirname(LOCAL)) if ".part" in f]
+
+
+def test_resume_restarts_when_resource_changed(m, workdir, stub_server):
+    size = 100_000
+    body = b"RIFF" + struct.pack("<I", size - 8) + b"WEBP" + b"a" * (size - 12)
+    changed = body[:12] + b"b" * (size - 12)
+    # If-Range ne correspond plus: le serveur renvoie la nouvelle ressource entière (200)
+    stub_server.route("/images/icons/a.webp", Reply(200, body, {"ETag": '"v1"'}, truncate=size // 2),
+                      Reply(200, changed, {"ETag": '"v2"'}))
+    dl = _downloader(m, retries=1)
+    dl.submit(stub_server.base_url + "/images/icons/a.webp", LOCAL)
+    assert dl.run() == (1, 0)
+    assert dl.resumed == 0
+    with open(LOCAL, "rb") as f:
+        assert f.read() == changed
+
+
+def test_one_manifest_per_destination_root(m, workdir, stub_server):
+    url = stub_server.route("/images/icons/a.webp", Reply(200, BODY))
+    targets = [LOCAL, os.path.join("exports", "images", "icons", "a.webp"), os.path.join("vrac", "a.webp")]
+    dl = _downloader(m)
+    for path in targets:
+        dl.submit(url, path)
+    assert dl.run() == (3, 0)
+    for path, manifest in zip(targets, [os.path.join("images", m.ASSET_MANIFEST_NAME),
+                                        os.path.join("exports", "images", m.ASSET_MANIFEST_NAME),
+                                        os.path.join("vrac", m.ASSET_MANIFEST_NAME)]):
+        assert m.asset_manifest_path(path) == manifest
+        assert list(m.AssetManifest(manifest).entries) == [path]
+
+
+def test_unique_downloader_queues_each_file_once(m, workdir, stub_server):
+    url = stub_server.route("/images/icons/a.webp", Reply(200, BODY))
+    dl = _downloader(m, unique=True)
+    for _ in range(3):
+        dl.submit(url, LOCAL)
+    assert dl.jobs == [(url, LOCAL)]
+    assert dl.run() == (1, 0)
+    # Fichier déjà traité: plus remis en file, ni retéléchargé
+    dl.submit(url, LOCAL)
+    assert dl.jobs == []
+    # Compteurs cumulés sur la vie du downloader
+    assert dl.run() == (1, 0)
+    assert len(stub_server.calls("/images/icons/a.webp")) == 1
@@ -0,0 +1,127 @@
+import gzip
+import json
+import os
+import threading
+
+import pytest
+
+from conftest import Reply
+
+
+def test_atomic_writes_use_a_private_tmp_file(m, tmp_path):
+    path = str(tmp_path / "sub" / "out.json")
+    names = set()
+    barrier = threading.Barrier(4)
+
+    def worker(k):
+        barrier.wait()
+        names.add(m._tmp_path_for(path))
+        for _ in range(50):
+            m._atomic_write_bytes(path, f"{k}".encode() * 100)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(names) == 4
+    with open(path, "rb") as f:
+        data = f.read()
+    assert len(set(data)) == 1 and len(data) == 100
+    assert os.listdir(tmp_path / "sub") == ["out.json"]
+
+
+def test_atomic_path_removes_tmp_on_failure(m, tmp_path):
+    path = str(tmp_path / "out.bin")
+    m._atomic_write_bytes(path, b"ancien")
+    with pytest.raises(RuntimeError):
+        with m._atomic_path(path) as tmp, open(tmp, "wb") as f:
+            f.write(b"partiel")
+            raise RuntimeError("échec")
+    assert os.listdir(tmp_path) == ["out.bin"]
+    with open(path, "rb") as f:
+        assert f.read() == b"ancien"
+
+
+@pytest.mark.parametrize("env", [{"INCREMENTAL": "1"}, {"MONGO_UPSERT": "1"}, {"SEARCH_INDEX": "1"},
+                                 {"STATS_MATRIX": "1"}, {"RECIPE_GRAPH": "1"}])
+def test_multilang_refuses_single_language_options(m, workdir, monkeypatch, env):
+    monkeypatch.setattr(m, "DUNE_LANGS", ["en", "fr"])
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+
+    def fetch(*args, **kwargs):
+        raise AssertionError("aucun pool ne doit être chargé")
+
+    monkeypatch.setattr(m, "export_multilang", fetch)
+    with pytest.raises(SystemExit) as exc:
+        m.run_export()
+    assert next(iter(env)) in str(exc.value)
+    assert not os.path.exists(m.I18N_EXPORT_PATH)
+
+
+def test_multilang_refuses_ndjson(m, monkeypatch):
+    monkeypatch.setattr(m, "EXPORT_FORMAT", "ndjson")
+    with pytest.raises(SystemExit, match="EXPORT_FORMAT=ndjson"):
+        m.check_multilang_options(["en", "fr"])
+    monkeypatch.setattr(m, "EXPORT_FORMAT", "json")
+    m.check_multilang_options(["en", "fr"])
+
+
+def _serve_pool(m, stub_server, monkeypatch, pool):
+    monkeypatch.setattr(m, "BASE_URL", stub_server.base_url + "/data")
+    monkeypatch.setattr(m, "VERSION_URL", "")
+    # Icônes demandées au serveur local (404), jamais au CDN
+    monkeypatch.setattr(m, "CDN_ROOT", stub_server.base_url)
+    monkeypatch.delenv("USE_LOCAL", raising=False)
+    monkeypatch.setattr(m.PoolIndex, "_shared", None)
+    stub_server.route("/data/fr/items.json.gz", Reply(200, gzip.compress(json.dumps(pool).encode("utf-8"))))
+
+
+def test_catalog_refresh_replaces_export_atomically(m, workdir, stub_server, monkeypatch, pool):
+    _serve_pool(m, stub_server, monkeypatch, pool)
+    m.write_export(m.EXPORT_PATH, {"meta": {}, "items": [{"id": 1}]})
+    service = m.CatalogService("fr")
+    assert service.items == [{"id": 1}]
+
+    # Échec au moment du renommage: l'export précédent reste intact, sans fichier temporaire
+    replace = os.replace
+
+    def failing_replace(src, dst):
+        if dst == m.EXPORT_PATH:
+            raise OSError("disque plein")
+        return replace(src, dst)
+
+    monkeypatch.setattr(m.os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        service.refresh()
+    assert m.load_export(m.EXPORT_PATH) == [{"id": 1}]
+    assert not [f for f in os.listdir(".") if ".tmp" in f]
+
+    monkeypatch.setattr(m.os, "replace", replace)
+    assert service.refresh()
+    exported = m.load_export(m.EXPORT_PATH)
+    assert [it["id"] for it in exported] == [1000 + i for i in range(12)]
+    assert json.loads(service.published["body"])["items"] == exported
+
+
+def test_multilang_streams_each_pool_once(m, workdir, stub_server, monkeypatch, pool_builder):
+    for lang, prefix in (("fr", "Minerai"), ("en", "Ore")):
+        b = pool_builder()
+        for i in range(4):
+            b.item(1000 + i, f"{prefix} {i}")
+        stub_server.route(f"/data/{lang}/items.json.gz", Reply(200, gzip.compress(json.dumps(b.pool).encode("utf-8")),
+                                                               {"ETag": f'"{lang}"'}))
+    monkeypatch.setattr(m, "BASE_URL", stub_server.base_url + "/data")
+    monkeypatch.setattr(m, "CDN_ROOT", stub_server.base_url)
+
+    def no_full_read(*args, **kwargs):
+        raise AssertionError("pool décodé une seconde fois depuis le cache")
+
+    monkeypatch.setattr(m, "load_pool", no_full_read)
+    items = m.export_multilang(["fr", "en"], workers=2)
+    assert [it["nom"] for it in items] == [{"fr": f"Minerai {i}", "en": f"Ore {i}"} for i in range(4)]
+    for lang in ("fr", "en"):
+        assert len(stub_server.calls(f"/data/{lang}/items.json.gz")) == 1
+        assert m.PoolCache(lang=lang).read_ref()["etag"] == f'"{lang}"'
+    assert m._SHARED_LANG_POOLS == {}
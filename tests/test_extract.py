@@ -0,0 +1,123 @@
+import copy
+
+import pytest
+
+from conftest import BUNDLED_POOLS, load_baseline, load_bundled, project
+
+
+def _extract(m, pool, **kwargs):
+    downloader = m.IconDownloader()
+    items = m.extract_items(pool, downloader=downloader, download_all=False, verbose=False, **kwargs)
+    return items, downloader
+
+
+@pytest.mark.parametrize("name", BUNDLED_POOLS)
+def test_serial_extraction_matches_baseline(m, workdir, name):
+    baseline = load_baseline(name)
+    report = {}
+    items, _ = _extract(m, load_bundled(name), report=report)
+    assert project(items, baseline) == baseline
+    # Le mémo de la recherche profonde sert bien, sans changer un seul item
+    assert report["deep_memo_hits"] > 0
+
+
+def _run_incremental(m, pool, prev_items, fp_path, **kwargs):
+    state = m.IncrementalState(prev_items, fp_path=fp_path)
+    items, downloader = _extract(m, pool, incremental=state, **kwargs)
+    state.save()
+    return items, downloader, state
+
+
+@pytest.mark.parametrize("name", BUNDLED_POOLS)
+def test_incremental_matches_normal_run_on_bundled_pools(m, workdir, name):
+    pool = load_bundled(name)
+    fp = str(workdir / "fp.json")
+    fresh, fresh_dl = _extract(m, pool)
+    first, first_dl, state = _run_incremental(m, pool, [], fp)
+    assert first == fresh
+    assert first_dl.jobs == fresh_dl.jobs
+    assert (state.reused, state.extracted) == (0, len(fresh))
+
+    second, dl, state = _run_incremental(m, pool, first, fp)
+    assert second == fresh
+    assert (state.reused, state.extracted) == (len(fresh), 0)
+    # Les icônes des items réutilisés sont soumises comme à l'extraction
+    assert dl.jobs == fresh_dl.jobs
+
+
+def test_incremental_classifies_the_pool_once(m, workdir, pool, monkeypatch):
+    built = []
+
+    class CountingShapes(m.PoolShapes):
+        def __init__(self, p):
+            built.append(p)
+            super().__init__(p)
+
+    monkeypatch.setattr(m, "PoolShapes", CountingShapes)
+    _run_incremental(m, pool, [], str(workdir / "fp.json"), index=m.PoolIndex(pool))
+    assert built == [pool]
+
+
+def test_incremental_reextracts_changed_entry(m, workdir, pool):
+    fp = str(workdir / "fp.json")
+    first, _, _ = _run_incremental(m, pool, [], fp)
+    changed = copy.deepcopy(pool)
+    changed[pool[-1]["name"]] = "Minerai renommé"
+    items, _, state = _run_incremental(m, changed, first, fp)
+    assert (state.reused, state.extracted) == (len(first) - 1, 1)
+    assert items[-1]["nom"] == "Minerai renommé"
+    assert items == _extract(m, changed)[0]
+
+
+@pytest.mark.parametrize("attr, value", [("EXTRACTOR_VERSION", 10 ** 6), ("CDN_ROOT", "https://autre-cdn.test"),
+                                         ("ASSET_VERSION", "autre")])
+def test_incremental_salt_invalidates_everything(m, workdir, pool, monkeypatch, attr, value):
+    fp = str(workdir / "fp.json")
+    first, _, first_state = _run_incremental(m, pool, [], fp)
+    monkeypatch.setattr(m, attr, value)
+    items, _, state = _run_incremental(m, pool, first, fp)
+    assert state.salt != first_state.salt
+    assert (state.reused, state.extracted) == (0, len(first))
+    assert items == _extract(m, pool)[0]
+
+
+def test_changeset_lists_added_modified_removed(m):
+    prev = [{"id": 1, "nom": "a"}, {"id": 2, "nom": "b"}, {"id": None, "url_fiche": "u", "nom": "c"}]
+    new = [{"id": 1, "nom": "a"}, {"id": 2, "nom": "B"}, {"id": 3, "nom": "d"}]
+    diff = m.diff_items(prev, new)
+    assert [it["id"] for it in diff["added"]] == [3]
+    assert [it["id"] for it in diff["modified"]] == [2]
+    assert diff["removed"] == ["u"]
+
+
+@pytest.mark.parametrize("name", BUNDLED_POOLS)
+def test_item_heuristic_runs_once_per_shape(m, workdir, monkeypatch, name):
+    pool = load_bundled(name)
+    calls = []
+    looks_like_item = m.looks_like_item
+
+    def counting(entry):
+        calls.append(tuple(entry))
+        return looks_like_item(entry)
+
+    monkeypatch.setattr(m, "looks_like_item", counting)
+    index = m.PoolIndex(pool)
+    items, _ = _extract(m, pool, index=index)
+    m.Catalog(pool, index=index, index_dir=None)
+    m.RecipeGraph.from_pool(pool, shapes=index.shapes)
+    # Extraction, index du catalogue et recettes lisent les positions classées sans retester d'entrée
+    assert len(calls) == len(index.shapes.keys)
+    assert len(items) == len(load_baseline(name))
+
+
+def test_stats_read_only_classified_stat_triples(m, workdir, pool_builder):
+    b = pool_builder()
+    attr = b.add({"name": b.add("Dégâts"), "higherIsBetter": b.const(True)})
+    stat = b.add({"key": b.add("damage"), "attribute": attr, "value": 40.5})
+    stat_without_value = b.add({"key": b.add("armor"), "attribute": b.add("Armure")})
+    # Ni triplet stat ni descripteur: ignoré même s'il porte une clé attribute
+    stray = b.add({"attribute": b.add("Intrus"), "value": 1, "note": b.add("x")})
+    b.item(1, "Fusil", tier=2, attributeValues=b.add([stat, stat_without_value, stray, b.const("texte")]))
+    stats = _extract(m, b.pool)[0][0]["statistiques"]
+    assert [(s["attribut"], s["valeur"], s["est_pourcentage"]) for s in stats] == [("Dégâts", 40.5, None),
+                                                                                   ("Armure", None, None)]
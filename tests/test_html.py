@@ -0,0 +1,73 @@
+import gzip
+import io
+import json
+import os
+
+import pytest
+
+from conftest import ROOT
+
+PAGE = os.path.join(ROOT, "Dune Awakening Items.html")
+
+ITEM = ('<a href="https://dune.gaming.tools/fr/items/{slug}" class="block rounded-md bg-slate-900 p-2">'
+        '<div class="icon-container"><img src="./Dune Awakening Items_files/{slug}.webp"></div>'
+        '<span class="text-xl font-bold"><span>{name}</span></span>'
+        '<span class="text-sm">{category}</span><span class="tag">{tier}</span></a>')
+
+# Cas limites du découpage: références de caractères et '<' littéraux à cheval sur deux blocs
+EDGE_DOC = "<html><body>" + "".join([
+    ITEM.format(slug="a", name="Acier &amp; plastacier", category="Divers &#8211; Composants", tier="Tier 2"),
+    ITEM.format(slug="b", name="Fl&eacute;chette", category="Armes &lt;lourdes&gt;", tier="T&#51;"),
+    ITEM.format(slug="c", name="Moins < plus", category="a<b", tier="<4"),
+    ITEM.format(slug="d", name="Cœur &#x26; âme", category="Ressources", tier="Tier 5"),
+]) + "</body></html>"
+
+EDGE_EXPECTED = [
+    ("Acier & plastacier", "Divers – Composants", 2),
+    ("Fléchette", "Armes <lourdes>", 3),
+    # Comme l'original: un '<' littéral coupe le texte, seul le premier morceau est gardé
+    ("Moins", "a", 4),
+    ("Cœur & âme", "Ressources", 5),
+]
+
+
+def _parse(m, text, chunk_size=None):
+    parser = m.ItemsHTMLParser()
+    if chunk_size is None:
+        parser.feed(text)
+    else:
+        m.feed_html_chunked(parser, io.StringIO(text), chunk_size)
+    parser.close()
+    return parser.items
+
+
+@pytest.fixture(scope="module")
+def page():
+    with open(PAGE, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def baseline_page():
+    # Sortie de l'ItemsHTMLParser d'origine (commit de base) sur la page entière
+    with gzip.open(os.path.join(ROOT, "tests", "data", "baseline_html_items.json.gz"), "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("chunk_size", [None, 97, 4096, 64 * 1024])
+def test_page_matches_baseline_parser(m, page, baseline_page, chunk_size):
+    assert _parse(m, page, chunk_size) == baseline_page
+
+
+@pytest.mark.parametrize("chunk_size", [None, *range(1, 12), 16, 33, 100, 1000])
+def test_edge_cases_survive_any_split(m, chunk_size):
+    items = _parse(m, EDGE_DOC, chunk_size)
+    assert [(it["nom"], it["categorie"], it["tier"]) for it in items] == EDGE_EXPECTED
+
+
+def test_iter_items_from_html_streams_the_page(m, workdir, monkeypatch, baseline_page):
+    # Le chemin complet (lecture par blocs + post-traitement) garde les items et leur ordre
+    monkeypatch.setattr(m, "HTML_CHUNK_SIZE", 1024)
+    items = m.parse_items_from_html(PAGE, index=m.PoolIndex([]))
+    assert [(it["url_fiche"], it["nom"], it["categorie"], it["tier"]) for it in items] == \
+        [(it["url_fiche"], it["nom"], it["categorie"], it["tier"]) for it in baseline_page]
@@ -0,0 +1,76 @@
+import json
+import multiprocessing
+import time
+
+import pytest
+
+
+def test_stage_times_accumulate_even_on_error(m):
+    metrics = m.Metrics()
+    with metrics.stage("a"):
+        time.sleep(0.01)
+    with pytest.raises(ValueError):
+        with metrics.stage("a"):
+            time.sleep(0.01)
+            raise ValueError
+    assert metrics.stages["a"] >= 0.02
+
+
+def test_merge_and_report(m):
+    parent, child = m.Metrics(), m.Metrics()
+    parent.incr("dl_ok", 3)
+    child.incr("dl_ok", 1)
+    child.incr("dl_ko", 4)
+    child.add_time("resolution", 1.5)
+    child.observe_max("deep_search_max_depth", 7)
+    parent.observe_max("deep_search_max_depth", 5)
+    parent.merge(child.snapshot())
+    rep = parent.report()
+    assert rep["counters"] == {"dl_ok": 4, "dl_ko": 4}
+    assert rep["stages"] == {"resolution": 1.5}
+    assert rep["maxima"] == {"deep_search_max_depth": 7}
+    assert rep["derived"]["dl_failure_rate"] == 0.5
+
+
+def test_writers(m, tmp_path):
+    metrics = m.Metrics()
+    metrics.add_time("pool_fetch", 0.25)
+    metrics.incr("pool_bytes", 1024)
+    metrics.write_json(str(tmp_path / "metrics.json"), extra={"lang": "fr"})
+    with open(tmp_path / "metrics.json", encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["lang"] == "fr" and data["stages"] == {"pool_fetch": 0.25}
+    metrics.write_prometheus(str(tmp_path / "metrics.prom"), extra_labels={"lang": "fr"})
+    lines = (tmp_path / "metrics.prom").read_text(encoding="utf-8").splitlines()
+    assert 'dune_import_stage_seconds{stage="pool_fetch",lang="fr"} 0.250000' in lines
+    assert 'dune_import_counter{name="pool_bytes",lang="fr"} 1024' in lines
+
+
+def _extract_metrics(m, pool, parallel):
+    m.METRICS.reset()
+    downloader = m.IconDownloader()
+    if parallel:
+        m.extract_items_parallel(pool, workers=2, downloader=downloader)
+    else:
+        m.extract_items(pool, downloader=downloader, download_all=False, verbose=False)
+    return m.METRICS.report()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="fork requis")
+def test_extraction_metrics_survive_the_fork(m, workdir, pool, monkeypatch):
+    monkeypatch.delenv("DOWNLOAD_ALL_IMAGES", raising=False)
+    try:
+        serial = _extract_metrics(m, pool, parallel=False)
+        parallel = _extract_metrics(m, pool, parallel=True)
+    finally:
+        m.METRICS.reset()
+    assert {"classification", "resolution"} <= set(serial["stages"])
+    assert {"classification", "resolution"} <= set(parallel["stages"])
+    # Les compteurs des shards remontent au processus parent; les caches étant propres à chaque
+    # shard, seul le nombre de résolutions d'icônes (hits + misses) est comparable au run série
+    def lookups(rep):
+        c = rep["counters"]
+        return c["resolver_icon_hits"] + c["resolver_icon_misses"], c["resolver_icon_fallback"]
+
+    assert lookups(serial)[0] > 0
+    assert lookups(parallel) == lookups(serial)
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+
+def _src(workdir, name, data):
+    path = workdir / "page_files" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+def _mirror(m, workdir, files, mode="auto"):
+    mirror = m.AssetMirror(manifest_path=str(workdir / "mirror.json"), mode=mode, workers=4)
+    for name, src in files.items():
+        mirror.add(src, str(workdir / "images" / "html_assets" / name), f"images/html_assets/{name}")
+    return mirror, mirror.run()
+
+
+def _read(workdir, name):
+    return (workdir / "images" / "html_assets" / name).read_bytes()
+
+
+@pytest.fixture
+def files(workdir):
+    return {f"{i}.webp": _src(workdir, f"{i}.webp", bytes([i]) * (1000 + i)) for i in range(5)}
+
+
+@pytest.mark.parametrize("mode, method", [("auto", "hardlink"), ("hardlink", "hardlink"), ("copy", "copie")])
+def test_mirror_copies_every_file(m, workdir, files, mode, method):
+    mirror, results = _mirror(m, workdir, files, mode)
+    assert all(results.values()) and len(results) == 5
+    assert mirror.stats[method] == 5
+    for i in range(5):
+        assert _read(workdir, f"{i}.webp") == bytes([i]) * (1000 + i)
+    assert not [f for f in os.listdir(workdir / "images" / "html_assets") if ".tmp" in f]
+
+
+def test_unchanged_page_copies_nothing(m, workdir, files, monkeypatch):
+    _mirror(m, workdir, files, "copy")
+
+    def no_copy(*args):
+        raise AssertionError("copie inutile")
+
+    monkeypatch.setattr(m, "_kernel_copy", no_copy)
+    monkeypatch.setattr(m, "_file_sha256", no_copy)
+    mirror, results = _mirror(m, workdir, files, "copy")
+    assert all(results.values())
+    assert mirror.stats["inchanges"] == 5
+
+
+def test_touched_and_changed_sources(m, workdir, files):
+    _mirror(m, workdir, files, "copy")
+    # Source retouchée sans changement de contenu: hachée, pas recopiée
+    st = os.stat(files["0.webp"])
+    os.utime(files["0.webp"], ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    # Contenu modifié (même taille): recopié
+    _src(workdir, "1.webp", b"\xff" * 1001)
+    mirror, _ = _mirror(m, workdir, files, "copy")
+    assert (mirror.stats["inchanges"], mirror.stats["copie"]) == (4, 1)
+    assert _read(workdir, "1.webp") == b"\xff" * 1001
+    assert mirror.entries["images/html_assets/0.webp"]["mtime_ns"] == st.st_mtime_ns + 10 ** 9
+
+
+def test_existing_copy_without_manifest_is_kept(m, workdir, files):
+    dest = workdir / "images" / "html_assets" / "0.webp"
+    dest.parent.mkdir(parents=True)
+    dest.write_bytes(bytes([0]) * 1000)
+    mirror, _ = _mirror(m, workdir, {"0.webp": files["0.webp"]}, "copy")
+    assert (mirror.stats["inchanges"], mirror.stats["copie"]) == (1, 0)
+
+
+def test_missing_source_is_a_failure(m, workdir, files):
+    os.remove(files["3.webp"])
+    mirror, results = _mirror(m, workdir, files, "copy")
+    assert results["images/html_assets/3.webp"] is False
+    assert mirror.stats["echecs"] == 1
+    assert "images/html_assets/3.webp" not in mirror.entries
+
+
+def test_kernel_copy_without_copy_file_range(m, workdir, monkeypatch):
+    src = _src(workdir, "big.bin", os.urandom(300_000))
+    monkeypatch.delattr(os, "copy_file_range", raising=False)
+    m._kernel_copy(src, str(workdir / "copy.bin"))
+    assert (workdir / "copy.bin").read_bytes() == (workdir / "page_files" / "big.bin").read_bytes()
@@ -0,0 +1,62 @@
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("pymongo")
+
+
+def _items(n, suffix=""):
+    return [{"id": 1000 + i, "nom": f"Item {i}{suffix}", "url_fiche": f"https://fiche.test/{i}"} for i in range(n)]
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().db
+
+
+def _docs(db, collection="items"):
+    return sorted(db[collection].find({}, {"_id": 0}), key=lambda d: (d["id"] is None, d["id"] or 0, d["url_fiche"]))
+
+
+def test_bulk_upserts_in_batches(m, db):
+    items = _items(7)
+    stats = m.upsert_items_mongo(items, db, "items", batch_size=3)
+    assert stats["batches"] == 3
+    assert stats["upserted"] == 7
+    assert _docs(db) == items
+
+    # Relance: remplacements sur place, rien de nouveau
+    changed = _items(7)
+    changed[2]["nom"] = "Renommé"
+    stats = m.upsert_items_mongo(changed, db, "items", batch_size=3)
+    assert (stats["upserted"], stats["matched"], stats["modified"]) == (0, 7, 1)
+    assert db["items"].count_documents({}) == 7
+    assert db["items"].find_one({"id": 1002})["nom"] == "Renommé"
+    assert {"id_1", "url_fiche_1", "nom_1"} <= set(db["items"].index_information())
+
+
+def test_removed_items_are_deleted(m, db):
+    m.upsert_items_mongo(_items(5), db, "items")
+    # Comparaison des clés présentes
+    stats = m.upsert_items_mongo(_items(3), db, "items", batch_size=2)
+    assert stats["deleted"] == 2
+    assert [d["id"] for d in _docs(db)] == [1000, 1001, 1002]
+    # Liste explicite (changeset): seules les clés données sont supprimées
+    stats = m.upsert_items_mongo([], db, "items", removed=["1001"])
+    assert stats["deleted"] == 1
+    assert [d["id"] for d in _docs(db)] == [1000, 1002]
+
+
+def test_items_without_id_keyed_by_url(m, db):
+    html_items = [{"id": None, "nom": "Carte", "url_fiche": "https://fiche.test/html"}]
+    m.upsert_items_mongo(_items(1) + html_items, db, "items")
+    m.upsert_items_mongo(_items(1) + [{**html_items[0], "nom": "Carte 2"}], db, "items")
+    assert db["items"].count_documents({}) == 2
+    assert db["items"].find_one({"url_fiche": "https://fiche.test/html"})["nom"] == "Carte 2"
+
+
+def test_swap_replaces_collection_at_once(m, db):
+    m.upsert_items_mongo(_items(4), db, "items")
+    stats = m.upsert_items_mongo(_items(2, " v2"), db, "items", swap=True)
+    assert stats["upserted"] == 2
+    assert [d["nom"] for d in _docs(db)] == ["Item 0 v2", "Item 1 v2"]
+    assert "items__staging" not in db.list_collection_names()
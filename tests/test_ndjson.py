@@ -0,0 +1,55 @@
+import io
+import json
+import os
+
+import pytest
+
+ITEMS = [{"id": 1, "nom": "Épice"}, {"id": 2, "nom": "Plastacier"}]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_header_export_round_trips(m, tmp_path, compress):
+    path = str(tmp_path / ("items.ndjson" + (".gz" if compress else "")))
+    with m.NDJSONWriter(path, compress, {"source": "test"}) as writer:
+        for it in ITEMS:
+            writer.write(it)
+    assert writer.count == 2
+    with open(path, "rb") as f:
+        assert (f.read(2) == b"\x1f\x8b") is compress
+    assert m.load_ndjson_export(path) == ITEMS
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(path)]
+
+
+def test_sidecar_meta_counts_items(m, tmp_path):
+    path = str(tmp_path / "items.ndjson")
+    with m.NDJSONWriter(path, meta={"source": "test"}, meta_mode="sidecar") as writer:
+        for it in ITEMS:
+            writer.write(it)
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == ITEMS
+    with open(path + ".meta.json", encoding="utf-8") as f:
+        assert json.load(f) == {"source": "test", "nb_items": 2}
+
+
+def test_stdout_lines_are_available_while_writing(m):
+    out = io.StringIO()
+    with m.NDJSONWriter("-", meta={"source": "test"}, stream=out) as writer:
+        writer.write(ITEMS[0])
+        # Chaque ligne est poussée dès son écriture, avant la fin de l'export
+        assert out.getvalue().splitlines()[-1] == json.dumps(ITEMS[0], ensure_ascii=False)
+        writer.write(ITEMS[1])
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert lines == [{"meta": {"source": "test"}}, *ITEMS]
+    assert m.load_ndjson_export("-") == []
+
+
+def test_failed_export_keeps_previous_file(m, tmp_path):
+    path = str(tmp_path / "items.ndjson")
+    with m.NDJSONWriter(path) as writer:
+        writer.write(ITEMS[0])
+    with pytest.raises(RuntimeError):
+        with m.NDJSONWriter(path) as writer:
+            writer.write(ITEMS[1])
+            raise RuntimeError("extraction interrompue")
+    assert m.load_ndjson_export(path) == ITEMS[:1]
+    assert os.listdir(tmp_path) == ["items.ndjson"]
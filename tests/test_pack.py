@@ -0,0 +1,102 @@
+import math
+
+import pytest
+
+from conftest import BUNDLED_POOLS, load_bundled
+
+
+def _economic_pool(b):
+    volumes, sells, buys = [0.5, 1, 2.5], [0, 10, 20], [0, 15, 30]
+    for i in range(12):
+        k = i % 3
+        b.item(1000 + i, f"Minerai {i}", tier=k + 1, volume=b.const(volumes[k]),
+               highestSellToVendorPrice=b.const(sells[k]), baseBuyFromVendorPrice=b.const(buys[k]))
+    return b.pool
+
+
+def _sane(value) -> bool:
+    return value is None or (isinstance(value, (int, float)) and not isinstance(value, bool)
+                             and math.isfinite(value) and value >= 0)
+
+
+def test_economic_fields_decoded_on_consistent_pool(m, workdir, pool_builder):
+    pool = _economic_pool(pool_builder())
+    index = m.PoolIndex(pool)
+    assert all(index.economic_fields.values())
+    items = m.extract_items(pool, downloader=m.IconDownloader(), index=index, download_all=False, verbose=False)
+    assert len(items) == 12
+    assert [it["volume"] for it in items[:3]] == [0.5, 1, 2.5]
+    assert [it["prix_vente_max"] for it in items[:3]] == [0, 10, 20]
+    assert [it["prix_achat_base"] for it in items[:3]] == [0, 15, 30]
+
+
+@pytest.mark.parametrize("name", BUNDLED_POOLS)
+def test_economic_fields_on_bundled_pools(m, workdir, name):
+    # Pools fournis avec le dépôt: un champ dont les références ne tombent pas sur des nombres
+    # est exporté à None plutôt qu'avec des valeurs prises au hasard
+    pool = load_bundled(name)
+    index = m.PoolIndex(pool)
+    items = m.extract_items(pool, downloader=m.IconDownloader(), index=index, download_all=False, verbose=False)
+    assert len(items) > 100
+    for it in items:
+        for field, _ in m.ECONOMIC_FIELDS:
+            assert _sane(it[field]), (it["id"], field, it[field])
+    for field, enabled in index.economic_fields.items():
+        if not enabled:
+            assert all(it[field] is None for it in items)
+
+
+def test_economic_number_rejects_invalid_values(m):
+    pool = [True, -3, float("nan"), float("inf"), "12", 4.5]
+    assert [m._economic_number(pool, i) for i in range(len(pool))] == [None, None, None, None, None, 4.5]
+
+
+def _stack(cle, quantite, volume, valeur):
+    return {"cle": cle, "nom": cle, "quantite": quantite, "volume": volume, "valeur": valeur}
+
+
+def test_pack_chests_value_objective_is_optimal(m):
+    inventory = [_stack("a", 3, 4, 10), _stack("b", 2, 3, 7), _stack("c", 5, 1, 1)]
+    result = m.pack_chests(inventory, [10])
+    chest = result["coffres"][0]
+    assert chest["volume_utilise"] <= 10
+    # Optimum: 1a + 2b (valeur 24, volume 10)
+    assert result["valeur_totale"] == 24
+    assert result["methode"] == "dp"
+
+
+def test_pack_chests_count_objective_and_leftovers(m):
+    inventory = [_stack("a", 3, 4, 10), _stack("c", 5, 1, 1), {"cle": "x", "quantite": 2, "volume": None}]
+    result = m.pack_chests(inventory, [6, 2], objective="nombre")
+    assert result["nombre_total"] == 5
+    for chest in result["coffres"]:
+        assert chest["volume_utilise"] <= chest["capacite"]
+    reasons = {r["cle"]: r["raison"] for r in result["reste"]}
+    assert reasons["x"] == "volume inconnu"
+    assert reasons["a"] == "place insuffisante"
+
+
+def test_pack_chests_greedy_fallback_respects_capacity(m):
+    inventory = [_stack(f"s{i}", 10, 0.5 + i % 4, i % 7 + 1) for i in range(20)]
+    result = m.pack_chests(inventory, [50, 30], max_cells=1)
+    assert result["methode"] == "glouton"
+    for chest in result["coffres"]:
+        assert 0 < chest["volume_utilise"] <= chest["capacite"]
+    placed = sum(ch["nombre"] for ch in result["coffres"]) + sum(r["quantite"] for r in result["reste"])
+    assert placed == 200
+
+
+@pytest.mark.parametrize("max_cells", [None, 1])
+def test_pack_chests_decimal_volumes_fill_exactly(m, max_cells):
+    # 0.07 x 100 vaut 7.000000000000001 en flottant: le volume doit compter 7 centièmes, pas 8
+    inventory = [_stack(f"s{i}", 1, 0.07, 1) for i in range(10)]
+    result = m.pack_chests(inventory, [0.7], max_cells=max_cells)
+    assert result["nombre_total"] == 10
+    assert result["reste"] == []
+    assert result["coffres"][0]["volume_utilise"] == 0.7
+
+
+def test_scaled_weight_rounds_up_inexact_volumes(m):
+    assert m._scaled_weight(0.07, 100) == 7
+    assert m._scaled_weight(0.071, 100) == 8
+    assert m._scaled_weight(0, 100) == 0
@@ -0,0 +1,35 @@
+import multiprocessing
+
+import pytest
+
+from conftest import BUNDLED_POOLS, load_baseline, load_bundled, project
+
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                                reason="extraction parallèle réservée aux plateformes avec fork")
+
+
+@pytest.fixture(scope="module")
+def serial(m):
+    # Référence série par pool, calculée une fois pour toutes les valeurs de workers
+    out = {}
+    for name in BUNDLED_POOLS:
+        downloader = m.IconDownloader()
+        items = m.extract_items(load_bundled(name), downloader=downloader, download_all=False, verbose=False)
+        out[name] = items, downloader.jobs
+    return out
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+@pytest.mark.parametrize("name", BUNDLED_POOLS)
+def test_parallel_matches_serial(m, workdir, serial, monkeypatch, name, workers):
+    monkeypatch.delenv("DOWNLOAD_ALL_IMAGES", raising=False)
+    expected, expected_jobs = serial[name]
+    pool = load_bundled(name)
+    downloader = m.IconDownloader()
+    # workers=1 retombe sur le chemin série, au-delà les shards sont extraits dans des processus forkés
+    items = m.extract_items_parallel(pool, workers=workers, downloader=downloader, shards_per_worker=3)
+    # Mêmes items, même ordre, mêmes icônes soumises que le chemin série
+    assert items == expected
+    assert downloader.jobs == expected_jobs
+    baseline = load_baseline(name)
+    assert project(items, baseline) == baseline
@@ -0,0 +1,207 @@
+import gzip
+import json
+import os
+import threading
+
+import pytest
+
+from conftest import Reply, load_bundled
+
+
+def test_binary_pool_round_trip(m, tmp_path, pool):
+    pool = pool + ["é unicode", 3.25, -7, True, False, None, [0, 1, 2], {}]
+    path = str(tmp_path / "items.pool")
+    m.write_pool_binary(pool, path, "ab" * 32)
+    with m.MappedPool(path) as mapped:
+        assert len(mapped) == len(pool)
+        assert list(mapped) == pool
+        assert mapped[-1] == {}
+        assert mapped.source_digest == "ab" * 32
+        assert [s for s in mapped.iter_strings()] == [s for s in pool if isinstance(s, str)]
+        assert [p for p, _ in mapped.iter_dicts()] == [i for i, e in enumerate(pool) if isinstance(e, dict)]
+        with pytest.raises(IndexError):
+            mapped[len(pool)]
+
+
+def test_binary_pool_round_trip_bundled(m, tmp_path):
+    pool = load_bundled("items_fr.json")
+    path = str(tmp_path / "items.pool")
+    m.write_pool_binary(pool, path)
+    with m.MappedPool(path) as mapped:
+        assert mapped.source_digest is None
+        assert list(mapped) == pool
+
+
+@pytest.mark.parametrize("content", [b"", b"\0" * 64, b"DUNEPOOL" + b"\0" * 200])
+def test_binary_pool_rejects_foreign_file(m, tmp_path, content):
+    path = tmp_path / "bad.pool"
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        m.MappedPool(str(path))
+
+
+def _chunks(data, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 1 << 16])
+def test_stream_parser_matches_json_loads(m, pool, size):
+    data = pool + [1.5e3, -0.25, "a, b]", "é ß œ", {"k": [1, {"x": None}]}, [], 12345678901234]
+    for text in (json.dumps(data, ensure_ascii=False), json.dumps(data, indent=2)):
+        assert m.parse_json_array_stream(_chunks(text, size)) == data
+
+
+def test_stream_parser_number_split_across_chunks(m):
+    # "1.5" seul pourrait être le début de "1.5e3": l'élément attend le séparateur
+    assert m.parse_json_array_stream(["[1.5", "e3,2", "]"]) == [1500.0, 2]
+    assert m.parse_json_array_stream(["[1", "2", "3]"]) == [123]
+    assert m.parse_json_array_stream(["[ ]"]) == []
+
+
+@pytest.mark.parametrize("text", ["{}", "[1,2", "[1,", "[1 2]", '["abc', "", "[1,]"])
+def test_stream_parser_rejects_invalid(m, text):
+    with pytest.raises(ValueError):
+        m.parse_json_array_stream(_chunks(text, 2))
+
+
+@pytest.mark.parametrize("size", [1, 5, 4096])
+def test_parse_pool_chunks_gzip(m, pool, size):
+    data = pool + ["é ß œ"]
+    raw = gzip.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+    assert m._parse_pool_chunks(_chunks(raw, size)) == data
+    # JSON brut (non compressé) et gzip en plusieurs membres
+    assert m._parse_pool_chunks(_chunks(json.dumps(data).encode("utf-8"), size)) == data
+    text = json.dumps(data).encode("utf-8")
+    members = gzip.compress(text[:10]) + gzip.compress(text[10:])
+    assert m._parse_pool_chunks(_chunks(members, size)) == data
+
+
+def test_prefetch_producer_stops_with_consumer(m):
+    produced = []
+
+    def endless():
+        i = 0
+        while True:
+            produced.append(i)
+            yield i
+            i += 1
+
+    before = set(threading.enumerate())
+    gen = m._prefetch(endless(), depth=2)
+    assert [next(gen) for _ in range(3)] == [0, 1, 2]
+    gen.close()
+    for t in set(threading.enumerate()) - before:
+        t.join(timeout=2)
+        assert not t.is_alive()
+    # File bornée: le producteur n'a jamais pris plus de depth morceaux d'avance
+    assert len(produced) <= 3 + 2 + 2
+
+
+def test_prefetch_reraises_producer_error(m):
+    def failing():
+        yield b"a"
+        raise OSError("connexion coupée")
+
+    with pytest.raises(OSError, match="connexion coupée"):
+        list(m._prefetch(failing()))
+
+
+def _gz(pool) -> bytes:
+    return gzip.compress(json.dumps(pool).encode("utf-8"), mtime=0)
+
+
+def test_mapped_pool_rebuilt_only_when_blob_changes(m, workdir, stub_server, monkeypatch, pool):
+    monkeypatch.setattr(m, "BASE_URL", stub_server.base_url + "/data")
+    monkeypatch.delenv("USE_LOCAL", raising=False)
+    path = "/data/fr/items.json.gz"
+    stub_server.route(path, Reply(200, _gz(pool), {"ETag": '"v1"'}), Reply(304))
+
+    mapped = m.load_mapped_pool("fr")
+    assert list(mapped) == pool
+    assert mapped.source_digest == m.PoolCache(lang="fr").read_ref()["sha256"]
+    mapped.close()
+    built = os.stat("items_fr.pool")
+
+    # 304: le fichier binaire est repris tel quel, sans décodage ni réécriture
+    write, parse = m.write_pool_binary, m._parse_pool_file
+
+    def no_rebuild(*args, **kwargs):
+        raise AssertionError("pool binaire reconstruit alors que le blob n'a pas changé")
+    monkeypatch.setattr(m, "write_pool_binary", no_rebuild)
+    monkeypatch.setattr(m, "_parse_pool_file", no_rebuild)
+    with m.load_mapped_pool("fr") as mapped:
+        assert len(mapped) == len(pool)
+    assert stub_server.calls(path)[-1]["If-None-Match"] == '"v1"'
+    monkeypatch.setenv("USE_LOCAL", "1")
+    with m.load_mapped_pool("fr") as mapped:
+        assert len(mapped) == len(pool)
+    assert len(stub_server.calls(path)) == 2
+    assert os.stat("items_fr.pool").st_mtime_ns == built.st_mtime_ns
+
+    # Nouveau contenu: reconstruction, marquée du nouveau blob
+    monkeypatch.setattr(m, "write_pool_binary", write)
+    monkeypatch.setattr(m, "_parse_pool_file", parse)
+    monkeypatch.delenv("USE_LOCAL")
+    changed = pool + ["nouvelle entrée"]
+    stub_server.route(path, Reply(200, _gz(changed), {"ETag": '"v2"'}))
+    with m.load_mapped_pool("fr") as mapped:
+        assert list(mapped) == changed
+        assert mapped.source_digest == m.PoolCache(lang="fr").read_ref()["sha256"]
+
+
+def _cache(m, tmp_path):
+    return m.PoolCache(root=str(tmp_path / "cache"), game_version="1.0", lang="fr", asset_version="a1")
+
+
+def test_pool_cache_etag_and_304(m, tmp_path, stub_server, pool):
+    body = _gz(pool)
+    url = stub_server.route("/fr/items.json.gz", Reply(200, body, {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}),
+                            Reply(304))
+    cache = _cache(m, tmp_path)
+    assert m._fetch_pool_cached(url, cache) == pool
+    ref = cache.read_ref()
+    assert (ref["etag"], ref["size"]) == ('"v1"', len(body))
+    assert cache.read_raw(ref) == body
+    assert "If-None-Match" not in stub_server.calls("/fr/items.json.gz")[0]
+
+    # Revalidation: validateurs envoyés, 304 -> pool relu depuis le blob du cache
+    assert m._fetch_pool_cached(url, cache) == pool
+    headers = stub_server.calls("/fr/items.json.gz")[1]
+    assert headers["If-None-Match"] == '"v1"'
+    assert headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    # Pool déjà résident chez l'appelant: rien n'est redécodé
+    assert m._fetch_pool_cached(url, cache, resident_digest=ref["sha256"]) is None
+
+
+def test_pool_cache_keyed_by_version_and_language(m, tmp_path):
+    a = m.PoolCache(root=str(tmp_path), game_version="1.0", lang="fr", asset_version="a1")
+    b = m.PoolCache(root=str(tmp_path), game_version="1.0", lang="en", asset_version="a1")
+    c = m.PoolCache(root=str(tmp_path), game_version="1.1", lang="fr", asset_version="a1")
+    ref = a.store(b"[1,2]")
+    assert b.read_ref() is None and c.read_ref() is None
+    # Contenu identique: un seul blob partagé
+    assert b.store(b"[1,2]")["sha256"] == ref["sha256"]
+    assert len(os.listdir(tmp_path / "blobs")) == 1
+
+
+def test_pool_cache_offline_fallback(m, tmp_path, stub_server, pool):
+    import requests
+
+    # JSON brut servi sans gzip: le cache le stocke tout de même compressé
+    url = stub_server.route("/fr/items.json.gz", Reply(200, json.dumps(pool).encode("utf-8"), {"ETag": '"v1"'}),
+                            Reply(drop=True))
+    cache = _cache(m, tmp_path)
+    assert m._fetch_pool_cached(url, cache) == pool
+    assert cache.read_raw(cache.read_ref())[:2] == b"\x1f\x8b"
+    assert m._fetch_pool_cached(url, cache) == pool
+
+    with pytest.raises(requests.ConnectionError):
+        m._fetch_pool_cached(url, _cache(m, tmp_path / "vide"))
+
+
+def test_load_pool_use_local_reads_cache_without_network(m, workdir, stub_server, monkeypatch, pool):
+    monkeypatch.setattr(m, "BASE_URL", stub_server.base_url + "/data")
+    stub_server.route("/data/fr/items.json.gz", Reply(200, _gz(pool), {"ETag": '"v1"'}))
+    assert m.load_pool("fr", use_local=False) == pool
+    assert m.load_pool("fr", use_local=True) == pool
+    assert len(stub_server.requests) == 1
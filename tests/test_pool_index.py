@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from conftest import BUNDLED_POOLS, PoolBuilder, load_bundled
+
+
+def _scan(index, key, limit=None):
+    # Référence: l'ancien parcours linéaire
+    out = [p for p in index.image_paths if key and key in p.lower()]
+    return out[:limit] if limit is not None else out
+
+
+@pytest.mark.parametrize("name", BUNDLED_POOLS)
+def test_paths_containing_matches_linear_scan(m, name):
+    index = m.PoolIndex(load_bundled(name))
+    rng = random.Random(0)
+    keys = ["", "a", "_d", "icon", "t_ui_icon", "WEBP", "zzzz-absent", "/images/"]
+    for path in rng.sample(index.image_paths, 60):
+        lowered = path.lower()
+        start = rng.randrange(len(lowered))
+        keys.append(lowered[start:start + rng.randint(1, 25)])
+    for key in keys:
+        assert index.paths_containing(key) == _scan(index, key), key
+        assert index.paths_containing(key, limit=2) == _scan(index, key, limit=2), key
+
+
+def _fallback_pool(token):
+    b = PoolBuilder()
+    b.add("/images/dune/gui/textures/icons/items/t_ui_iconresourceholtzmanactuatorr_d.webp")
+    b.add("/images/dune/gui/textures/icons/items/t_ui_iconspicemelange_d.webp")
+    b.add("/images/dune/gui/textures/icons/items/t_ui_iconspicemelangeraw_d.webp")
+    b.item(1, "Actionneur", icon=token)
+    return b.pool
+
+
+@pytest.mark.parametrize("token, expected", [
+    ("holtzmanactuator", "images/dune/gui/textures/icons/items/t_ui_iconresourceholtzmanactuatorr_d.webp"),
+    # Deux chemins contiennent le token: pas de choix arbitraire
+    ("spicemelange", None),
+])
+def test_icon_fallback_keeps_single_match_semantics(m, workdir, token, expected):
+    report = {}
+    items = m.extract_items(_fallback_pool(token), downloader=m.IconDownloader(), download_all=False,
+                            verbose=False, report=report)
+    assert (items[0]["image_local"] or None) == expected
+    assert report["icon_fallback"] == 1
+    assert report["icon_fallback_hits"] == (1 if expected else 0)
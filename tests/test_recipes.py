@@ -0,0 +1,64 @@
+import pytest
+
+from conftest import PoolBuilder
+
+
+def _graph(m, edges):
+    graph = m.RecipeGraph()
+    graph.edges = {k: list(v) for k, v in edges.items()}
+    return graph.finish()
+
+
+def test_bom_expands_to_raw_materials(m):
+    # 3 = 2×1 + 1×2 ; 4 = 2×3 + 5×1 ; 1 et 2 sont des matières premières
+    graph = _graph(m, {3: [(1, 2), (2, 1)], 4: [(3, 2), (1, 5)]})
+    assert graph.cycles == []
+    assert graph.order.index(3) < graph.order.index(4)
+    assert graph.materials(4) == {1: 9, 2: 2}
+    assert graph.materials(4, 3) == {1: 27, 2: 6}
+    assert graph.materials(1, 4) == {1: 4}
+
+
+@pytest.mark.parametrize("edges, cycles, blocked", [
+    ({1: [(1, 1)]}, [[1]], [1]),
+    ({1: [(2, 1)], 2: [(3, 1)], 3: [(1, 1)], 4: [(2, 1)], 5: [(6, 1)]}, [[1, 2, 3]], [1, 2, 3, 4]),
+    ({1: [(2, 1)], 2: [(1, 1)], 3: [(4, 1)], 4: [(3, 1)], 5: [(1, 1), (3, 1)]}, [[1, 2], [3, 4]],
+     [1, 2, 3, 4, 5]),
+])
+def test_cycles_are_detected_and_block_dependents(m, edges, cycles, blocked):
+    graph = _graph(m, edges)
+    assert sorted(graph.cycles) == cycles
+    for item in blocked:
+        assert graph.materials(item) is None
+    assert all(graph.materials(i) is not None for i in edges if i not in blocked)
+
+
+def test_deep_chain_does_not_recurse(m):
+    n = 20000
+    graph = _graph(m, {i: [(i + 1, 1)] for i in range(n)})
+    assert graph.materials(0) == {n: 1}
+
+
+def _recipe_pool():
+    # Ingrédient désigné par id littéral (itemId) ou par position de l'item (item); quantités à un saut
+    b = PoolBuilder()
+    b.item(1, "Matière 1")
+    raw2 = b.item(2, "Matière 2")
+    ing = [b.add({"itemId": 1, "quantity": b.const(4)}), b.add({"item": raw2, "amount": b.const(2)})]
+    b.item(3, "Lingot", recipe=b.add({"ingredients": b.add(ing), "yield": b.const(2)}))
+    b.item(4, "Barre", recipe=b.add([b.add({"itemId": 3, "quantity": b.const(3)})]))
+    # Clés non reconnues: recette ignorée
+    b.item(5, "Inconnu", recipe=b.add({"composition": b.add([b.add({"itemId": 1})])}))
+    return b.pool
+
+
+def test_from_pool_reads_recipes(m, tmp_path):
+    graph = m.RecipeGraph.from_pool(_recipe_pool())
+    # Quantités ramenées à une unité produite (yield 2)
+    assert graph.edges == {3: [(1, 2), (2, 1)], 4: [(3, 3)]}
+    assert graph.materials(4) == {1: 6, 2: 3}
+    path = str(tmp_path / "recipes.json")
+    graph.save(path)
+    loaded = m.RecipeGraph.load(path)
+    assert loaded.materials(4, 2) == {1: 12, 2: 6}
+    assert loaded.order == graph.order
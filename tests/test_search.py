@@ -0,0 +1,62 @@
+import pytest
+
+ITEMS = [
+    {"id": 1, "nom": "Actionneur Holtzman amélioré", "categorie": "Composants", "description": "Bouclier"},
+    {"id": 2, "nom": "Cœur de distille", "categorie": "Équipement", "description": "Recycle l'eau"},
+    {"id": 3, "nom": "Straße des Æthers", "categorie": "Divers", "description": "Holtzman"},
+    {"id": 4, "nom": "Plastacier", "categorie": "Ressources", "description": "Alliage"},
+]
+
+
+@pytest.mark.parametrize("text, folded", [
+    ("Actionneur Holtzman Amélioré", "actionneur holtzman ameliore"),
+    ("Cœur", "coeur"),
+    ("ŒUVRE", "oeuvre"),
+    ("Æther", "aether"),
+    ("Straße", "strasse"),
+    ("ÉQUIPEMENT", "equipement"),
+])
+def test_fold_text_strips_accents_case_and_ligatures(m, text, folded):
+    assert m.fold_text(text) == folded
+
+
+@pytest.fixture
+def index(m):
+    return m.SearchIndex.build(ITEMS)
+
+
+def _ids(index, results):
+    return [index.keys[pos] for pos, _ in results]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("coeur", ["2"]),
+    ("CŒUR", ["2"]),
+    ("strasse", ["3"]),
+    ("aethers", ["3"]),
+    ("ameliore", ["1"]),
+    ("equipement", ["2"]),
+])
+def test_queries_match_folded_tokens(m, index, query, expected):
+    assert _ids(index, index.search(query, fuzzy=False)) == expected
+
+
+def test_prefix_fuzzy_and_all_words(m, index):
+    assert _ids(index, index.search("actio", fuzzy=False)) == ["1"]
+    assert index.search("actio", prefix=False, fuzzy=False) == []
+    assert _ids(index, index.search("plastacer")) == ["4"]
+    # Tous les mots doivent correspondre
+    assert _ids(index, index.search("holtzman bouclier")) == ["1"]
+
+
+def test_name_matches_rank_first(m, index):
+    # "holtzman" est dans le nom de 1 et la description de 3
+    assert _ids(index, index.search("holtzman")) == ["1", "3"]
+
+
+def test_saved_index_answers_like_the_built_one(m, index, tmp_path):
+    path = str(tmp_path / "search.json")
+    index.save(path)
+    loaded = m.SearchIndex.load(path)
+    for query in ("coeur", "holtzman", "actio", "plastacer", "strasse"):
+        assert loaded.search(query) == index.search(query)
@@ -0,0 +1,79 @@
+import math
+
+import pytest
+
+from conftest import load_bundled
+
+np = pytest.importorskip("numpy")
+
+
+def _stat(name, value, percent=False, higher=True):
+    return {"attribut": name, "valeur": value, "est_pourcentage": percent, "mieux_plus_haut": higher}
+
+
+ITEMS = [
+    {"id": 1, "categorie": "Armes", "sous_categorie": "Fusils", "tier": 2,
+     "statistiques": [_stat("Dégâts", 40), _stat("Poids", 3.5, higher=False), _stat("Dégâts", 99)]},
+    {"id": 2, "categorie": "Armes", "sous_categorie": "Pistolets", "tier": 1,
+     "statistiques": [_stat("Dégâts", 25), _stat("Poids", 1.0, higher=False)]},
+    {"id": 3, "categorie": "Armes", "sous_categorie": "Fusils", "tier": 4,
+     "statistiques": [_stat("Dégâts", 60), _stat("Critique", 12, percent=True)]},
+    {"id": 4, "categorie": "Ressources", "tier": None, "statistiques": [_stat("Dégâts", True)]},
+]
+
+
+@pytest.fixture
+def matrix(m):
+    return m.StatMatrix.build(ITEMS)
+
+
+def test_columns_mask_and_metadata(m, matrix):
+    assert matrix.keys == ["1", "2", "3", "4"]
+    assert matrix.attributes == ["Dégâts", "Poids", "Critique"]
+    # Première valeur d'un attribut répété; booléens ignorés
+    assert matrix.values[0, 0] == 40
+    assert not matrix.mask[3].any()
+    assert matrix.mask[:, 2].tolist() == [False, False, True, False]
+    assert matrix.percent.tolist() == [0, 0, 1]
+    assert matrix.higher.tolist() == [1, 0, 1]
+    assert math.isnan(matrix.tiers[3])
+
+
+def test_filter_top_k_and_rank(m, matrix):
+    fusils = matrix.filter(categorie="Armes", sous_categorie="Fusils")
+    assert fusils.tolist() == [True, False, True, False]
+    assert matrix.filter(tier_min=2, has=["Dégâts"]).tolist() == [True, False, True, False]
+    assert matrix.filter(categorie="Absente").sum() == 0
+    assert matrix.top_k("Dégâts", 2) == [("3", 60.0), ("1", 40.0)]
+    assert matrix.top_k("Dégâts", 5, rows=fusils) == [("3", 60.0), ("1", 40.0)]
+    # Poids: plus bas est meilleur
+    assert matrix.top_k("Poids", 1) == [("2", 1.0)]
+    norm = matrix.normalize(["Dégâts", "Poids"])
+    assert norm[:, 0].tolist()[:3] == pytest.approx([15 / 35, 0.0, 1.0])
+    assert norm[:2, 1].tolist() == [0.0, 1.0]
+    assert [k for k, _ in matrix.rank({"Dégâts": 1.0, "Poids": 1.0}, k=3)] == ["2", "3", "1"]
+
+
+def test_saved_matrix_is_memory_mapped(m, matrix, tmp_path):
+    path = str(tmp_path / "stats")
+    matrix.save(path)
+    loaded = m.StatMatrix.load(path)
+    assert isinstance(loaded.values, np.memmap)
+    assert np.array_equal(loaded.values, matrix.values, equal_nan=True)
+    assert loaded.keys == matrix.keys and loaded.attributes == matrix.attributes
+    assert loaded.top_k("Dégâts", 3) == matrix.top_k("Dégâts", 3)
+    assert loaded.compare(["3", "1"], ["Dégâts"]).tolist() == [[60.0], [40.0]]
+
+
+def test_top_k_matches_sorting_on_bundled_items(m, workdir):
+    items = m.extract_items(load_bundled("items_fr.json"), downloader=m.IconDownloader(), download_all=False,
+                            verbose=False)
+    matrix = m.StatMatrix.build(items)
+    assert matrix.attributes
+    for attribute in matrix.attributes:
+        col = matrix.column(attribute)
+        sign = -1 if matrix.higher[col] != 0 else 1
+        rows = [i for i in range(len(items)) if matrix.mask[i, col]]
+        # Référence: tri complet, égalités départagées par l'ordre d'export
+        expected = sorted(rows, key=lambda i: (sign * float(matrix.values[i, col]), i))[:5]
+        assert matrix.top_k(attribute, 5) == [(matrix.keys[i], float(matrix.values[i, col])) for i in expected]